@@ -0,0 +1,80 @@
+"""Peak RSS and rows/sec of a full NPPES chunked read vs the column-pruned, typed read_nppes_chunks.
+
+Each mode runs in its own process so that peak RSS is not shared between them. Point --file at a real
+npidata_pfile or let the script write a synthetic one padded out to the dissemination file's ~330 columns.
+
+    python benchmarks/nppes_reader_benchmark.py --file input_files/npidata_pfile_20050523-20240107.csv
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pc_constants import *
+from pc_nppes import NPPES_PIPELINE_SCHEMA, NppesReadStats, read_nppes_chunks
+
+MODES = ['all-columns', 'pruned-c', 'pruned-pyarrow']
+NPPES_COLUMN_COUNT = 330
+
+
+def write_synthetic_nppes(file_path, rows, write_chunk=200000, seed=0):
+    rng = np.random.default_rng(seed)
+    filler_columns = [f'Unused Column_{i}' for i in range(NPPES_COLUMN_COUNT - len(NPPES_PIPELINE_SCHEMA))]
+    header = True
+    for start in range(0, rows, write_chunk):
+        n = min(write_chunk, rows - start)
+        data = {}
+        for col, dtype in NPPES_PIPELINE_SCHEMA.items():
+            if col == NPPES_NPI:
+                data[col] = np.arange(1000000000 + start, 1000000000 + start + n)
+            elif col == NPPES_ENTITY_TYPE:
+                data[col] = rng.choice([1, 2], size=n)
+            elif dtype == 'category':
+                data[col] = np.where(rng.random(n) < 0.3, rng.choice(['RI', 'MA', 'CT', '207Q00000X'], size=n), None)
+            else:
+                data[col] = np.where(rng.random(n) < 0.3, rng.choice(['SMITH', 'MD12345', '0012345'], size=n), None)
+        for col in filler_columns:
+            data[col] = np.where(rng.random(n) < 0.2, 'FILLER TEXT VALUE', None)
+        pd.DataFrame(data).to_csv(file_path, mode='w' if header else 'a', header=header, index=False)
+        header = False
+
+
+def run_mode(mode, file_path, chunk_size):
+    stats = NppesReadStats()
+    if mode == 'all-columns':
+        # What the pipeline did before - every column, types inferred per chunk
+        for chunk in pd.read_csv(file_path, chunksize=chunk_size, low_memory=False):
+            stats.record(len(chunk))
+    else:
+        for chunk in read_nppes_chunks(file_path, chunk_size, engine=mode.split('-')[1], stats=stats):
+            pass
+    print(f"{mode:16s} {stats.summary()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--chunk-size', type=int, default=200000)
+    parser.add_argument('--file', default='synthetic_nppes_full.csv')
+    parser.add_argument('--mode', choices=['write'] + MODES, help='Run a single step in this process')
+    args = parser.parse_args()
+
+    if args.mode == 'write':
+        write_synthetic_nppes(args.file, args.rows)
+    elif args.mode:
+        run_mode(args.mode, args.file, args.chunk_size)
+    else:
+        # Peak RSS is inherited by child processes on Linux, so even the file generation gets its own process
+        modes = MODES if os.path.exists(args.file) else ['write'] + MODES
+        for mode in modes:
+            subprocess.run([sys.executable, os.path.abspath(__file__), '--file', args.file, '--rows', str(args.rows),
+                            '--chunk-size', str(args.chunk_size), '--mode', mode], check=True)
+
+
+if __name__ == '__main__':
+    main()
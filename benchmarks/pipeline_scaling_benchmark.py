@@ -0,0 +1,147 @@
+"""Wall time and rows/sec of the main pipeline steps as the input grows - the NPPES filter, the APCD / NPPES merge,
+taxonomy tagging (update_roles_specialties, get_derived_specialty), license cleaning and confirm_license_specialty.
+
+Inputs come from pc_synthetic_data.py - one folder per scale (NPPES rows) under --data-dir, written on the first run
+and re-used after that. Each scale runs in a process of its own, so peak RSS is that of the scale alone. The steps
+are set up with the same pc_*.py functions the notebook calls.
+
+The scaling exponent is the slope of log(seconds) against log(rows) across the scales - 1.0 is linear, anything
+well above it is a step that will get disproportionately slow on the full NPPES file.
+
+    python benchmarks/pipeline_scaling_benchmark.py --scales 10000 100000 1000000 --json scaling.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+REPO_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIRECTORY)
+
+from pc_constants import *
+from pc_nppes import NppesProviderAccumulator, filter_nppes_chunk, read_nppes_chunks
+from pc_licenses import join_provider_licenses
+from pc_ridoh import (RidohIndex, RidohNameMatcher, confirm_license_specialty, group_ridoh_licensees,
+                      load_ridoh_clinicians)
+from pc_synthetic_data import (SYNTHETIC_APCD_FILE_NAME, SYNTHETIC_NPPES_FILE_NAME, SYNTHETIC_RIDOH_EXTRACT_DATE,
+                               RIDOH_EXTRACT_PROFESSIONS, generate_synthetic_inputs)
+from pc_taxonomy import FULL_SPECIALTY_LIST, TaxonomyTagger, get_derived_specialty, taxonomy_code_dictionaries
+from pc_utilities import add_source_db_prefix, peak_rss_mb
+
+STAGES = ['nppes_filter', 'apcd_nppes_merge', 'update_roles_specialties', 'get_derived_specialty', 'license_cleaning',
+          'confirm_license_specialty']
+
+
+def run_scale(data_directory, chunk_size):
+    """Time every step on one scale's inputs. Returns {'stages': {stage: {'rows': rows in, 'secs': wall secs}},
+    'peak_rss_mb': ..., 'providers': merged providers}.
+    """
+    input_directory = os.path.join(data_directory, INPUT_FILES_DIRECTORY)
+    timings = {}
+
+    def timed(stage, rows, function):
+        start = time.perf_counter()
+        result = function()
+        timings[stage] = {'rows': int(rows), 'secs': time.perf_counter() - start}
+        return result
+
+    apcd_provider_data = pd.read_csv(os.path.join(input_directory, SYNTHETIC_APCD_FILE_NAME))
+    unique_apcd_npis = apcd_provider_data[APCD_NPI_COL_NAME].unique()
+    ridoh_clinicians = load_ridoh_clinicians(*[f'{extract_name}-licensee-extract-{SYNTHETIC_RIDOH_EXTRACT_DATE}.csv' for extract_name in RIDOH_EXTRACT_PROFESSIONS],
+                                             directory=input_directory)
+    ridoh_name_matcher = RidohNameMatcher(ridoh_clinicians[[RIDOH_FIRST_NAME_COL_NAME, RIDOH_LAST_NAME_COL_NAME]].itertuples(index=False, name=None))
+    taxonomies = pd.read_csv(os.path.join(input_directory, 'nppes_all_taxonomies.csv'))
+
+    state_columns = [add_source_db_prefix(col, NPPES_PREFIX) for col in
+                     NPPES_ADDRESS_STATE_COLUMNS + NPPES_LICENSE_STATE_COLUMNS + NPPES_IDENTIFIER_STATE_COLUMNS]
+    license_number_columns = [add_source_db_prefix(col, NPPES_PREFIX) for col in NPPES_LICENSE_NUMBER_COLUMNS]
+    taxonomy_columns = [add_source_db_prefix(col, NPPES_PREFIX) for col in NPPES_TAXONOMY_COLUMNS]
+
+    def nppes_filter():
+        providers = NppesProviderAccumulator(os.path.join(data_directory, 'benchmark_ri_clinicians.csv'))
+        nppes_rows = 0
+        for chunk in read_nppes_chunks(os.path.join(input_directory, SYNTHETIC_NPPES_FILE_NAME), chunk_size):
+            nppes_rows += len(chunk)
+            providers.append(filter_nppes_chunk(chunk, unique_apcd_npis, ridoh_name_matcher, ridoh_clinicians[RIDOH_LICENSE_NO_COL_NAME],
+                                                state_columns, license_number_columns))
+        providers.finish()
+        return nppes_rows
+    nppes_rows = timed('nppes_filter', 0, nppes_filter)
+    timings['nppes_filter']['rows'] = nppes_rows
+
+    nppes_data = pd.read_csv(os.path.join(data_directory, 'benchmark_ri_clinicians.csv'))
+    providers = timed('apcd_nppes_merge', len(apcd_provider_data),
+                      lambda: pd.merge(apcd_provider_data, nppes_data, left_on=APCD_NPI_COL_NAME, right_on=NPPES_NPI_COL_NAME))
+
+    taxonomy_code_roles, taxonomy_code_specialties = taxonomy_code_dictionaries(taxonomies)
+
+    def update_roles_specialties():
+        tagger = TaxonomyTagger(providers, taxonomy_columns)
+        tagger.update_roles_specialties(taxonomy_code_roles, RIDOH_CREDENTIAL_COLUMN_NAME)
+        tagger.update_roles_specialties(taxonomy_code_specialties, SPECIALTY_COLUMN_NAME)
+    timed('update_roles_specialties', len(providers), update_roles_specialties)
+    timed('get_derived_specialty', len(providers), lambda: get_derived_specialty(providers, FULL_SPECIALTY_LIST))
+
+    providers[LICENSE_CLEANED_COL_NAME] = timed('license_cleaning', len(providers), lambda: join_provider_licenses(providers))
+    grouped_ridoh = group_ridoh_licensees(ridoh_clinicians)
+    timed('confirm_license_specialty', len(providers), lambda: confirm_license_specialty(providers, RidohIndex(grouped_ridoh)))
+    return {'stages': timings, 'peak_rss_mb': peak_rss_mb(), 'providers': len(providers)}
+
+
+def scaling_exponent(rows, secs):
+    # Slope of the log-log fit - None with fewer than two usable points
+    points = [(r, s) for r, s in zip(rows, secs) if r > 0 and s > 0]
+    if len(set(r for r, _ in points)) < 2:
+        return None
+    return float(np.polyfit(np.log([r for r, _ in points]), np.log([s for _, s in points]), 1)[0])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', type=int, nargs='+', default=[10000, 100000, 1000000], help='NPPES rows per scale')
+    parser.add_argument('--data-dir', default='synthetic_benchmark_data', help='Where the synthetic inputs of each scale are kept')
+    parser.add_argument('--ri-share', type=float, default=0.02)
+    parser.add_argument('--chunk-size', type=int, default=200000)
+    parser.add_argument('--json', help='Also write the results to this file')
+    parser.add_argument('--run', metavar='DATA_DIRECTORY', help='Time a single scale in this process (prints JSON)')
+    args = parser.parse_args()
+
+    if args.run:
+        print(json.dumps(run_scale(args.run, args.chunk_size)))
+        return
+
+    results = {}
+    for scale in args.scales:
+        data_directory = os.path.join(args.data_dir, f'scale_{scale}')
+        if not os.path.exists(os.path.join(data_directory, INPUT_FILES_DIRECTORY, SYNTHETIC_APCD_FILE_NAME)):
+            print(f"Writing {scale:,} NPPES rows of synthetic inputs to {data_directory}", file=sys.stderr)
+            generate_synthetic_inputs(data_directory, nppes_rows=scale, ri_share=args.ri_share,
+                                      reference_directory=os.path.join(REPO_DIRECTORY, INPUT_FILES_DIRECTORY))
+        completed = subprocess.run([sys.executable, os.path.abspath(__file__), '--run', data_directory, '--chunk-size', str(args.chunk_size)],
+                                   check=True, stdout=subprocess.PIPE, text=True)
+        results[scale] = json.loads(completed.stdout.strip().splitlines()[-1])
+        print(f"{scale:>12,} NPPES rows: {results[scale]['providers']:,} providers, peak RSS {results[scale]['peak_rss_mb']:,.0f} MB", file=sys.stderr)
+
+    print(f"{'Stage':<28}" + ''.join(f"{f'{scale:,} rows':>26}" for scale in args.scales) + f"{'Exponent':>10}")
+    for stage in STAGES:
+        cells = []
+        for scale in args.scales:
+            timing = results[scale]['stages'][stage]
+            rate = timing['rows'] / timing['secs'] if timing['secs'] else 0
+            cells.append(f"{timing['secs']:>9.3f}s {rate:>12,.0f} rows/s")
+        exponent = scaling_exponent([results[scale]['stages'][stage]['rows'] for scale in args.scales],
+                                    [results[scale]['stages'][stage]['secs'] for scale in args.scales])
+        print(f"{stage:<28}" + ''.join(f'{cell:>26}' for cell in cells) + (f'{exponent:>10.2f}' if exponent is not None else f"{'':>10}"))
+
+    if args.json:
+        with open(args.json, 'w') as json_file:
+            json.dump({str(scale): result for scale, result in results.items()}, json_file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""Per-chunk timing of the RI residency check: row-wise apply vs classify_ri_evidence.
+
+Writes (or re-uses) a synthetic NPPES-shaped file holding the NPI plus the 67 state columns the
+pipeline looks at, then reads it back in pipeline-sized chunks and times both methods per chunk.
+
+    python benchmarks/ri_evidence_benchmark.py --rows 8000000 --chunk-size 200000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pc_constants import *
+from pc_nppes import classify_ri_evidence
+
+STATE_COLUMNS = NPPES_ADDRESS_STATE_COLUMNS + NPPES_LICENSE_STATE_COLUMNS + NPPES_IDENTIFIER_STATE_COLUMNS
+OTHER_STATES = ['MA', 'CT', 'NY', 'NH', 'VT', 'ME', 'NJ', 'PA', 'FL', 'CA', 'TX']
+
+
+def write_synthetic_nppes(file_path, rows, write_chunk=500000, seed=0):
+    # Shaped like the dissemination file: both address states filled, the license/identifier state
+    # columns increasingly sparse, and roughly 1 in 60 rows having some RI connection
+    rng = np.random.default_rng(seed)
+    header = True
+    for start in range(0, rows, write_chunk):
+        n = min(write_chunk, rows - start)
+        data = {NPPES_NPI: np.arange(1000000000 + start, 1000000000 + start + n)}
+        for position, col in enumerate(STATE_COLUMNS):
+            fill_rate = 1.0 if position < 2 else 0.6 / position
+            states = rng.choice(OTHER_STATES + [RHODE_ISLAND_STATE_CODE], size=n, p=[0.09] * len(OTHER_STATES) + [0.01])
+            data[col] = np.where(rng.random(n) < fill_rate, states, None)
+        pd.DataFrame(data).to_csv(file_path, mode='w' if header else 'a', header=header, index=False)
+        header = False
+
+
+def apply_method(batch, columns):
+    in_ri = batch[batch[columns].apply(lambda x: (x == RHODE_ISLAND_STATE_CODE).any(), axis=1)]
+    not_in_ri = batch[~batch[columns].apply(lambda x: (x == RHODE_ISLAND_STATE_CODE).any(), axis=1)]
+    return len(in_ri), len(not_in_ri)
+
+
+def vectorized_method(batch, columns):
+    ri_mask, _ = classify_ri_evidence(batch, columns)
+    return int(ri_mask.sum()), int((~ri_mask).sum())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=8000000)
+    parser.add_argument('--chunk-size', type=int, default=200000)
+    parser.add_argument('--file', default='synthetic_nppes_states.csv')
+    parser.add_argument('--apply-chunks', type=int, default=3,
+                        help='Only time the (slow) apply method on the first N chunks and extrapolate')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.file):
+        print(f"Writing {args.rows} synthetic rows to {args.file}")
+        write_synthetic_nppes(args.file, args.rows)
+
+    columns = [NPPES_PREFIX + col for col in STATE_COLUMNS]
+    apply_times, vectorized_times = [], []
+    for chunk_index, batch in enumerate(pd.read_csv(args.file, chunksize=args.chunk_size, low_memory=False)):
+        batch = batch.add_prefix(NPPES_PREFIX)
+
+        start = time.perf_counter()
+        vectorized_counts = vectorized_method(batch, columns)
+        vectorized_times.append(time.perf_counter() - start)
+
+        if chunk_index < args.apply_chunks:
+            start = time.perf_counter()
+            apply_counts = apply_method(batch, columns)
+            apply_times.append(time.perf_counter() - start)
+            assert apply_counts == vectorized_counts, (apply_counts, vectorized_counts)
+
+    num_chunks = len(vectorized_times)
+    apply_per_chunk = sum(apply_times) / len(apply_times)
+    vectorized_per_chunk = sum(vectorized_times) / num_chunks
+    print(f"Chunks: {num_chunks} of {args.chunk_size} rows")
+    print(f"apply (x2) per chunk:          {apply_per_chunk:8.3f} s  (~{apply_per_chunk * num_chunks:8.1f} s for the file)")
+    print(f"classify_ri_evidence per chunk: {vectorized_per_chunk:8.3f} s  ({sum(vectorized_times):8.1f} s for the file)")
+    print(f"Speedup: {apply_per_chunk / vectorized_per_chunk:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
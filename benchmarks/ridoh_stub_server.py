@@ -0,0 +1,150 @@
+"""Local stand-in for the RIDOH license verification site (healthri.mylicense.com) to test verification against.
+
+Serves the search form, the result grid and the licensee detail pages with the element ids/names the verification
+code looks for, built from RIDOH licensee extract CSVs. Like the real site the search form is an ASP.NET post back
+(hidden __VIEWSTATE / __EVENTVALIDATION fields that have to be posted back), license numbers are matched with a
+leading wildcard and --delay adds a per-page latency.
+
+Of note, the pages are generated here from the element ids / names the verification code uses rather than recorded
+from healthri.mylicense.com - passing against the stub shows the verification flow works, not that its parsing still
+matches the real site's markup. Check a handful of look-ups against the real site after any change to the parsing.
+
+    python benchmarks/ridoh_stub_server.py input_files/Physician-licensee-extract-2024-10-07.csv --port 8765
+
+then point SeleniumRidohSession(search_url='http://localhost:8765/verification/Search.aspx') at it.
+"""
+import argparse
+import html
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+
+PROFESSIONS = ['Physician', 'Physician Assistant', 'Nursing', 'Midwifery']
+SCHOOLS = ['Brown University', 'Boston University', 'University of Rhode Island', 'Rhode Island College', 'Yale University']
+VIEWSTATE = 'dDwtMTI3OTMzNDM4NDs7Pg=='
+EVENT_VALIDATION = '/wEWBQKM54rGBgLEhISFCwKd5I/lCgLs0bLrBgKM54rGBg=='
+
+
+def load_licensees(csv_paths):
+    licensees = pd.concat([pd.read_csv(path, dtype=str) for path in csv_paths], ignore_index=True).fillna('')
+    # The extracts don't include education - give everyone a made up (but stable) school and graduation date
+    seeds = [zlib.crc32(license_no.encode()) for license_no in licensees['License No']]
+    licensees['School'] = [SCHOOLS[seed % len(SCHOOLS)] for seed in seeds]
+    licensees['Graduation Date'] = [f'05/15/{1970 + seed % 50}' for seed in seeds]
+    return licensees
+
+
+def search_page():
+    options = ''.join(f'<option value="{p}">{p}</option>' for p in [''] + PROFESSIONS)
+    return f'''<html><body><form name="Form1" method="post" action="Search.aspx" id="Form1">
+<input type="hidden" name="__VIEWSTATE" id="__VIEWSTATE" value="{VIEWSTATE}" />
+<input type="hidden" name="__EVENTVALIDATION" id="__EVENTVALIDATION" value="{EVENT_VALIDATION}" />
+<select name="t_web_lookup__profession_name" id="t_web_lookup__profession_name">{options}</select>
+<input name="t_web_lookup__first_name" type="text" id="t_web_lookup__first_name" />
+<input name="t_web_lookup__last_name" type="text" id="t_web_lookup__last_name" />
+<input name="t_web_lookup__license_no" type="text" id="t_web_lookup__license_no" />
+<input type="submit" name="sch_button" value="Search" id="sch_button" />
+</form></body></html>'''
+
+
+def results_page(matches):
+    rows = []
+    for position, (row_id, licensee) in enumerate(matches.iterrows()):
+        cells = [licensee['License No'], '', licensee['Profession'], licensee['License Type'], licensee['Status'],
+                 licensee['City'], licensee['State']]
+        rows.append(
+            f'<tr><td><a id="datagrid_results__ctl{position + 3}_name" href="Details.aspx?result={row_id}" target="_blank">'
+            f'{html.escape(licensee["Name"])}</a></td>' + ''.join(f'<td><span>{html.escape(cell)}</span></td>' for cell in cells) + '</tr>')
+    return f'<html><body><table id="datagrid_results">{"".join(rows)}</table></body></html>'
+
+
+def details_page(licensee):
+    fields = {
+        '_ctl15__ctl1_issue_date': licensee['Issue Date'],
+        '_ctl15__ctl1_expiration_date': licensee['Expiration Date'],
+        '_ctl25__ctl1_schl_name': licensee['School'],
+        '_ctl25__ctl1_date_to': licensee['Graduation Date'],
+    }
+    if licensee.get('Specialty'):
+        fields['_ctl33__ctl1_authority_code'] = licensee['Specialty']
+    spans = ''.join(f'<span id="{element_id}">{html.escape(value)}</span>' for element_id, value in fields.items())
+    return f'<html><body>{spans}</body></html>'
+
+
+def make_handler(licensees, delay):
+    class RidohStubHandler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status, body):
+            time.sleep(delay)
+            payload = body.encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path.endswith('/Search.aspx'):
+                self._send(200, search_page())
+            elif url.path.endswith('/Details.aspx'):
+                row_id = int(parse_qs(url.query).get('result', ['-1'])[0])
+                if row_id not in licensees.index:
+                    self._send(404, '<html><body>Not found</body></html>')
+                else:
+                    self._send(200, details_page(licensees.loc[row_id]))
+            else:
+                self._send(404, '<html><body>Not found</body></html>')
+
+        def do_POST(self):
+            form = parse_qs(self.rfile.read(int(self.headers.get('Content-Length', 0))).decode(), keep_blank_values=True)
+            field = lambda name: form.get(name, [''])[0].strip()
+            # ASP.NET rejects a post back that doesn't carry the page state it handed out
+            if field('__VIEWSTATE') != VIEWSTATE or field('__EVENTVALIDATION') != EVENT_VALIDATION:
+                self._send(500, '<html><body>Invalid postback or callback argument.</body></html>')
+                return
+            matches = licensees
+            if field('t_web_lookup__profession_name'):
+                matches = matches[matches['Profession'] == field('t_web_lookup__profession_name')]
+            if field('t_web_lookup__license_no'):
+                matches = matches[matches['License No'].str.upper().str.endswith(field('t_web_lookup__license_no').upper())]
+            if field('t_web_lookup__first_name'):
+                matches = matches[matches['First'].str.upper().str.startswith(field('t_web_lookup__first_name').upper())]
+            if field('t_web_lookup__last_name'):
+                matches = matches[matches['Last'].str.upper().str.startswith(field('t_web_lookup__last_name').upper())]
+            self._send(200, results_page(matches))
+
+    return RidohStubHandler
+
+
+def start_stub_server(csv_paths, port=0, delay=0.0):
+    """Start the stub server in a background thread. Returns the server - its search page is at
+    f'http://localhost:{server.server_port}/verification/Search.aspx'.
+    """
+    server = ThreadingHTTPServer(('localhost', port), make_handler(load_licensees(csv_paths), delay))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('licensee_csvs', nargs='+', help='RIDOH licensee extract CSVs')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--delay', type=float, default=0.0, help='Seconds of latency added to every page')
+    args = parser.parse_args()
+    server = start_stub_server(args.licensee_csvs, args.port, args.delay)
+    print(f'Serving http://localhost:{server.server_port}/verification/Search.aspx - Ctrl+C to stop')
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
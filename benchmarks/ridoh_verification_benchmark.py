@@ -0,0 +1,75 @@
+"""Clinicians/minute, CPU time and peak RSS of the RIDOH license verification per backend and worker pool size,
+against the local stub site.
+
+The selenium backend needs Chrome (and chromedriver) as the real run does. The stub adds --delay seconds to every
+page to stand in for the latency of the real site. The stub runs in this process and every configuration in a
+process of its own, so CPU and RSS are those of the lookups alone (including the Chrome processes of the selenium
+backend).
+
+    python benchmarks/ridoh_verification_benchmark.py final_provider_list.csv input_files/*-licensee-extract-*.csv --backend http selenium --workers 1 4 8
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from pc_constants import *
+from pc_utilities import import_csv_gracefully
+from pc_verification import verify_clinicians
+from pc_verification_http import HttpRidohSession
+from ridoh_stub_server import start_stub_server
+
+BACKENDS = ['selenium', 'http']
+
+
+def session_class(backend):
+    # selenium is only imported for the browser backend
+    if backend == 'selenium':
+        from pc_verification_selenium import SeleniumRidohSession
+        return SeleniumRidohSession
+    return HttpRidohSession
+
+
+def run(args, backend, workers, search_url):
+    providers = import_csv_gracefully('.', args.provider_list).head(args.clinicians)
+    start = time.perf_counter()
+    results = verify_clinicians(providers, lambda: session_class(backend)(search_url=search_url), workers=workers)
+    elapsed = time.perf_counter() - start
+    usage = [resource.getrusage(who) for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN)]
+    cpu_secs = sum(u.ru_utime + u.ru_stime for u in usage)
+    print(f"{backend:8s} workers={workers:3d} {len(providers)} clinicians ({len(results)} found) in {elapsed:.1f}s "
+          f"- {len(providers) / elapsed * 60:,.0f} clinicians/minute, {cpu_secs:.1f} CPU secs, "
+          f"peak RSS {max(u.ru_maxrss for u in usage) / 1024:,.0f} MB", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('provider_list', help='final_provider_list.csv written by the pipeline')
+    parser.add_argument('licensee_csvs', nargs='+', help='RIDOH licensee extract CSVs served by the stub site')
+    parser.add_argument('--clinicians', type=int, default=100)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4])
+    parser.add_argument('--delay', type=float, default=0.2)
+    parser.add_argument('--backend', nargs='+', choices=BACKENDS, default=['http'])
+    parser.add_argument('--run', nargs=3, metavar=('BACKEND', 'WORKERS', 'SEARCH_URL'), help='Run a single configuration in this process')
+    args = parser.parse_args()
+
+    if args.run:
+        run(args, args.run[0], int(args.run[1]), args.run[2])
+        return
+    server = start_stub_server(args.licensee_csvs, delay=args.delay)
+    search_url = f'http://localhost:{server.server_port}/verification/Search.aspx'
+    for backend in args.backend:
+        for workers in args.workers:
+            subprocess.run([sys.executable, os.path.abspath(__file__), args.provider_list, *args.licensee_csvs,
+                            '--clinicians', str(args.clinicians), '--run', backend, str(workers), search_url],
+                           check=True, stdout=subprocess.DEVNULL)
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
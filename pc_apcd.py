@@ -0,0 +1,72 @@
+"""APCD provider extract loading and the APCD / NPPES merge (the "Merge APCD to NPPES" step of the notebook).
+
+The extract is the output of apcd_sql_files/APCD_Data_Extract.sql - one row per billing NPI with its claim and
+member counts - either saved as CSV by hand or written as parquet by pc_apcd_source.py.
+"""
+import os
+
+import pandas as pd
+
+from pc_constants import *
+from pc_utilities import import_csv_gracefully
+
+APCD_EXTRACT_FILE_NAME = 'apcd_data_extract.csv'
+
+
+def load_apcd_providers(directory=INPUT_FILES_DIRECTORY, file_name=APCD_EXTRACT_FILE_NAME):
+    """The APCD extract without the known organizational NPIs (see KNOWN_ORGANIZATIONAL_NPIS).
+    Args:
+        file_name: The extract as CSV or, if it ends in .parquet, as written by pc_apcd_source.extract_apcd_providers
+    Returns:
+        Tuple of (APCD provider DataFrame, array of its unique NPIs)
+    """
+    if file_name.endswith('.parquet'):
+        apcd_provider_data = pd.read_parquet(os.path.join(directory, file_name))
+    else:
+        apcd_provider_data = import_csv_gracefully(directory, file_name)
+    print("Importing data from APCD yielded:", len(apcd_provider_data[APCD_NPI_COL_NAME].unique()), "unique NPIs.")
+
+    apcd_provider_data = apcd_provider_data[~apcd_provider_data[APCD_NPI_COL_NAME].isin(list(KNOWN_ORGANIZATIONAL_NPIS.keys()))]
+    unique_apcd_npis = apcd_provider_data[APCD_NPI_COL_NAME].unique()
+    print("Post dropping known organizational NPIs:", len(unique_apcd_npis), "unique NPIs.")
+    return apcd_provider_data, unique_apcd_npis
+
+
+def merge_apcd_nppes(apcd_provider_data, nppes_data, nppes_all_taxonomies, taxonomy_columns):
+    """Merge the APCD providers with their NPPES records, keeping those who EITHER billed for one of our core
+    prevention codes OR who billed only for vaccination but don't have an internal medicine subspecialty of exclusion.
+    Args:
+        apcd_provider_data: APCD providers (see load_apcd_providers)
+        nppes_data: NPPES providers with a RI connection (the output of the NPPES filter)
+        nppes_all_taxonomies: nppes_all_taxonomies.csv
+        taxonomy_columns: NPPES taxonomy code columns to look for subspecialties of exclusion in
+    Returns:
+        Tuple of (merged provider list, APCD providers whose NPI was not found in nppes_data)
+    """
+    merged_df = pd.merge(apcd_provider_data, nppes_data, left_on=APCD_NPI_COL_NAME, right_on=NPPES_NPI_COL_NAME)
+    print("After merging with NPPEs, only", len(merged_df) , "NPIs remain.")
+
+    npis_not_in_nppes = apcd_provider_data[~apcd_provider_data[APCD_NPI_COL_NAME].isin(nppes_data[NPPES_NPI_COL_NAME])]
+    print("This means that", len(npis_not_in_nppes), "NPIs from APCD are not found in NPPES. (likely because they are not RI providers)")
+    print("Of these,", len(npis_not_in_nppes[npis_not_in_nppes[APCD_TOTAL_CLAIMS_ALL_COL_NAME] <= 100]), "billed for 100 or fewer claims of ANY kind.")
+
+    providers_with_core_prevention = merged_df[merged_df[APCD_PC_CODES_PRESENT_COL_NAME] == True]
+    print("The", len(merged_df),"NPIs included", len(providers_with_core_prevention), "providers who did bill for one of our core prevention codes at least once.")
+    providers_without_core_prevention = merged_df[merged_df[APCD_PC_CODES_PRESENT_COL_NAME] == False]
+    print("And it included", len(providers_without_core_prevention), "providers who did NOT bill for one of our core prevention codes at least once.")
+
+    internal_medicine_subspecialties_to_exclude = nppes_all_taxonomies[nppes_all_taxonomies['Internal_Medicine_Subspecialty_To_Exclude'] == 'Yes'][NPPES_CODE].tolist()
+    valid_columns = [col for col in taxonomy_columns if col in providers_without_core_prevention.columns]
+    if valid_columns:
+        mask = providers_without_core_prevention[valid_columns].isin(internal_medicine_subspecialties_to_exclude).any(axis=1)
+    else:
+        mask = pd.Series([False] * len(providers_without_core_prevention))
+
+    providers_without_core_prevention_specialty = providers_without_core_prevention[mask]
+    print("Of the providers who billed only for immunizations,",len(providers_without_core_prevention_specialty), "providers had a specialty of exclusion.")
+    providers_without_core_prevention_no_specialty = providers_without_core_prevention[~mask]
+    print("Of the providers who billed only for immunizations,",len(providers_without_core_prevention_no_specialty), "providers did not have a specialty of exclusion.")
+
+    final_provider_list = pd.concat([providers_with_core_prevention, providers_without_core_prevention_no_specialty], ignore_index=True)
+    print("In total then, there were: ", len(final_provider_list), "primary care NPIs that could be matched between NPPES, RIDOH and APCD.")
+    return final_provider_list, npis_not_in_nppes
@@ -0,0 +1,242 @@
+"""Running the APCD extract (apcd_sql_files/APCD_Data_Extract.sql) straight against the database, instead of running
+it in DBeaver and saving apcd_data_extract.csv by hand.
+
+The query is run through any DB-API 2.0 connection and its result is fetched APCD_FETCH_BATCH_ROWS rows at a time -
+as Arrow record batches where the driver hands them over directly (ADBC), with fetchmany otherwise. Each
+batch is appended to a parquet file with typed columns (NPIs and counts as int64, the *_PRESENT flags as booleans)
+and the parameters the query was run with in its metadata. load_apcd_providers reads it in place of the CSV.
+
+Of note, APCD_Data_Extract.sql is T-SQL (SQL Server): DECLARE'd variables, #temp tables and DATEADD. @START_DATE
+and @APCD_MIN_CLAIM_COUNT are set by rewriting their DECLARE statements (see apcd_extract_sql). To run the same file
+against a local SQLite stand-in loaded with synthetic medical_claim rows (see create_sqlite_standin), the T-SQL is
+translated mechanically - see sqlite_statements.
+
+    python pc_apcd_source.py standin apcd_standin.sqlite --providers 2000
+    python pc_apcd_source.py extract input_files/apcd_data_extract.parquet --connection sqlite:///apcd_standin.sqlite
+    python pc_apcd_source.py extract input_files/apcd_data_extract.parquet --start-date 2023-06-01 \
+        --connection "DRIVER={ODBC Driver 18 for SQL Server};SERVER=...;DATABASE=...;Trusted_Connection=yes"
+"""
+import argparse
+import datetime
+import os
+import re
+import sqlite3
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from pc_constants import *
+from pc_utilities import current_date_time
+
+APCD_EXTRACT_SQL_PATH = os.path.join('apcd_sql_files', 'APCD_Data_Extract.sql')
+APCD_PARQUET_FILE_NAME = 'apcd_data_extract.parquet'
+# Defaults of the extract's parameters (the values DECLARE'd in APCD_Data_Extract.sql)
+APCD_START_DATE = '2022-06-01'
+APCD_MIN_CLAIM_COUNT = 10
+APCD_FETCH_BATCH_ROWS = 100000
+# A connection string starting with this opens a SQLite database (e.g. the stand-in) rather than an ODBC connection
+APCD_SQLITE_URL_PREFIX = 'sqlite:///'
+APCD_DIALECTS = ['tsql', 'sqlite']
+APCD_MEDICAL_CLAIM_TABLE = 'medical_claim'
+APCD_PRESENT_COL_SUFFIX = '_PRESENT'
+
+_DECLARE_PATTERN = re.compile(r'^DECLARE @(?P<name>\w+) (?P<type>\w+) = (?P<value>.+?);[ \t]*$', re.MULTILINE)
+_DATEADD_PATTERN = re.compile(r'DATEADD\((?P<unit>\w+),\s*(?P<number>-?\d+),\s*(?P<date>[^)]+)\)', re.IGNORECASE)
+_VARIABLE_PATTERN = re.compile(r'@(\w+)')
+
+
+def apcd_extract_sql(start_date=APCD_START_DATE, min_claim_count=APCD_MIN_CLAIM_COUNT, sql_path=APCD_EXTRACT_SQL_PATH):
+    """The T-SQL of the extract with @START_DATE and @APCD_MIN_CLAIM_COUNT declared as the given values.
+    Args:
+        start_date: First service date counted ('YYYY-MM-DD') - the two year counts start a year before it
+        min_claim_count: Claim / member counts at or below this are reported as 0
+    """
+    values = {
+        'START_DATE': f"'{datetime.date.fromisoformat(str(start_date)).isoformat()}'",
+        'APCD_MIN_CLAIM_COUNT': str(int(min_claim_count)),
+    }
+    with open(sql_path) as sql_file:
+        sql = sql_file.read()
+    declared = set()
+
+    def declare(match):
+        if match.group('name') not in values:
+            return match.group(0)
+        declared.add(match.group('name'))
+        return f"DECLARE @{match.group('name')} {match.group('type')} = {values[match.group('name')]};"
+    sql = _DECLARE_PATTERN.sub(declare, sql)
+    if declared != set(values):
+        raise ValueError(f"{sql_path} doesn't DECLARE {sorted(set(values) - declared)} - can't set the extract parameters")
+    return sql
+
+
+def sqlite_statements(sql):
+    """The statements of the extract's T-SQL translated for SQLite, in order.
+    DECLARE'd variables are inlined, DATEADD becomes date() with a modifier and #temp tables become TEMP tables -
+    enough for APCD_Data_Extract.sql, not T-SQL in general.
+    """
+    variables = {}
+    for match in _DECLARE_PATTERN.finditer(sql):
+        value = _VARIABLE_PATTERN.sub(lambda variable: variables[variable.group(1)], _dateadd_to_sqlite(match.group('value')))
+        variables[match.group('name')] = f"({value})"
+    sql = _DECLARE_PATTERN.sub('', sql)
+    sql = _VARIABLE_PATTERN.sub(lambda variable: variables[variable.group(1)], _dateadd_to_sqlite(sql))
+    sql = re.sub(r'CREATE TABLE #', 'CREATE TEMP TABLE ', sql)
+    sql = re.sub(r'#(\w+)', r'\1', sql)
+
+    statements = []
+    for statement in sql.split(';'):
+        # Comment-only pieces (e.g. after the last statement) are not statements
+        if any(line.strip() and not line.strip().startswith('--') for line in statement.splitlines()):
+            statements.append(statement.strip())
+    return statements
+
+
+def _dateadd_to_sqlite(sql):
+    return _DATEADD_PATTERN.sub(lambda match: f"date({match.group('date')}, '{match.group('number')} {match.group('unit').lower()}s')", sql)
+
+
+def connect_apcd(connection_string):
+    """DB-API connection to the APCD database and the SQL dialect to run the extract in.
+    Args:
+        connection_string: An ODBC connection string (needs pyodbc) - or APCD_SQLITE_URL_PREFIX followed by the path
+            of a SQLite database such as the stand-in
+    Returns:
+        Tuple of (connection, dialect)
+    """
+    if connection_string.startswith(APCD_SQLITE_URL_PREFIX):
+        return sqlite3.connect(connection_string[len(APCD_SQLITE_URL_PREFIX):]), 'sqlite'
+    # Imported here so pyodbc (and an ODBC driver) is only needed when the real database is used
+    import pyodbc
+    return pyodbc.connect(connection_string), 'tsql'
+
+
+def _execute_extract(cursor, sql, dialect):
+    # Leaves the cursor on the extract's result set
+    if dialect == 'sqlite':
+        for statement in sqlite_statements(sql):
+            cursor.execute(statement)
+        return
+    # The whole T-SQL batch is sent at once (the #temp tables only live as long as the session) - NOCOUNT stops every
+    # INSERT from returning a row count result ahead of the SELECT
+    cursor.execute('SET NOCOUNT ON;\n' + sql)
+    while cursor.description is None:
+        if not cursor.nextset():
+            raise RuntimeError("The APCD extract didn't return a result set")
+
+
+def apcd_arrow_schema(column_names):
+    """Arrow schema of the extract - the *_PRESENT flags are booleans and every other column an int64."""
+    return pa.schema([(col, pa.bool_() if col.endswith(APCD_PRESENT_COL_SUFFIX) else pa.int64()) for col in column_names])
+
+
+def _record_batches(cursor, arrow_schema, batch_rows):
+    fetch_record_batch = getattr(cursor, 'fetch_record_batch', None)
+    if fetch_record_batch is not None:
+        # ADBC cursors hand the result over as Arrow record batches without building Python rows
+        for batch in fetch_record_batch():
+            yield batch
+        return
+    while True:
+        rows = cursor.fetchmany(batch_rows)
+        if not rows:
+            return
+        columns = list(zip(*rows))
+        yield pa.record_batch([pa.array(column) for column in columns], names=arrow_schema.names)
+
+
+def extract_apcd_providers(connection, output_path, start_date=APCD_START_DATE, min_claim_count=APCD_MIN_CLAIM_COUNT,
+                           dialect='tsql', sql_path=APCD_EXTRACT_SQL_PATH, batch_rows=APCD_FETCH_BATCH_ROWS):
+    """Run the APCD extract and write its result to a typed parquet file.
+    Args:
+        connection: DB-API connection to the APCD database (see connect_apcd)
+        output_path: Parquet file to write - replaced only once the whole result has been written
+        start_date, min_claim_count: The extract's @START_DATE and @APCD_MIN_CLAIM_COUNT
+        dialect: 'tsql' (SQL Server) or 'sqlite' (the stand-in)
+        batch_rows: Rows fetched (and written) at a time
+    Returns:
+        Number of providers extracted
+    """
+    if dialect not in APCD_DIALECTS:
+        raise ValueError(f"Unknown SQL dialect: {dialect}. Expected one of {APCD_DIALECTS}")
+    sql = apcd_extract_sql(start_date, min_claim_count, sql_path)
+    cursor = connection.cursor()
+    print("Started APCD extract:", current_date_time(), f"(START_DATE {start_date}, APCD_MIN_CLAIM_COUNT {min_claim_count})")
+    _execute_extract(cursor, sql, dialect)
+    arrow_schema = apcd_arrow_schema([column[0] for column in cursor.description]).with_metadata({
+        'apcd_start_date': str(start_date),
+        'apcd_min_claim_count': str(min_claim_count),
+        'extracted': current_date_time(),
+    })
+
+    # Of note, written to a temporary file first so an interrupted extract never leaves a partial file behind
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    rows = 0
+    with pq.ParquetWriter(output_path + '.tmp', arrow_schema) as writer:
+        for batch in _record_batches(cursor, arrow_schema, batch_rows):
+            writer.write_table(pa.Table.from_batches([batch]).cast(arrow_schema))
+            rows += batch.num_rows
+            print("Current Time:", current_date_time(), f" Fetched so far: {rows:,} providers")
+    cursor.close()
+    os.replace(output_path + '.tmp', output_path)
+    return rows
+
+
+def create_sqlite_standin(database_path, providers=2000, start_date=APCD_START_DATE, seed=0, npis=None):
+    """A SQLite database with a medical_claim table of synthetic claim lines (see
+    pc_synthetic_data.synthetic_medical_claims) to run the extract against without APCD access. Any existing
+    database at database_path is replaced.
+    Args:
+        providers: Number of rendering providers (ignored if npis is given)
+        npis: Rendering provider NPIs, e.g. those of a synthetic NPPES file
+    Returns:
+        Number of claim lines written
+    """
+    # Imported here as pc_synthetic_data pulls in the NPPES reader
+    from pc_synthetic_data import synthetic_medical_claims
+
+    rng = np.random.default_rng(seed)
+    if npis is None:
+        npis = 1000000000 + rng.choice(999999999, size=providers, replace=False)
+    claims = synthetic_medical_claims(rng, npis, start_date)
+    if os.path.exists(database_path):
+        os.remove(database_path)
+    with sqlite3.connect(database_path) as connection:
+        claims.to_sql(APCD_MEDICAL_CLAIM_TABLE, connection, index=False, chunksize=APCD_FETCH_BATCH_ROWS)
+        # The extract filters on procedure code and service date and groups on provider
+        connection.execute(f'CREATE INDEX {APCD_MEDICAL_CLAIM_TABLE}_procedure ON {APCD_MEDICAL_CLAIM_TABLE} (procedure_code, first_service_dt)')
+        connection.execute(f'CREATE INDEX {APCD_MEDICAL_CLAIM_TABLE}_provider ON {APCD_MEDICAL_CLAIM_TABLE} (Rendering_Provider_NPI, first_service_dt)')
+    return len(claims)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    extract = subparsers.add_parser('extract', help='Run the APCD extract into a parquet file')
+    extract.add_argument('output_path', nargs='?', default=os.path.join(INPUT_FILES_DIRECTORY, APCD_PARQUET_FILE_NAME))
+    extract.add_argument('--connection', required=True, help=f'ODBC connection string, or {APCD_SQLITE_URL_PREFIX}<path> for a SQLite stand-in')
+    extract.add_argument('--start-date', default=APCD_START_DATE)
+    extract.add_argument('--min-claim-count', type=int, default=APCD_MIN_CLAIM_COUNT)
+    extract.add_argument('--batch-rows', type=int, default=APCD_FETCH_BATCH_ROWS)
+    standin = subparsers.add_parser('standin', help='Write a SQLite stand-in with synthetic medical_claim rows')
+    standin.add_argument('database_path')
+    standin.add_argument('--providers', type=int, default=2000)
+    standin.add_argument('--start-date', default=APCD_START_DATE)
+    standin.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if args.command == 'standin':
+        lines = create_sqlite_standin(args.database_path, args.providers, args.start_date, args.seed)
+        print(f"{lines:,} claim lines of {args.providers:,} providers written to {args.database_path}")
+    else:
+        connection, dialect = connect_apcd(args.connection)
+        try:
+            rows = extract_apcd_providers(connection, args.output_path, args.start_date, args.min_claim_count, dialect, batch_rows=args.batch_rows)
+        finally:
+            connection.close()
+        print(f"{rows:,} providers written to {args.output_path}")
+
+
+if __name__ == '__main__':
+    main()
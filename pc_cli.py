@@ -0,0 +1,243 @@
+"""Command line entry point to run the pipeline steps one at a time, e.g. on a headless batch host without Jupyter.
+
+Each step reads the files the step before it wrote and writes the same files the notebook does:
+    nppes-filter  APCD extract, RIDOH extracts and NPPES file -> <date>_ri_clinicians.csv
+    merge         APCD extract and <date>_ri_clinicians.csv -> final_provider_list.csv (and npis_not_in_nppes_<date>.csv)
+    tag           final_provider_list.csv -> final_provider_list.csv with roles and specialties
+    triangulate   final_provider_list.csv and RIDOH extracts -> final_provider_list.csv with confirmed (or linked) licenses
+    verify        final_provider_list.csv -> final_modified_dataframe.csv (RIDOH online license look-ups)
+    report        final_modified_dataframe.csv -> role / specialty counts and the physician FTE table
+
+Of note, only the standard library and pc_constants are imported up front - each step imports the modules it needs
+when it runs, so `--help` and the data steps start straight away and selenium is only loaded by `verify --backend
+selenium`. The plotting / widget stack is left to the notebook.
+
+    python pc_cli.py nppes-filter --nppes-file input_files/npidata_pfile_20050523-20240107.csv
+    python pc_cli.py verify --backend http --workers 8
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+from datetime import datetime
+
+from pc_constants import *
+
+DEFAULT_NPPES_FILE_NAME = 'npidata_pfile_20050523-20240107.csv'
+DEFAULT_APCD_FILE_NAME = 'apcd_data_extract.csv'
+DEFAULT_RIDOH_EXTRACT_DATE = '2024-10-07'
+RI_CLINICIANS_FILE_SUFFIX = '_ri_clinicians.csv'
+FINAL_PROVIDER_LIST_FILE_NAME = 'final_provider_list.csv'
+FINAL_MODIFIED_DATAFRAME_FILE_NAME = 'final_modified_dataframe.csv'
+NPPES_ALL_TAXONOMIES_FILE_NAME = 'nppes_all_taxonomies.csv'
+# Claims per full time equivalent, as in the notebook's productivity analysis
+PC_CLAIMS_PER_FTE = 900
+ALL_CLAIMS_PER_FTE = 3360
+
+
+def _today():
+    return datetime.now().strftime("%Y-%m-%d")
+
+
+def _prefixed(columns):
+    return [NPPES_PREFIX + col for col in columns]
+
+
+def _latest_ri_clinicians_file():
+    # Today's NPPES filter output, or failing that the most recent one
+    candidates = sorted(glob.glob(f'*{RI_CLINICIANS_FILE_SUFFIX}'))
+    today = _today() + RI_CLINICIANS_FILE_SUFFIX
+    return today if today in candidates or not candidates else candidates[-1]
+
+
+def _load_ridoh(args):
+    from pc_ridoh import load_ridoh_clinicians
+    extract_file_names = [f'{profession}-licensee-extract-{args.ridoh_extract_date}.csv'
+                          for profession in ['Physician', 'Physician-Assistant', 'Nursing', 'Midwifery']]
+    return load_ridoh_clinicians(*extract_file_names, directory=args.input_directory)
+
+
+def _read_provider_list(file_path):
+    import pandas as pd
+    # The notebook writes final_provider_list.csv with its index
+    return pd.read_csv(file_path, index_col=0, low_memory=False)
+
+
+def nppes_filter(args):
+    from pc_apcd import load_apcd_providers
+    from pc_nppes import scan_nppes
+    from pc_ridoh import RidohNameMatcher
+
+    _, unique_apcd_npis = load_apcd_providers(args.input_directory, args.apcd_file)
+    ridoh_clinicians = _load_ridoh(args)
+    ridoh_name_matcher = RidohNameMatcher(ridoh_clinicians[[RIDOH_FIRST_NAME_COL_NAME, RIDOH_LAST_NAME_COL_NAME]].itertuples(index=False, name=None))
+    ri_state_columns = _prefixed(NPPES_ADDRESS_STATE_COLUMNS + NPPES_LICENSE_STATE_COLUMNS + NPPES_IDENTIFIER_STATE_COLUMNS)
+    output_path = args.output or _today() + RI_CLINICIANS_FILE_SUFFIX
+    provider_count = scan_nppes(args.nppes_file or os.path.join(args.input_directory, DEFAULT_NPPES_FILE_NAME), output_path,
+                                args.chunk_size, unique_apcd_npis, ridoh_name_matcher, ridoh_clinicians[RIDOH_LICENSE_NO_COL_NAME],
+                                ri_state_columns, _prefixed(NPPES_LICENSE_NUMBER_COLUMNS), args.exclude_organizations,
+                                engine=args.engine, parallel=args.parallel, workers=args.workers,
+                                parquet_directory=args.parquet_directory, stream_to_disk=args.stream_to_disk)
+    print(f"{provider_count:,} providers written to {output_path}")
+
+
+def merge(args):
+    import pandas as pd
+    from pc_apcd import load_apcd_providers, merge_apcd_nppes
+
+    apcd_provider_data, _ = load_apcd_providers(args.input_directory, args.apcd_file)
+    nppes_data = pd.read_csv(args.nppes_providers or _latest_ri_clinicians_file())
+    nppes_all_taxonomies = pd.read_csv(os.path.join(args.input_directory, NPPES_ALL_TAXONOMIES_FILE_NAME))
+    final_provider_list, npis_not_in_nppes = merge_apcd_nppes(apcd_provider_data, nppes_data, nppes_all_taxonomies,
+                                                              _prefixed(NPPES_TAXONOMY_COLUMNS))
+    npis_not_in_nppes.to_csv("npis_not_in_nppes_" + _today() + ".csv")
+    final_provider_list.to_csv(args.output)
+
+
+def tag(args):
+    import pandas as pd
+    from pc_taxonomy import tag_providers
+
+    final_provider_list = _read_provider_list(args.input)
+    nppes_all_taxonomies = pd.read_csv(os.path.join(args.input_directory, NPPES_ALL_TAXONOMIES_FILE_NAME))
+    tag_providers(final_provider_list, nppes_all_taxonomies, _prefixed(NPPES_TAXONOMY_COLUMNS))
+    print(final_provider_list[RIDOH_CREDENTIAL_COLUMN_NAME].value_counts().to_string())
+    final_provider_list.to_csv(args.output)
+
+
+def triangulate(args):
+    from pc_licenses import join_provider_licenses
+    from pc_linkage import LINK_SCORE_COL_NAME, RidohLinker, link_unconfirmed_providers
+    from pc_ridoh import RidohIndex, confirm_license_specialty, group_ridoh_licensees
+
+    final_provider_list = _read_provider_list(args.input)
+    grouped_ridoh = group_ridoh_licensees(_load_ridoh(args))
+    final_provider_list[LICENSE_CLEANED_COL_NAME] = join_provider_licenses(final_provider_list)
+    final_provider_list[[CONFIRMED_LICENSE_COL_NAME, CONFIRMED_SPECIALTY_COL_NAME]] = confirm_license_specialty(final_provider_list, RidohIndex(grouped_ridoh))
+    ridoh_links = link_unconfirmed_providers(final_provider_list, RidohLinker(grouped_ridoh))
+    final_provider_list.loc[ridoh_links.index, [CONFIRMED_LICENSE_COL_NAME, CONFIRMED_SPECIALTY_COL_NAME]] = ridoh_links[[CONFIRMED_LICENSE_COL_NAME, CONFIRMED_SPECIALTY_COL_NAME]]
+    final_provider_list[LINK_SCORE_COL_NAME] = ridoh_links[LINK_SCORE_COL_NAME]
+    confirmed = (final_provider_list[CONFIRMED_LICENSE_COL_NAME] != UNCONFIRMED_STRING).sum()
+    print(f"{confirmed:,} of {len(final_provider_list):,} providers have a confirmed RIDOH license ({len(ridoh_links):,} linked on a near miss)")
+    final_provider_list.to_csv(args.output)
+
+
+def verify(args):
+    from pc_verification import verify_clinicians, write_verification_results
+    from pc_verification_cache import VerificationCache
+    if args.backend == 'http':
+        from pc_verification_http import HttpRidohSession as session_class
+    else:
+        from pc_verification_selenium import SeleniumRidohSession as session_class
+
+    final_provider_list = _read_provider_list(args.input)
+    for col in HLTHRI_COLUMNS:
+        final_provider_list[col] = ''
+    session_kwargs = {'search_url': args.search_url} if args.search_url else {}
+    verification_cache = VerificationCache(args.cache_file, args.cache_ttl_days) if args.cache_file else None
+    verification_results = verify_clinicians(final_provider_list, lambda: session_class(**session_kwargs), workers=args.workers,
+                                             cache=verification_cache)
+    if verification_cache is not None:
+        print("RIDOH verification cache:", verification_cache.summary())
+        verification_cache.close()
+    write_verification_results(final_provider_list, verification_results)
+    final_provider_list.to_csv(args.output, index=False)
+    print(f"{len(verification_results):,} of {len(final_provider_list):,} clinicians found on the RIDOH site")
+
+
+def report(args):
+    import pandas as pd
+    from pc_dashboard import add_fte_columns, claims_by_group
+
+    providers = pd.read_csv(args.input, low_memory=False)
+    providers[SPECIALTY_COLUMN_NAME] = providers[SPECIALTY_COLUMN_NAME].replace('', 'Undetermined').fillna('Undetermined')
+    gender_col = NPPES_PREFIX + NPPES_GENDER
+    providers[gender_col] = providers[gender_col].replace('', 'Unknown').fillna('Unknown')
+    physicians = providers[providers[RIDOH_CREDENTIAL_COLUMN_NAME] == ROLE_MD_DO]
+
+    print("To summarize:")
+    print("------------------------------------")
+    print(providers[RIDOH_CREDENTIAL_COLUMN_NAME].value_counts().to_string())
+    print("------------------------------------")
+    print(providers[SPECIALTY_COLUMN_NAME].value_counts().to_string())
+    print("Physician FTE equivalents (by PC claims):", physicians['APCD_CORE_PC_CLAIMS_COUNT'].sum() / args.pc_claims_per_fte)
+    print("Physician FTE equivalents (by all claims):", physicians[APCD_TOTAL_CLAIMS_ALL_COL_NAME].sum() / args.all_claims_per_fte)
+
+    # The notebook's FTE table - physicians grouped by specialty (and gender) with a total row
+    grouping_keys = [SPECIALTY_COLUMN_NAME] + ([gender_col] if args.by_gender else [])
+    fte_table = add_fte_columns(claims_by_group(physicians, grouping_keys, gender_col), args.pc_claims_per_fte, args.all_claims_per_fte)
+    print(fte_table.to_string(index=False, float_format='{:.1f}'.format))
+    if args.output:
+        fte_table.to_csv(args.output, index=False)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='step', required=True, metavar='step')
+
+    inputs = argparse.ArgumentParser(add_help=False)
+    inputs.add_argument('--input-directory', default=INPUT_FILES_DIRECTORY, help='Folder holding the input files (default: %(default)s)')
+    apcd = argparse.ArgumentParser(add_help=False)
+    apcd.add_argument('--apcd-file', default=DEFAULT_APCD_FILE_NAME, help='APCD extract in the input folder (default: %(default)s)')
+    ridoh = argparse.ArgumentParser(add_help=False)
+    ridoh.add_argument('--ridoh-extract-date', default=DEFAULT_RIDOH_EXTRACT_DATE,
+                       help='Date in the <Profession>-licensee-extract-<date>.csv file names (default: %(default)s)')
+
+    step = subparsers.add_parser('nppes-filter', parents=[inputs, apcd, ridoh], help='Keep the APCD NPIs with a RI connection from NPPES')
+    step.add_argument('--nppes-file', help=f'NPPES dissemination file (default: <input folder>/{DEFAULT_NPPES_FILE_NAME})')
+    step.add_argument('--output', help=f'Default: <today>{RI_CLINICIANS_FILE_SUFFIX}')
+    step.add_argument('--chunk-size', type=int, default=200000)
+    step.add_argument('--engine', choices=['c', 'pyarrow'], default='c', help='CSV parser (default: %(default)s)')
+    step.add_argument('--parallel', action='store_true', help='Split the file across --workers processes')
+    step.add_argument('--workers', type=int, help='Worker processes for --parallel (default: one per core)')
+    step.add_argument('--parquet-directory', help='Read the dataset converted with pc_nppes_parquet.py instead of the CSV')
+    step.add_argument('--stream-to-disk', action='store_true', help="Append each chunk's providers to the output as they come")
+    step.add_argument('--exclude-organizations', action='store_true')
+    step.set_defaults(handler=nppes_filter)
+
+    step = subparsers.add_parser('merge', parents=[inputs, apcd], help='Merge the APCD providers with their NPPES records')
+    step.add_argument('--nppes-providers', help=f'Output of nppes-filter (default: the latest *{RI_CLINICIANS_FILE_SUFFIX})')
+    step.add_argument('--output', default=FINAL_PROVIDER_LIST_FILE_NAME)
+    step.set_defaults(handler=merge)
+
+    step = subparsers.add_parser('tag', parents=[inputs], help='Tag roles and specialties from the NPPES taxonomy codes')
+    step.add_argument('--input', default=FINAL_PROVIDER_LIST_FILE_NAME)
+    step.add_argument('--output', default=FINAL_PROVIDER_LIST_FILE_NAME)
+    step.set_defaults(handler=tag)
+
+    step = subparsers.add_parser('triangulate', parents=[inputs, ridoh], help='Confirm license numbers and specialties against the RIDOH extracts')
+    step.add_argument('--input', default=FINAL_PROVIDER_LIST_FILE_NAME)
+    step.add_argument('--output', default=FINAL_PROVIDER_LIST_FILE_NAME)
+    step.set_defaults(handler=triangulate)
+
+    step = subparsers.add_parser('verify', help='Look clinicians up on the RIDOH online license verification site')
+    step.add_argument('--input', default=FINAL_PROVIDER_LIST_FILE_NAME)
+    step.add_argument('--output', default=FINAL_MODIFIED_DATAFRAME_FILE_NAME)
+    step.add_argument('--backend', choices=['selenium', 'http'], default='selenium',
+                      help="'selenium' drives the site with headless Chrome, 'http' posts the search form directly (default: %(default)s)")
+    step.add_argument('--workers', type=int, default=4, help='Concurrent look-ups (default: %(default)s)')
+    step.add_argument('--search-url', help='Search page of the verification site, e.g. a local stub server')
+    step.add_argument('--cache-file', default='ridoh_verification_cache.sqlite', help="Verification cache ('' to look everyone up)")
+    step.add_argument('--cache-ttl-days', type=float, default=90)
+    step.set_defaults(handler=verify)
+
+    step = subparsers.add_parser('report', help='Role / specialty counts and physician FTEs of the verified provider list')
+    step.add_argument('--input', default=FINAL_MODIFIED_DATAFRAME_FILE_NAME)
+    step.add_argument('--output', help='Also write the FTE table to this CSV')
+    step.add_argument('--by-gender', action='store_true', help='Group the FTE table by specialty and gender')
+    step.add_argument('--pc-claims-per-fte', type=int, default=PC_CLAIMS_PER_FTE)
+    step.add_argument('--all-claims-per-fte', type=int, default=ALL_CLAIMS_PER_FTE)
+    step.set_defaults(handler=report)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    start = time.perf_counter()
+    args.handler(args)
+    print(f"{args.step} finished in {time.perf_counter() - start:,.1f}s", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -99,6 +99,41 @@ APCD_PC_CODES_PRESENT_COL_NAME = 'APCD_PC_CODES_PRESENT'
 
 
 
+NPPES_PREFIX = 'NPPES_'
+NPPES_CALC_PREFIX = NPPES_PREFIX + 'CALC_'
+
+# Column names as they appear in the NPPES dissemination file (i.e. before NPPES_PREFIX is added)
+NPPES_NPI = 'NPI'
+NPPES_ENTITY_TYPE = 'Entity Type Code'
+NPPES_FIRST_NAME = 'Provider First Name'
+NPPES_MIDDLE_NAME = 'Provider Middle Name'
+NPPES_LAST_NAME = 'Provider Last Name (Legal Name)'
+NPPES_GENDER = 'Provider Gender Code'
+NPPES_PRACTICE_CITY = 'Provider Business Practice Location Address City Name'
+NPPES_PRACTICE_POSTAL_CODE = 'Provider Business Practice Location Address Postal Code'
+NPPES_ADDRESS_STATE_COLUMNS = ['Provider Business Mailing Address State Name', 'Provider Business Practice Location Address State Name']
+NPPES_LICENSE_NUMBER_COLUMNS = [f'Provider License Number_{i}' for i in range(1, 16)]
+NPPES_LICENSE_STATE_COLUMNS = [f'Provider License Number State Code_{i}' for i in range(1, 16)]
+NPPES_IDENTIFIER_STATE_COLUMNS = [f'Other Provider Identifier State_{i}' for i in range(1, 51)]
+NPPES_TAXONOMY_COLUMNS = [f'Healthcare Provider Taxonomy Code_{i}' for i in range(1, 16)]
+
+NPPES_NPI_COL_NAME = NPPES_PREFIX + NPPES_NPI
+NPPES_ENTITY_TYPE_CODE = NPPES_PREFIX + NPPES_ENTITY_TYPE
+NPPES_FIRST_NAME_COL_NAME = NPPES_PREFIX + NPPES_FIRST_NAME
+NPPES_MIDDLE_NAME_COL_NAME = NPPES_PREFIX + NPPES_MIDDLE_NAME
+NPPES_LAST_NAME_COL_NAME = NPPES_PREFIX + NPPES_LAST_NAME
+NPPES_PRACTICE_CITY_COL_NAME = NPPES_PREFIX + NPPES_PRACTICE_CITY
+NPPES_PRACTICE_POSTAL_CODE_COL_NAME = NPPES_PREFIX + NPPES_PRACTICE_POSTAL_CODE
+NPPES_ENTITY_TYPE_ORG_CODE = 2
+
+NPPES_IN_RI_COL_NAME = NPPES_CALC_PREFIX + 'Is In RI?'
+NPPES_RI_EVIDENCE_COL_NAME = NPPES_CALC_PREFIX + 'RI Evidence Column'
+NPPES_MATCH_RIDOH_NAME_COL_NAME = NPPES_CALC_PREFIX + 'Matched RIDOH On Name'
+NPPES_MATCH_RIDOH_LIC_COL_NAME = NPPES_CALC_PREFIX + 'Matched RIDOH On License'
+
+
+
+
 ROLE_MISC_OTHER = 'Misc Other'
 ROLE_PODIATRY = 'Podiatrist'
 ROLE_OPTOMETRY = 'Optometrist'
@@ -115,6 +150,37 @@ ROLE_MD_DO = 'Physician'
 
 RIDOH_PREFIX = 'RIDOH_'
 
+RIDOH_FIRST_NAME_COL_NAME = RIDOH_PREFIX + 'First'
+RIDOH_LAST_NAME_COL_NAME = RIDOH_PREFIX + 'Last'
+RIDOH_LICENSE_NO_COL_NAME = RIDOH_PREFIX + 'License No'
+RIDOH_CREDENTIAL_COLUMN_NAME = RIDOH_PREFIX + 'Credential'
+SPECIALTY_COLUMN_NAME = RIDOH_PREFIX + 'Specialty'
+
+RIDOH_NAME_COL_NAME = RIDOH_PREFIX + 'Name'
+RIDOH_MIDDLE_COL_NAME = RIDOH_PREFIX + 'Middle'
+RIDOH_LIC_TYPE_COL_NAME = RIDOH_PREFIX + 'License Type'
+RIDOH_STATUS_COL_NAME = RIDOH_PREFIX + 'Status'
+RIDOH_ISSUE_DATE_COL_NAME = RIDOH_PREFIX + 'Issue Date'
+RIDOH_EXP_DATE_COL_NAME = RIDOH_PREFIX + 'Expiration Date'
+RIDOH_ADDRESS_ONE_COL_NAME = RIDOH_PREFIX + 'Address Line 1'
+RIDOH_ADDRESS_TWO_COL_NAME = RIDOH_PREFIX + 'Address Line 2'
+RIDOH_ADDRESS_THREE_COL_NAME = RIDOH_PREFIX + 'Address Line 3'
+RIDOH_CITY_COL_NAME = RIDOH_PREFIX + 'City'
+RIDOH_STATE_COL_NAME = RIDOH_PREFIX + 'State'
+RIDOH_ZIP_COL_NAME = RIDOH_PREFIX + 'Zip'
+RIDOH_EMAIL_COL_NAME = RIDOH_PREFIX + 'Email'
+RIDOH_PHONE_COL_NAME = RIDOH_PREFIX + 'Phone'
+RIDOH_FAX_COL_NAME = RIDOH_PREFIX + 'Fax'
+RIDOH_PROF_COL_NAME = RIDOH_PREFIX + 'Profession'
+
+LICENSE_CLEANED_COL_NAME = 'License Cleaned'
+LICENSE_CLEANED_MINIMAL_COL_NAME = 'License Cleaned Minimal'
+RIDOH_FULL_NAME_COL_NAME = 'full_name_concatenated'
+CONFIRMED_LICENSE_COL_NAME = 'Confirmed License'
+CONFIRMED_SPECIALTY_COL_NAME = 'Confirmed RIDOH Specialty'
+ROLE_TAXONOMY_VALUES_COL_NAME = 'Included_taxonomy_values_role'
+SPECIALTY_TAXONOMY_VALUES_COL_NAME = 'Included_taxonomy_values_specialty'
+
 SPECIALTY_EM = 'Emergency Medicine'
 SPECIALTY_INTEG_MEDICINE = 'Integrative Medicine'
 SPECIALTY_PREVENT_MEDICINE = 'Preventive Medicine'
@@ -139,4 +205,25 @@ NPP_PREFIX = 'NPP'
 CAPRN_PREFIX = 'CAPRN'
 LP_PREFIX = 'LP'
 
-UNCONFIRMED_STRING = 'Unconfirmed'
\ No newline at end of file
+UNCONFIRMED_STRING = 'Unconfirmed'
+
+# Columns filled in from the RIDOH online license verification (healthri.mylicense.com)
+METHOD_LIC = 'License Look-up'
+METHOD_NAME = 'First and Last Name Look-up'
+
+HLTHRI_ISSUE_DATE_COL_NAME = 'RIDOH Issue Date'
+HLTHRI_EXP_DATE_COL_NAME = 'RIDOH Expiration Date'
+HLTHRI_SCHOOL_NAME_COL_NAME = 'RIDOH School Name'
+HLTHRI_GRAD_DATE_COL_NAME = 'RIDOH Graduation Date'
+HLTHRI_SPEC_INFO_COL_NAME = 'RIDOH Specialty Info'
+HLTHRI_METHD_COL_NAME = 'RIDOH Methodology'
+HLTHRI_LIC_NO_COL_NAME = 'RIDOH Discovered License No'
+HLTHRI_NAME_COL_NAME = 'RIDOH Discovered Name'
+HLTHRI_PROF_COL_NAME = 'RIDOH Discovered Profession'
+HLTHRI_LIC_TYPE_COL_NAME = 'RIDOH Discovered License Type'
+HLTHRI_LIC_STATUS_COL_NAME = 'RIDOH Discovered License Status'
+HLTHRI_CITY_COL_NAME = 'RIDOH Discovered City'
+HLTHRI_STATE_COL_NAME = 'RIDOH Discovered State'
+HLTHRI_COLUMNS = [HLTHRI_ISSUE_DATE_COL_NAME, HLTHRI_EXP_DATE_COL_NAME, HLTHRI_SCHOOL_NAME_COL_NAME, HLTHRI_GRAD_DATE_COL_NAME,
+                  HLTHRI_SPEC_INFO_COL_NAME, HLTHRI_METHD_COL_NAME, HLTHRI_LIC_NO_COL_NAME, HLTHRI_NAME_COL_NAME, HLTHRI_PROF_COL_NAME,
+                  HLTHRI_LIC_TYPE_COL_NAME, HLTHRI_LIC_STATUS_COL_NAME, HLTHRI_CITY_COL_NAME, HLTHRI_STATE_COL_NAME]
@@ -0,0 +1,165 @@
+"""Precomputed aggregates behind the notebook's interactive charts and tables.
+
+The Geographic Analysis dashboard filters on credential, institution country and specialty and shows one pie chart
+per institution country / state / region / division and graduation decade. PieChartCube counts every chart's values
+once for every combination of filter values (and ALL_VALUE for each filter), so a dropdown change is a dictionary
+lookup that doesn't depend on the size of the dataset.
+
+The productivity widgets (the FTE table and the claims histogram) are backed by ProviderAggregates, which groups the
+providers once per grouping / specialty selection and keeps the most recent results - a new FTE factor only rescales
+two columns of a cached table.
+"""
+import functools
+import itertools
+
+import pandas as pd
+
+from pc_constants import *
+
+ALL_VALUE = 'ALL'
+OTHER_SLICE_NAME = 'OTHER'
+PIE_CHART_COLUMNS = ['Institution_Country', 'Institution_State', 'Institution_Region_Census', 'Institution_Division_Census', 'Graduation_Decade']
+# Values that are left out of every pie chart ('nan' is a graduation decade with no graduation date)
+PIE_CHART_EXCLUDED_VALUES = ['Unknown', 'nan']
+
+TOTAL_ROW_NAME = 'Total'
+PC_CLAIMS_COL_NAME = 'APCD_CORE_PC_CLAIMS_COUNT'
+FTE_TABLE_PC_CLAIMS_COL_NAME = 'Total Primary Care Claims'
+FTE_TABLE_ALL_CLAIMS_COL_NAME = 'Total Claims'
+FTE_TABLE_PROVIDERS_COL_NAME = 'Number of Providers'
+FTE_TABLE_PC_FTE_COL_NAME = 'Full Equiv. by Primary Care Claims'
+FTE_TABLE_ALL_FTE_COL_NAME = 'Full Equiv. by All Claims'
+# Grouped tables / histogram counts kept per ProviderAggregates (least recently used dropped first)
+AGGREGATE_CACHE_SIZE = 16
+
+
+class PieChartCube:
+    """Value counts of each of chart_columns for every combination of filter_columns values.
+    Args:
+        data: One row per provider
+        filter_columns: Columns the dashboard filters on, in the order their values are passed to counts()
+        chart_columns: Columns with a pie chart each
+        excluded_values: Values not counted in any chart
+    """
+    def __init__(self, data, filter_columns, chart_columns=PIE_CHART_COLUMNS, excluded_values=PIE_CHART_EXCLUDED_VALUES):
+        self.filter_columns = list(filter_columns)
+        self.chart_columns = list(chart_columns)
+        self.cells = {}
+        for chart_column in self.chart_columns:
+            counted = data[~data[chart_column].isin(excluded_values)]
+            # Of note, the counts of a filter left at ALL_VALUE are rolled up from the finest counts rather than
+            # re-counted from data
+            finest_counts = counted.groupby(self.filter_columns + [chart_column], sort=False).size()
+            for selected_count in range(len(self.filter_columns) + 1):
+                for selected in itertools.combinations(range(len(self.filter_columns)), selected_count):
+                    self._add_counts(finest_counts, chart_column, selected)
+
+    def _add_counts(self, finest_counts, chart_column, selected):
+        # selected holds the positions of the filters that have a value (the others are ALL_VALUE). Levels are
+        # referred to by position as a chart column can also be a filter column
+        counts = finest_counts.groupby(level=list(selected) + [len(self.filter_columns)], sort=False).sum()
+        # Largest first - ties keep the order the values were first seen in
+        counts = counts.sort_values(ascending=False, kind='stable')
+        if not selected:
+            groups = [((), counts)]
+        else:
+            groups = counts.groupby(level=list(range(len(selected))) if len(selected) > 1 else 0, sort=False)
+        for values, group in groups:
+            values = values if isinstance(values, tuple) else (values,)
+            key = [ALL_VALUE] * len(self.filter_columns)
+            for position, value in zip(selected, values):
+                key[position] = value
+            group.index = group.index.get_level_values(-1).rename(chart_column)
+            self.cells.setdefault(tuple(key), {})[chart_column] = group
+
+    def counts(self, *filter_values):
+        """Counts of every chart column (largest first) for one value (or ALL_VALUE) per filter column.
+        Returns:
+            Dict of chart column to a Series of counts indexed by its values - empty if no provider matches
+        """
+        cell = self.cells.get(tuple(filter_values), {})
+        return {chart_column: cell.get(chart_column, pd.Series(dtype='int64')) for chart_column in self.chart_columns}
+
+
+def top_slices(counts, num_slices=8):
+    """The num_slices - 1 largest counts plus an OTHER_SLICE_NAME slice holding the rest (if any), largest first.
+    Args:
+        counts: Series of counts sorted largest first (see PieChartCube.counts)
+    Returns:
+        Tuple of (slice names, slice values)
+    """
+    slices = counts.iloc[:num_slices - 1].copy()
+    other_count = counts.iloc[num_slices - 1:].sum()
+    if other_count > 0:
+        slices[OTHER_SLICE_NAME] = other_count
+        slices = slices.sort_values(ascending=False, kind='stable')
+    return slices.index, slices.values
+
+
+def claims_by_group(providers, grouping_keys, gender_column=None):
+    """Primary care claims, all claims and number of providers per group, followed by a TOTAL_ROW_NAME row.
+    Args:
+        grouping_keys: Columns to group on (the first holds TOTAL_ROW_NAME in the total row, the others '')
+        gender_column: Grouping column to rename to 'Gender' in the table, if any
+    """
+    grouped = providers.groupby(list(grouping_keys)).agg(**{
+        FTE_TABLE_PC_CLAIMS_COL_NAME: (PC_CLAIMS_COL_NAME, 'sum'),
+        FTE_TABLE_ALL_CLAIMS_COL_NAME: (APCD_TOTAL_CLAIMS_ALL_COL_NAME, 'sum'),
+        FTE_TABLE_PROVIDERS_COL_NAME: (grouping_keys[0], 'size'),
+    }).reset_index()
+    if gender_column is not None:
+        grouped = grouped.rename(columns={gender_column: 'Gender'})
+    total_row = [TOTAL_ROW_NAME] + [''] * (len(grouping_keys) - 1) + grouped.iloc[:, len(grouping_keys):].sum().tolist()
+    return pd.concat([grouped, pd.DataFrame([total_row], columns=grouped.columns)], ignore_index=True)
+
+
+def add_fte_columns(claims_table, pc_claims_per_fte, all_claims_per_fte):
+    """A copy of claims_table (see claims_by_group) with the full time equivalents by primary care claims and by
+    all claims - a column is left out when its claims per FTE isn't greater than zero.
+    """
+    fte_table = claims_table.copy()
+    if pc_claims_per_fte > 0:
+        fte_table[FTE_TABLE_PC_FTE_COL_NAME] = fte_table[FTE_TABLE_PC_CLAIMS_COL_NAME] / pc_claims_per_fte
+    if all_claims_per_fte > 0:
+        fte_table[FTE_TABLE_ALL_FTE_COL_NAME] = fte_table[FTE_TABLE_ALL_CLAIMS_COL_NAME] / all_claims_per_fte
+    return fte_table
+
+
+class ProviderAggregates:
+    """Memoized aggregates of one set of providers for the productivity widgets.
+    Each grouping (or specialty selection) is aggregated once - later requests for it, e.g. with another FTE factor,
+    are served from a small LRU cache.
+    Args:
+        providers: One row per provider (not modified - the aggregates assume it doesn't change afterwards)
+        gender_column: Column renamed to 'Gender' in the FTE tables
+        cache_size: Number of results kept per kind of aggregate
+    """
+    def __init__(self, providers, gender_column=None, cache_size=AGGREGATE_CACHE_SIZE):
+        self.providers = providers
+        self.gender_column = gender_column
+        self.claims_table = functools.lru_cache(maxsize=cache_size)(self._claims_table)
+        self.bin_counts = functools.lru_cache(maxsize=cache_size)(self._bin_counts)
+        self._bin_crosstabs = {}
+
+    def _claims_table(self, grouping_keys):
+        return claims_by_group(self.providers, list(grouping_keys), self.gender_column)
+
+    def fte_table(self, grouping_keys, pc_claims_per_fte, all_claims_per_fte):
+        """The FTE table of the providers grouped on grouping_keys (see claims_by_group and add_fte_columns)."""
+        return add_fte_columns(self.claims_table(tuple(grouping_keys)), pc_claims_per_fte, all_claims_per_fte)
+
+    def _bin_counts(self, bin_column, specialties):
+        # Of note, the providers are counted per specialty and bin once - a selection is then the sum of its specialties
+        if bin_column not in self._bin_crosstabs:
+            self._bin_crosstabs[bin_column] = pd.crosstab(self.providers[SPECIALTY_COLUMN_NAME], self.providers[bin_column], dropna=False)
+        crosstab = self._bin_crosstabs[bin_column]
+        if specialties is not None:
+            crosstab = crosstab[crosstab.index.isin(specialties)]
+        return crosstab.sum().rename('count')
+
+    def histogram_counts(self, bin_column, specialties=None):
+        """Number of providers in each bin of bin_column (a categorical, e.g. from pd.cut), in bin order.
+        Args:
+            specialties: Only count providers with one of these specialties (None counts everyone)
+        """
+        return self.bin_counts(bin_column, tuple(sorted(specialties)) if specialties is not None else None)
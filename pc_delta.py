@@ -0,0 +1,142 @@
+"""Delta runs - only the providers whose inputs changed since the last run are tagged, triangulated and verified.
+
+Every run saves a snapshot (delta_snapshot/ by default) holding:
+    - a fingerprint of every provider's merged APCD / NPPES record, keyed on NPI
+    - a fingerprint of every RIDOH licensee record, with its license number and name
+    - a signature of the reference files and code the later steps use
+    - a copy of the run's final_modified_dataframe.csv
+A delta run compares the new inputs against that snapshot and only sends a provider through the later steps if they
+are new, their merged APCD / NPPES record changed, or a RIDOH record under their name or under the license they were
+confirmed with last time was added, removed or changed. Everyone else is carried forward from the previous
+final_modified_dataframe.csv. Every provider is processed if there is no snapshot yet or the signature changed.
+"""
+import hashlib
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from pc_constants import *
+from pc_pipeline import code_version, hash_file
+from pc_ridoh import RidohNameMatcher
+
+DELTA_SNAPSHOT_DIRECTORY = 'delta_snapshot'
+DELTA_PROVIDERS_FILE_NAME = 'providers.csv'
+DELTA_RIDOH_FILE_NAME = 'ridoh.csv'
+DELTA_SIGNATURE_FILE_NAME = 'signature.txt'
+DELTA_RESULTS_FILE_NAME = 'final_modified_dataframe.csv'
+FINGERPRINT_COL_NAME = 'Fingerprint'
+DELTA_KEY_COL_NAME = 'Delta Key'
+DELTA_RIDOH_COLUMNS = [RIDOH_LICENSE_NO_COL_NAME, RIDOH_FIRST_NAME_COL_NAME, RIDOH_LAST_NAME_COL_NAME]
+
+
+def row_fingerprints(frame):
+    # Hashed as strings, so that object columns mixing numbers and text hash the same from one run to the next
+    return pd.util.hash_pandas_object(frame.astype(str), index=False).astype(str).to_numpy()
+
+
+def provider_keys(npis):
+    # NPI, numbered in case it appears more than once (e.g. an NPPES file with duplicate records) - '1234567890#0'
+    npis = npis.astype(str)
+    return npis + '#' + npis.groupby(npis).cumcount().astype(str)
+
+
+def _read_snapshot_csv(snapshot_directory, file_name):
+    # Everything is read back as text (blank stays NaN) so carried forward values are written out exactly as they were read
+    return pd.read_csv(os.path.join(snapshot_directory, file_name), dtype=str)
+
+
+class DeltaRun:
+    """Works out which providers a run has to process, and saves the snapshot the next run compares against.
+    Args:
+        providers: Merged APCD / NPPES providers, before any tagging
+        ridoh_clinicians: RIDOH licensee records (as loaded from the licensee extracts)
+        reference_files: Paths of the other input files the later steps read (e.g. nppes_all_taxonomies.csv)
+        code: Modules / functions the later steps use
+        snapshot_directory: Where the snapshot is kept
+        enabled: False processes every provider - the snapshot is still saved, so the next run can be a delta run
+    """
+    def __init__(self, providers, ridoh_clinicians, reference_files=(), code=(), snapshot_directory=DELTA_SNAPSHOT_DIRECTORY, enabled=True):
+        self.snapshot_directory = snapshot_directory
+        self.keys = provider_keys(providers[APCD_NPI_COL_NAME])
+        self.provider_fingerprints = pd.DataFrame({DELTA_KEY_COL_NAME: self.keys.to_numpy(), FINGERPRINT_COL_NAME: row_fingerprints(providers)})
+        self.ridoh_fingerprints = ridoh_clinicians[DELTA_RIDOH_COLUMNS].fillna('').astype(str)
+        self.ridoh_fingerprints[FINGERPRINT_COL_NAME] = row_fingerprints(ridoh_clinicians)
+
+        hasher = hashlib.blake2b(digest_size=16)
+        for path in reference_files:
+            hasher.update(hash_file(path).encode())
+        for code_item in code:
+            hasher.update(code_version(code_item).encode())
+        self.signature = hasher.hexdigest()
+
+        self.process_mask = np.ones(len(providers), dtype=bool)
+        self.carried_forward = pd.DataFrame()
+        if not enabled:
+            self.reason = 'delta mode is off'
+        elif not all(os.path.exists(os.path.join(snapshot_directory, file_name)) for file_name in
+                     [DELTA_PROVIDERS_FILE_NAME, DELTA_RIDOH_FILE_NAME, DELTA_SIGNATURE_FILE_NAME, DELTA_RESULTS_FILE_NAME]):
+            self.reason = 'no snapshot from a previous run'
+        else:
+            with open(os.path.join(snapshot_directory, DELTA_SIGNATURE_FILE_NAME)) as signature_file:
+                previous_signature = signature_file.read().strip()
+            if previous_signature != self.signature:
+                self.reason = 'the reference files or code changed since the last run'
+            else:
+                self.reason = 'compared with the last run'
+                self._compare(providers)
+
+    def _compare(self, providers):
+        previous_providers = _read_snapshot_csv(self.snapshot_directory, DELTA_PROVIDERS_FILE_NAME)
+        previous_results = _read_snapshot_csv(self.snapshot_directory, DELTA_RESULTS_FILE_NAME)
+        previous_results.index = provider_keys(previous_results[APCD_NPI_COL_NAME])
+
+        # New providers, providers whose APCD / NPPES record changed and any missing from the previous results
+        previous_fingerprints = self.keys.map(previous_providers.set_index(DELTA_KEY_COL_NAME)[FINGERPRINT_COL_NAME])
+        changed = (previous_fingerprints.to_numpy() != self.provider_fingerprints[FINGERPRINT_COL_NAME].to_numpy())
+        changed |= ~self.keys.isin(previous_results.index).to_numpy()
+
+        # RIDOH records that were added, removed or changed - the old and new versions of a changed record both show up
+        previous_ridoh = _read_snapshot_csv(self.snapshot_directory, DELTA_RIDOH_FILE_NAME).fillna('')
+        ridoh_changes = previous_ridoh.merge(self.ridoh_fingerprints, how='outer', indicator=True)
+        ridoh_changes = ridoh_changes[ridoh_changes['_merge'] != 'both']
+        changed_names = RidohNameMatcher(ridoh_changes[[RIDOH_FIRST_NAME_COL_NAME, RIDOH_LAST_NAME_COL_NAME]].itertuples(index=False, name=None))
+        changed |= changed_names.match(providers[NPPES_FIRST_NAME_COL_NAME], providers[NPPES_LAST_NAME_COL_NAME])
+        previous_licenses = self.keys.map(previous_results[CONFIRMED_LICENSE_COL_NAME])
+        changed |= previous_licenses.isin(set(ridoh_changes[RIDOH_LICENSE_NO_COL_NAME]) - {''}).to_numpy()
+
+        self.process_mask = changed
+        carried_keys = self.keys[~changed]
+        self.carried_forward = previous_results.loc[carried_keys.to_numpy()].set_axis(carried_keys.index, axis=0)
+
+    def to_process(self, providers):
+        """The providers (a copy of the rows of the providers passed in) that have to go through the later steps."""
+        # A copy, as the later steps add columns to it
+        return providers[self.process_mask].copy()
+
+    def combine(self, processed):
+        """The processed providers plus those carried forward from the last run, in the original provider order."""
+        if self.carried_forward.empty:
+            return processed
+        missing_columns = [col for col in processed.columns if col not in self.carried_forward.columns]
+        if missing_columns:
+            raise ValueError(f"The last run's results don't have the columns {missing_columns} - rerun with delta mode off")
+        return pd.concat([processed, self.carried_forward[processed.columns]]).sort_index()
+
+    def save(self, results):
+        """Save the snapshot for the next run - results is the complete final_modified_dataframe of this run."""
+        # Written to a staging folder first so an interrupted save never leaves a mix of two runs behind
+        staging_directory = self.snapshot_directory + '.tmp'
+        shutil.rmtree(staging_directory, ignore_errors=True)
+        os.makedirs(staging_directory)
+        self.provider_fingerprints.to_csv(os.path.join(staging_directory, DELTA_PROVIDERS_FILE_NAME), index=False)
+        self.ridoh_fingerprints.to_csv(os.path.join(staging_directory, DELTA_RIDOH_FILE_NAME), index=False)
+        results.to_csv(os.path.join(staging_directory, DELTA_RESULTS_FILE_NAME), index=False)
+        with open(os.path.join(staging_directory, DELTA_SIGNATURE_FILE_NAME), 'w') as signature_file:
+            signature_file.write(self.signature)
+        shutil.rmtree(self.snapshot_directory, ignore_errors=True)
+        os.replace(staging_directory, self.snapshot_directory)
+
+    def summary(self):
+        return f"{self.process_mask.sum():,} of {len(self.process_mask):,} providers to process, {len(self.carried_forward):,} carried forward ({self.reason})"
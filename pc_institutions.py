@@ -0,0 +1,150 @@
+"""Resolving the school names scraped from the RIDOH license look-ups to the institutions of
+educational_institutional_lookup.csv.
+
+Scraped names differ from the lookup in casing, punctuation, abbreviations ("Univ.", "Sch of Med") and in naming
+the school or campus ("Brown University Alpert Medical School" vs "Brown University"). Names are first normalized
+(lower case, no accents or punctuation, abbreviations expanded and words such as "school" or "of" dropped) and then:
+    - a name whose normalized form is that of a lookup institution resolves to it with a confidence of 1.0
+    - otherwise its character trigrams are looked up in an inverted index over the lookup institutions and only the
+      institutions sharing a (not too common) trigram are scored - by the cosine similarity of their TF-IDF weighted
+      trigrams. The best one is used if its score is at least the resolver's min_confidence.
+Resolved names are cached, so each distinct school name is only scored once.
+"""
+import math
+import re
+import unicodedata
+
+import pandas as pd
+
+INSTITUTION_COL_NAME = 'Institution'
+INSTITUTION_MATCH_COL_NAME = 'Institution Match'
+INSTITUTION_MATCH_CONFIDENCE_COL_NAME = 'Institution Match Confidence'
+# Fuzzy matches scoring below this are left unresolved
+INSTITUTION_MIN_CONFIDENCE = 0.7
+# Trigrams found in more than this share of the institutions (e.g. those of "university") aren't used to find candidates
+INSTITUTION_MAX_TRIGRAM_SHARE = 0.1
+
+INSTITUTION_ABBREVIATIONS = {
+    'univ': 'university', 'universidad': 'university', 'universite': 'university', 'universita': 'university',
+    'coll': 'college', 'inst': 'institute', 'tech': 'technology', 'sch': 'school', 'med': 'medicine', 'm': 'medicine',
+    'calif': 'california', 'cal': 'california', 'ctr': 'center', 'hosp': 'hospital', 'osteo': 'osteopathic',
+    'nurs': 'nursing', 'hlth': 'health', 'sci': 'sciences', 'mt': 'mount', 'ft': 'fort',
+}
+# Single letter abbreviations are only expanded when written with a period ("N. Carolina", but not "U.S.") - a bare s
+# is more often left over from a possessive
+INSTITUTION_DIRECTION_ABBREVIATIONS = {'n': 'north', 's': 'south'}
+# Words that say which school / campus of an institution is meant rather than which institution it is
+INSTITUTION_IGNORED_WORDS = {
+    'the', 'of', 'at', 'and', 'in', 'for', 'de', 'la', 'del', 'school', 'medicine', 'medical', 'faculty', 'campus',
+}
+_NON_ALPHANUMERIC_PATTERN = re.compile(r'[^a-z0-9]+')
+_DIRECTION_ABBREVIATION_PATTERN = re.compile(r'(?<![a-z]\.)\b([ns])\.')
+
+
+def normalize_institution_name(name):
+    """Lower case words of name without accents, punctuation or INSTITUTION_IGNORED_WORDS, abbreviations expanded -
+    '' for a missing name.
+    """
+    if not isinstance(name, str):
+        return ''
+    name = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode('ascii').lower().replace('&', ' and ')
+    # Of note, apostrophes are dropped rather than split on so "George's" stays one word
+    name = _DIRECTION_ABBREVIATION_PATTERN.sub(lambda match: INSTITUTION_DIRECTION_ABBREVIATIONS[match.group(1)] + ' ', name).replace("'", '')
+    words = [INSTITUTION_ABBREVIATIONS.get(word, word) for word in _NON_ALPHANUMERIC_PATTERN.split(name) if word]
+    return ' '.join(word for word in words if word not in INSTITUTION_IGNORED_WORDS)
+
+
+def _trigrams(normalized_name):
+    # Each word is padded so that trigrams also mark where words start and end
+    trigrams = {}
+    for word in normalized_name.split():
+        padded = f' {word} '
+        for start in range(len(padded) - 2):
+            trigram = padded[start:start + 3]
+            trigrams[trigram] = trigrams.get(trigram, 0) + 1
+    return trigrams
+
+
+class InstitutionResolver:
+    """Resolves school names to the institutions of a lookup table.
+    Args:
+        institutions: Institution names of the lookup table (the first of several with the same normalized name wins)
+        min_confidence: Lowest fuzzy match score that resolves a name
+        max_trigram_share: See INSTITUTION_MAX_TRIGRAM_SHARE
+    """
+    def __init__(self, institutions, min_confidence=INSTITUTION_MIN_CONFIDENCE, max_trigram_share=INSTITUTION_MAX_TRIGRAM_SHARE):
+        self.min_confidence = min_confidence
+        self.institutions = []
+        self.by_normalized_name = {}
+        for institution in institutions:
+            normalized_name = normalize_institution_name(institution)
+            if normalized_name and normalized_name not in self.by_normalized_name:
+                self.by_normalized_name[normalized_name] = len(self.institutions)
+                self.institutions.append(institution)
+        self.exact_names = set(self.institutions)
+
+        institution_trigrams = [_trigrams(normalized_name) for normalized_name in self.by_normalized_name]
+        document_frequency = {}
+        for trigrams in institution_trigrams:
+            for trigram in trigrams:
+                document_frequency[trigram] = document_frequency.get(trigram, 0) + 1
+        institution_count = len(self.institutions)
+        self.idf = {trigram: math.log((1 + institution_count) / (1 + frequency)) + 1 for trigram, frequency in document_frequency.items()}
+
+        # Unit length TF-IDF vectors of the institutions, and the inverted index of their distinctive trigrams
+        self.vectors = [self._vector(trigrams) for trigrams in institution_trigrams]
+        max_frequency = max(1, max_trigram_share * institution_count)
+        self.index = {}
+        for position, trigrams in enumerate(institution_trigrams):
+            for trigram in trigrams:
+                if document_frequency[trigram] <= max_frequency:
+                    self.index.setdefault(trigram, []).append(position)
+        self._cache = {}
+
+    def _vector(self, trigrams):
+        # Trigrams not seen in the lookup can't be shared with an institution but still count towards the name's length
+        max_idf = math.log(1 + len(self.institutions)) + 1
+        vector = {trigram: count * self.idf.get(trigram, max_idf) for trigram, count in trigrams.items()}
+        norm = math.sqrt(sum(weight * weight for weight in vector.values())) or 1.0
+        return {trigram: weight / norm for trigram, weight in vector.items()}
+
+    def _score(self, normalized_name):
+        vector = self._vector(_trigrams(normalized_name))
+        candidates = {position for trigram in vector for position in self.index.get(trigram, ())}
+        best_position, best_score = None, 0.0
+        for position in candidates:
+            institution_vector = self.vectors[position]
+            score = sum(weight * institution_vector.get(trigram, 0.0) for trigram, weight in vector.items())
+            if score > best_score:
+                best_position, best_score = position, score
+        return best_position, best_score
+
+    def resolve(self, name):
+        """The lookup institution name is resolved to and the confidence of the match (1.0 for a name that is the
+        same once normalized) - (None, best score) if nothing scores at least min_confidence.
+        """
+        if name in self.exact_names:
+            return name, 1.0
+        if name in self._cache:
+            return self._cache[name]
+        normalized_name = normalize_institution_name(name)
+        if not normalized_name:
+            resolved = (None, 0.0)
+        elif normalized_name in self.by_normalized_name:
+            resolved = (self.institutions[self.by_normalized_name[normalized_name]], 1.0)
+        else:
+            position, score = self._score(normalized_name)
+            resolved = (self.institutions[position] if score >= self.min_confidence else None, round(score, 3))
+        self._cache[name] = resolved
+        return resolved
+
+    def resolve_column(self, names):
+        """INSTITUTION_MATCH_COL_NAME and INSTITUTION_MATCH_CONFIDENCE_COL_NAME for a column of school names - each
+        distinct name is resolved once. Returns a DataFrame indexed like names.
+        """
+        resolved = {name: self.resolve(name) for name in pd.unique(names.dropna())}
+        matches = names.map(lambda name: resolved.get(name, (None, 0.0)))
+        return pd.DataFrame({
+            INSTITUTION_MATCH_COL_NAME: [match for match, _ in matches],
+            INSTITUTION_MATCH_CONFIDENCE_COL_NAME: [confidence for _, confidence in matches],
+        }, index=names.index)
@@ -0,0 +1,96 @@
+"""License number normalization for matching NPPES licenses to RIDOH licenses.
+
+NPPES lists up to 15 license numbers per provider (Provider License Number_1..15) and RIDOH one per licensee, and
+either may carry an MD / DO / LP prefix. Licenses are normalized a whole column at a time with pandas str methods
+and one compiled pattern, into two forms:
+    cleaned - the prefix and a zero right after it removed (MD012345 -> 12345)
+    minimal - only the prefix removed (MD012345 -> 012345)
+A license that is missing or blank is '' in both forms.
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+from pc_constants import *
+from pc_utilities import add_source_db_prefix
+
+# Of note, the zero and the whitespace around the number are groups of their own so that both forms come out of a
+# single match, already stripped
+LICENSE_PREFIX_PATTERN = re.compile(rf'^(?:(?:{MD_PREFIX}|{DO_PREFIX}|{LP_PREFIX})(?P<zero>0?))?(?P<space>\s*)(?P<number>.*?)\s*$', re.DOTALL)
+PROVIDER_LICENSE_NUMBER_COLUMNS = [add_source_db_prefix(col, NPPES_PREFIX) for col in NPPES_LICENSE_NUMBER_COLUMNS]
+LICENSE_SLOT_COL_NAME = 'License Slot'
+LICENSE_SEPARATOR = ', '
+
+
+def _license_strings(values):
+    # A license column with only digits in it is read back from CSV as numbers - turn 12345.0 back into '12345'
+    if pd.api.types.is_numeric_dtype(values):
+        whole = values.dropna()
+        if (whole == np.floor(whole)).all():
+            return values.astype('Int64').astype(str).where(values.notna())
+    return values.astype(str).where(values.notna())
+
+
+def normalize_licenses(values):
+    """Cleaned and minimal forms of a column of license numbers.
+    Args:
+        values: Series of license numbers
+    Returns:
+        DataFrame with the LICENSE_CLEANED_COL_NAME and LICENSE_CLEANED_MINIMAL_COL_NAME columns, indexed like values
+    """
+    parts = _license_strings(values).str.extract(LICENSE_PREFIX_PATTERN).fillna('')
+    # Whitespace between the zero and the number is kept in the minimal form (as it isn't leading whitespace there)
+    inner_space = parts['space'].where((parts['zero'] != '') & (parts['number'] != ''), '')
+    return pd.DataFrame({
+        LICENSE_CLEANED_COL_NAME: parts['number'],
+        LICENSE_CLEANED_MINIMAL_COL_NAME: parts['zero'] + inner_space + parts['number'],
+    }, index=values.index)
+
+
+def _stacked_provider_licenses(providers, license_columns):
+    # One row per non-missing license (position of the provider in providers, slot), normalized in a single pass
+    license_columns = [col for col in license_columns if col in providers.columns]
+    stacked = []
+    for slot, col in enumerate(license_columns, start=1):
+        licenses = _license_strings(providers[col].reset_index(drop=True))
+        licenses = licenses[licenses.notna()]
+        stacked.append(pd.DataFrame({'position': licenses.index, LICENSE_SLOT_COL_NAME: slot, 'license': licenses.to_numpy()}))
+    if not stacked:
+        return pd.DataFrame(columns=['position', LICENSE_SLOT_COL_NAME, LICENSE_CLEANED_COL_NAME, LICENSE_CLEANED_MINIMAL_COL_NAME])
+    stacked = pd.concat(stacked, ignore_index=True)
+    normalized = normalize_licenses(stacked.pop('license'))
+    return pd.concat([stacked, normalized], axis=1)
+
+
+def join_provider_licenses(providers, license_columns=PROVIDER_LICENSE_NUMBER_COLUMNS):
+    """Every provider's cleaned licenses joined with LICENSE_SEPARATOR, in license slot order - the
+    LICENSE_CLEANED_COL_NAME column of the provider list. License columns missing from providers are skipped.
+    Returns:
+        Series of strings ('' for a provider without licenses), indexed like providers
+    """
+    stacked = _stacked_provider_licenses(providers, license_columns)
+    stacked = stacked[stacked[LICENSE_CLEANED_COL_NAME] != '']
+    wide = stacked.pivot(index='position', columns=LICENSE_SLOT_COL_NAME, values=LICENSE_CLEANED_COL_NAME)
+    wide = wide.reindex(range(len(providers))).fillna('')
+
+    # Of note, the slots are appended one column at a time (rather than joining row by row) - a separator is only
+    # added between two licenses
+    joined = pd.Series('', index=wide.index, dtype=object)
+    for slot in wide.columns:
+        licenses = wide[slot]
+        joined = joined.where(licenses == '', joined.where(joined == '', joined + LICENSE_SEPARATOR) + licenses)
+    return pd.Series(joined.to_numpy(), index=providers.index, dtype=object)
+
+
+def provider_license_table(providers, npi_column=NPPES_NPI_COL_NAME, license_columns=PROVIDER_LICENSE_NUMBER_COLUMNS):
+    """The set of licenses of every NPI as a long table - one row per NPI and distinct cleaned license.
+    Returns:
+        DataFrame with the npi_column, LICENSE_SLOT_COL_NAME (first slot the license was listed in),
+        LICENSE_CLEANED_COL_NAME and LICENSE_CLEANED_MINIMAL_COL_NAME columns
+    """
+    stacked = _stacked_provider_licenses(providers, license_columns)
+    stacked = stacked[stacked[LICENSE_CLEANED_COL_NAME] != '']
+    stacked.insert(0, npi_column, providers[npi_column].to_numpy()[stacked['position'].to_numpy(dtype=int)])
+    stacked = stacked.drop(columns='position').sort_values([npi_column, LICENSE_SLOT_COL_NAME], kind='stable')
+    return stacked.drop_duplicates([npi_column, LICENSE_CLEANED_COL_NAME]).reset_index(drop=True)
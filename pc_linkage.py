@@ -0,0 +1,303 @@
+"""Offline linkage of the providers confirm_license_specialty leaves Unconfirmed to the RIDOH licensees.
+
+Most of them are near misses of the exact name / credential / license match - a hyphenated or changed surname, a
+middle name folded into the first name, a nickname or a license with two digits swapped. Every provider linked here
+gets the RIDOH license (and specialty) it is looked up with on the verification site, rather than a slower and less
+reliable name search.
+
+RIDOH licensees are blocked (indexed) once on:
+    - the credential group (see LINK_CREDENTIAL_GROUPS) and the Soundex code of each part of their last name
+    - the credential group and the sorted digits of their license - so a swapped digit or a changed surname still
+      finds the licensee
+so each provider is only scored against the handful of licensees sharing a block with them. A pair's score is the
+LINK_FIELD_WEIGHTS weighted sum of its field scores (each 0 to 1) - see RidohLinker.score. Without any license
+evidence a pair can't reach LINK_MIN_SCORE, so names alone never link.
+"""
+import re
+
+import pandas as pd
+
+from pc_constants import *
+from pc_licenses import LICENSE_SEPARATOR
+
+LINK_SCORE_COL_NAME = 'RIDOH Link Score'
+# Pairs scoring below this are not linked
+LINK_MIN_SCORE = 0.85
+# A provider whose two best licensees (with different licenses) score within this of each other is left unlinked
+LINK_MIN_MARGIN = 0.05
+LINK_FIELD_WEIGHTS = {'last': 0.3, 'first': 0.25, 'middle': 0.1, 'license': 0.25, 'location': 0.1}
+
+# Provider credential to the group of RIDOH licensees they can be linked to - of note, the nursing extract has no
+# credential, so nursing licensees are grouped on their profession instead
+LINK_CREDENTIAL_GROUPS = {
+    ROLE_MD_DO: ROLE_MD_DO,
+    ROLE_PA: ROLE_PA,
+    ROLE_NP: 'Nursing',
+    ROLE_NURSE: 'Nursing',
+    ROLE_CLIN_NURSE_SPECIALIST: 'Nursing',
+    ROLE_CERT_NURSE_MIDWIFE: 'Midwifery',
+}
+
+# Each group of first names is treated as the same name
+NICKNAME_GROUPS = [
+    ['WILLIAM', 'BILL', 'WILL', 'BILLY', 'LIAM'], ['ROBERT', 'BOB', 'ROB', 'BOBBY', 'BERT'], ['RICHARD', 'RICK', 'DICK', 'RICH'],
+    ['JAMES', 'JIM', 'JIMMY', 'JAMIE'], ['JOHN', 'JACK', 'JOHNNY'], ['JOSEPH', 'JOE', 'JOEY'], ['MICHAEL', 'MIKE', 'MICK'],
+    ['THOMAS', 'TOM', 'TOMMY'], ['CHRISTOPHER', 'CHRIS'], ['CHRISTINE', 'CHRISTINA', 'CHRIS', 'TINA'], ['DANIEL', 'DAN', 'DANNY'],
+    ['DAVID', 'DAVE'], ['EDWARD', 'ED', 'EDDIE', 'TED'], ['STEPHEN', 'STEVEN', 'STEVE'], ['ANTHONY', 'TONY'], ['ANDREW', 'ANDY', 'DREW'],
+    ['MATTHEW', 'MATT'], ['NICHOLAS', 'NICK'], ['ALEXANDER', 'ALEX'], ['ALEXANDRA', 'ALEX', 'SASHA'], ['BENJAMIN', 'BEN'],
+    ['SAMUEL', 'SAM'], ['SAMANTHA', 'SAM'], ['JONATHAN', 'JON'], ['TIMOTHY', 'TIM'], ['PATRICK', 'PAT'], ['PATRICIA', 'PAT', 'PATTY', 'TRISH'],
+    ['PETER', 'PETE'], ['GREGORY', 'GREG'], ['KENNETH', 'KEN'], ['RONALD', 'RON'], ['DONALD', 'DON'], ['GERALD', 'JERRY'],
+    ['LAWRENCE', 'LARRY'], ['CHARLES', 'CHARLIE', 'CHUCK'], ['FREDERICK', 'FRED'], ['ELIZABETH', 'LIZ', 'BETH', 'BETSY', 'ELIZA', 'LIZZIE'],
+    ['MARGARET', 'MAGGIE', 'PEGGY', 'MEG'], ['KATHERINE', 'CATHERINE', 'KATHRYN', 'KATE', 'KATIE', 'KATHY', 'CATHY'],
+    ['JENNIFER', 'JENNY', 'JEN'], ['JESSICA', 'JESS'], ['REBECCA', 'BECKY'], ['SUSAN', 'SUE', 'SUZY'], ['DEBORAH', 'DEBRA', 'DEBBIE', 'DEB'],
+    ['VICTORIA', 'VICKY', 'TORI'], ['ABIGAIL', 'ABBY'], ['PAMELA', 'PAM'], ['CYNTHIA', 'CINDY'], ['KIMBERLY', 'KIM'], ['ELEANOR', 'ELLIE'],
+]
+NICKNAMES = {}
+for _group_number, _names in enumerate(NICKNAME_GROUPS):
+    for _name in _names:
+        NICKNAMES.setdefault(_name, set()).add(_group_number)
+
+_NAME_PART_PATTERN = re.compile(r'[^A-Z]+')
+_SOUNDEX_CODES = {letter: str(code) for code, letters in enumerate(['AEIOUYHW', 'BFPV', 'CGJKQSXZ', 'DT', 'L', 'MN', 'R']) for letter in letters}
+
+
+def name_parts(name):
+    """Upper case letter-only parts of a name - 'Smith-Jones ' is ['SMITH', 'JONES'] and a missing name []."""
+    if not isinstance(name, str):
+        return []
+    return [part for part in _NAME_PART_PATTERN.split(name.upper()) if part]
+
+
+def soundex(name):
+    """American Soundex code of a single upper case name part ('' for '')."""
+    if not name:
+        return ''
+    code = name[0]
+    previous = _SOUNDEX_CODES.get(name[0], '')
+    for letter in name[1:]:
+        digit = _SOUNDEX_CODES.get(letter, '')
+        # H and W don't separate two letters with the same code, vowels do
+        if digit not in ('', '0') and digit != previous:
+            code += digit
+        if letter not in 'HW':
+            previous = digit
+    return (code + '000')[:4]
+
+
+def jaro_winkler(a, b):
+    """Jaro-Winkler similarity of two strings (0 to 1)."""
+    if a == b:
+        return 1.0 if a else 0.0
+    if not a or not b:
+        return 0.0
+    window = max(0, max(len(a), len(b)) // 2 - 1)
+    a_matched, b_matched = [False] * len(a), [False] * len(b)
+    matches = 0
+    for i, letter in enumerate(a):
+        for j in range(max(0, i - window), min(len(b), i + window + 1)):
+            if not b_matched[j] and b[j] == letter:
+                a_matched[i] = b_matched[j] = True
+                matches += 1
+                break
+    if not matches:
+        return 0.0
+    a_letters = [letter for letter, matched in zip(a, a_matched) if matched]
+    b_letters = [letter for letter, matched in zip(b, b_matched) if matched]
+    transpositions = sum(x != y for x, y in zip(a_letters, b_letters)) / 2
+    jaro = (matches / len(a) + matches / len(b) + (matches - transpositions) / matches) / 3
+    prefix = 0
+    for x, y in zip(a[:4], b[:4]):
+        if x != y:
+            break
+        prefix += 1
+    return jaro + prefix * 0.1 * (1 - jaro)
+
+
+def _zip5(values):
+    # ZIP codes come back from CSV as numbers (2903 for 02903) or ZIP+4 text - the first 5 digits, '' if missing
+    digits = values.astype(str).str.replace(r'\.0$', '', regex=True).str.replace(r'\D', '', regex=True).where(values.notna(), '')
+    zip5s = digits.where(digits.str.len() <= 5, digits.str.zfill(9).str[:5]).str.zfill(5)
+    return zip5s.where(digits != '', '')
+
+
+def _city(values):
+    return values.fillna('').astype(str).str.strip().str.upper()
+
+
+def _license_key(license_number):
+    # Sorted digits of a license - a license with two digits swapped has the same key
+    digits = ''.join(sorted(character for character in license_number if character.isdigit()))
+    return digits if len(digits) >= 4 else None
+
+
+def license_similarity(provider_licenses, cleaned, minimal):
+    """1.0 if one of provider_licenses is the RIDOH license (cleaned or minimal), 0.8 if one has the same digits in
+    another order and 0.6 if one is a single character away from it - otherwise 0.0.
+    """
+    if not cleaned:
+        return 0.0
+    best = 0.0
+    for provider_license in provider_licenses:
+        if provider_license in (cleaned, minimal):
+            return 1.0
+        if len(provider_license) == len(cleaned) and _license_key(cleaned) is not None and _license_key(provider_license) == _license_key(cleaned):
+            best = max(best, 0.8)
+        elif len(cleaned) >= 4 and _one_edit_apart(provider_license, cleaned):
+            best = max(best, 0.6)
+    return best
+
+
+def _one_edit_apart(a, b):
+    if abs(len(a) - len(b)) > 1 or a == b:
+        return False
+    if len(a) == len(b):
+        return sum(x != y for x, y in zip(a, b)) == 1
+    shorter, longer = (a, b) if len(a) < len(b) else (b, a)
+    return any(longer[:i] + longer[i + 1:] == shorter for i in range(len(longer)))
+
+
+class _Record:
+    # The parts of one person's record the score uses
+    __slots__ = ('first', 'middle_initial', 'last', 'licenses', 'minimal', 'city', 'zip5')
+
+    def __init__(self, first, middle, last, licenses, minimal, city, zip5):
+        first_parts, middle_parts = name_parts(first), name_parts(middle)
+        # Of note, a middle name folded into the first name ('MARY ANN') still gives a middle initial
+        if not middle_parts and len(first_parts) > 1:
+            middle_parts = first_parts[1:]
+        self.first = first_parts
+        self.middle_initial = middle_parts[0][0] if middle_parts else ''
+        self.last = name_parts(last)
+        self.licenses = licenses
+        self.minimal = minimal
+        self.city = city
+        self.zip5 = zip5
+
+
+def _first_name_similarity(provider, licensee):
+    if not provider.first or not licensee.first:
+        return 0.0
+    provider_first, licensee_first = provider.first[0], licensee.first[0]
+    if provider_first == licensee_first or NICKNAMES.get(provider_first, set()) & NICKNAMES.get(licensee_first, set()):
+        return 1.0
+    # Goes by their middle name, or has it folded into the first name the other way round
+    if provider_first in licensee.first[1:] or licensee_first in provider.first[1:]:
+        return 0.9
+    if len(provider_first) == 1 or len(licensee_first) == 1:
+        return 0.7 if provider_first[0] == licensee_first[0] else 0.0
+    return jaro_winkler(provider_first, licensee_first)
+
+
+def _last_name_similarity(provider, licensee):
+    if not provider.last or not licensee.last:
+        return 0.0
+    similarity = jaro_winkler(''.join(provider.last), ''.join(licensee.last))
+    # A hyphenated (or double) surname sharing a part with the other one
+    if set(provider.last) & set(licensee.last):
+        similarity = max(similarity, 0.95)
+    return similarity
+
+
+def _location_similarity(provider, licensee):
+    both_zips = bool(provider.zip5 and licensee.zip5)
+    if both_zips and provider.zip5 == licensee.zip5:
+        return 1.0
+    if provider.city and licensee.city:
+        return 0.6 if provider.city == licensee.city else 0.0
+    return 0.0 if both_zips else 0.5
+
+
+class RidohLinker:
+    """Blocking indexes over grouped_ridoh (see pc_ridoh.group_ridoh_licensees), built once, for linking providers
+    to RIDOH licensees.
+    Args:
+        grouped_ridoh: One row per RIDOH licensee
+        weights: Weight of each field's score (see LINK_FIELD_WEIGHTS) - they should add up to 1
+    """
+    def __init__(self, grouped_ridoh, weights=LINK_FIELD_WEIGHTS):
+        self.weights = weights
+        self.license_numbers = grouped_ridoh[RIDOH_LICENSE_NO_COL_NAME].to_numpy()
+        self.specialties = grouped_ridoh[SPECIALTY_COLUMN_NAME].to_numpy()
+        groups = grouped_ridoh[RIDOH_CREDENTIAL_COLUMN_NAME].map(LINK_CREDENTIAL_GROUPS).fillna(grouped_ridoh[RIDOH_PROF_COL_NAME])
+
+        self.records = []
+        self.blocks = {}
+        for position, (group, first, middle, last, cleaned, minimal, city, zip5) in enumerate(zip(
+                groups, grouped_ridoh[RIDOH_FIRST_NAME_COL_NAME], grouped_ridoh[RIDOH_MIDDLE_COL_NAME],
+                grouped_ridoh[RIDOH_LAST_NAME_COL_NAME], grouped_ridoh[LICENSE_CLEANED_COL_NAME],
+                grouped_ridoh[LICENSE_CLEANED_MINIMAL_COL_NAME], _city(grouped_ridoh[RIDOH_CITY_COL_NAME]),
+                _zip5(grouped_ridoh[RIDOH_ZIP_COL_NAME]))):
+            record = _Record(first, middle, last, [cleaned], minimal, city, zip5)
+            self.records.append(record)
+            if pd.isna(group):
+                continue
+            for key in self._block_keys(group, record):
+                self.blocks.setdefault(key, []).append(position)
+
+    @staticmethod
+    def _block_keys(group, record):
+        keys = {(group, 'name', soundex(part)) for part in record.last}
+        keys.update((group, 'license', _license_key(license_number)) for license_number in record.licenses if _license_key(license_number))
+        return keys
+
+    def candidates(self, group, record):
+        """Positions (in grouped_ridoh order) of the licensees sharing a block with a provider."""
+        return sorted({position for key in self._block_keys(group, record) for position in self.blocks.get(key, ())})
+
+    def score(self, provider, position):
+        """Weighted sum of the last name, first name, middle initial, license and city / ZIP scores of a provider and
+        the licensee at position:
+            last - Jaro-Winkler (at least 0.95 when the two share a part of a hyphenated or double surname)
+            first - 1.0 for the same name or nicknames of it, 0.9 when one is the other's middle name, 0.7 for a
+                matching initial, otherwise Jaro-Winkler
+            middle - 1.0 for the same middle initial, 0.0 for different ones and 0.5 if either is missing
+            license - see license_similarity
+            location - 1.0 for the same ZIP code, 0.6 for the same city, 0.5 if it can't be told
+        """
+        licensee = self.records[position]
+        if provider.middle_initial and licensee.middle_initial:
+            middle = 1.0 if provider.middle_initial == licensee.middle_initial else 0.0
+        else:
+            middle = 0.5
+        field_scores = {
+            'last': _last_name_similarity(provider, licensee),
+            'first': _first_name_similarity(provider, licensee),
+            'middle': middle,
+            'license': license_similarity(provider.licenses, licensee.licenses[0], licensee.minimal),
+            'location': _location_similarity(provider, licensee),
+        }
+        return sum(self.weights[field] * field_score for field, field_score in field_scores.items())
+
+
+def link_unconfirmed_providers(providers, ridoh_linker, min_score=LINK_MIN_SCORE, min_margin=LINK_MIN_MARGIN):
+    """Link the providers without a confirmed license (and with a credential in LINK_CREDENTIAL_GROUPS) to the RIDOH
+    licensee they score best against, if that scores at least min_score and no licensee with another license scores
+    within min_margin of it.
+    Returns:
+        DataFrame with the CONFIRMED_LICENSE_COL_NAME, CONFIRMED_SPECIALTY_COL_NAME and LINK_SCORE_COL_NAME columns of
+        the linked providers only, indexed like providers
+    """
+    unconfirmed = providers[(providers[CONFIRMED_LICENSE_COL_NAME] == UNCONFIRMED_STRING) &
+                            providers[RIDOH_CREDENTIAL_COLUMN_NAME].isin(list(LINK_CREDENTIAL_GROUPS))]
+    cities = _city(unconfirmed.get(NPPES_PRACTICE_CITY_COL_NAME, pd.Series(index=unconfirmed.index, dtype=object)))
+    zip5s = _zip5(unconfirmed.get(NPPES_PRACTICE_POSTAL_CODE_COL_NAME, pd.Series(index=unconfirmed.index, dtype=object)))
+
+    links = {}
+    for index, credential, first, middle, last, licenses, city, zip5 in zip(
+            unconfirmed.index, unconfirmed[RIDOH_CREDENTIAL_COLUMN_NAME], unconfirmed[NPPES_FIRST_NAME_COL_NAME],
+            unconfirmed[NPPES_MIDDLE_NAME_COL_NAME], unconfirmed[NPPES_LAST_NAME_COL_NAME],
+            unconfirmed[LICENSE_CLEANED_COL_NAME].fillna(''), cities, zip5s):
+        provider = _Record(first, middle, last, [item.strip() for item in licenses.split(LICENSE_SEPARATOR.strip()) if item.strip()], '', city, zip5)
+        if not provider.first or not provider.last:
+            continue
+        scored = sorted(((ridoh_linker.score(provider, position), position) for position in
+                         ridoh_linker.candidates(LINK_CREDENTIAL_GROUPS[credential], provider)), key=lambda item: -item[0])
+        if not scored or scored[0][0] < min_score:
+            continue
+        best_score, best_position = scored[0]
+        best_license = ridoh_linker.license_numbers[best_position]
+        if any(best_score - score < min_margin and ridoh_linker.license_numbers[position] != best_license for score, position in scored[1:]):
+            continue
+        links[index] = (best_license, ridoh_linker.specialties[best_position], round(best_score, 3))
+
+    return pd.DataFrame.from_dict(links, orient='index', columns=[CONFIRMED_LICENSE_COL_NAME, CONFIRMED_SPECIALTY_COL_NAME, LINK_SCORE_COL_NAME])
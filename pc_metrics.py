@@ -0,0 +1,188 @@
+"""Run metrics - wall time, CPU time, rows in/out, peak RSS and cache hits per pipeline stage, per NPPES chunk and
+per RIDOH verification lookup.
+
+The notebook records into a single RunMetrics and, at the end of the run, prints a summary table and writes a JSON
+run report (run_reports/run_report_<date>_<time>.json). Each run is compared against the previous report so that a
+step or lookup latency that has got noticeably slower is flagged.
+"""
+import contextlib
+import glob
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+from pc_utilities import current_date_time, peak_rss_mb
+
+RUN_REPORT_DIRECTORY = 'run_reports'
+RUN_REPORT_FILE_PREFIX = 'run_report_'
+# Flag stages / lookups that got slower than the previous run by more than this fraction...
+REGRESSION_TOLERANCE = 0.25
+# ...and by more than this many seconds (so sub-second noise isn't flagged)
+REGRESSION_MIN_SECS = 0.5
+# Event values that are totalled in the summaries
+SUMMED_EVENT_VALUES = ['rows_in', 'rows_out', 'read_secs', 'cache_hit', 'found']
+
+
+def _process_cpu_secs():
+    # Includes finished child processes, e.g. the parallel NPPES workers
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+
+def _summarize(values):
+    values = np.asarray(values, dtype=float)
+    if len(values) == 0:
+        return {}
+    return {'total': float(values.sum()), 'mean': float(values.mean()), 'p50': float(np.percentile(values, 50)),
+            'p95': float(np.percentile(values, 95)), 'max': float(values.max())}
+
+
+class RunMetrics:
+    """Collects the metrics of one pipeline run. Events (NPPES chunks, lookups) can be recorded from several threads."""
+    def __init__(self):
+        self.started = current_date_time()
+        self.stages = []
+        self.events = {}
+        self._open_stage = None
+        self._lock = threading.Lock()
+
+    def begin_stage(self, name, **values):
+        """Start timing a stage (values such as rows_in are stored with it). An open stage is ended first, so
+        re-running a notebook cell part way doesn't leave stages overlapping.
+        """
+        if self._open_stage is not None:
+            self.end_stage()
+        self._open_stage = {'stage': name, **values, '_start_wall': time.perf_counter(), '_start_cpu': _process_cpu_secs()}
+
+    def end_stage(self, **values):
+        """Finish the open stage - values such as rows_out or cache_hits are stored with it."""
+        stage = self._open_stage
+        if stage is None:
+            return
+        self._open_stage = None
+        stage.update(values)
+        stage['wall_secs'] = time.perf_counter() - stage.pop('_start_wall')
+        stage['cpu_secs'] = _process_cpu_secs() - stage.pop('_start_cpu')
+        stage['peak_rss_mb'] = peak_rss_mb()
+        self.stages.append(stage)
+
+    def record(self, kind, **values):
+        with self._lock:
+            self.events.setdefault(kind, []).append(values)
+
+    @contextlib.contextmanager
+    def measure(self, kind, **values):
+        """Times the block as one event of kind - yields the event so values can be added to it inside the block.
+        CPU time is that of the current thread.
+        """
+        event = dict(values)
+        start_wall, start_cpu = time.perf_counter(), time.thread_time()
+        try:
+            yield event
+        finally:
+            event['wall_secs'] = time.perf_counter() - start_wall
+            event['cpu_secs'] = time.thread_time() - start_cpu
+            self.record(kind, **event)
+
+    def timed(self, kind, iterable):
+        """Iterates over iterable, yielding (event, item) - each item is an event of kind covering the time taken to
+        produce it (read_secs) plus the time the loop body spent on it. Values added to event are stored with it.
+        """
+        iterator = iter(iterable)
+        while True:
+            start_wall, start_cpu = time.perf_counter(), _process_cpu_secs()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            event = {'read_secs': time.perf_counter() - start_wall}
+            yield event, item
+            event['wall_secs'] = time.perf_counter() - start_wall
+            event['cpu_secs'] = _process_cpu_secs() - start_cpu
+            event['peak_rss_mb'] = peak_rss_mb()
+            self.record(kind, **event)
+
+    def event_summary(self, kind):
+        """Count of the events of kind, wall / CPU time statistics and totals of their SUMMED_EVENT_VALUES."""
+        with self._lock:
+            events = list(self.events.get(kind, []))
+        summary = {'count': len(events), 'wall_secs': _summarize([e['wall_secs'] for e in events if 'wall_secs' in e]),
+                   'cpu_secs': _summarize([e['cpu_secs'] for e in events if 'cpu_secs' in e])}
+        for key in SUMMED_EVENT_VALUES:
+            values = [event[key] for event in events if event.get(key) is not None]
+            if values:
+                summary[key] = float(np.sum(values))
+        return summary
+
+    def report(self):
+        return {
+            'started': self.started,
+            'finished': current_date_time(),
+            'peak_rss_mb': peak_rss_mb(),
+            'stages': self.stages,
+            'events': {kind: {'summary': self.event_summary(kind), 'items': self.events[kind]} for kind in self.events},
+        }
+
+    def write_report(self, directory=RUN_REPORT_DIRECTORY):
+        """Write the JSON run report to directory. Returns its path."""
+        os.makedirs(directory, exist_ok=True)
+        report_path = os.path.join(directory, f"{RUN_REPORT_FILE_PREFIX}{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+        with open(report_path, 'w') as report_file:
+            json.dump(self.report(), report_file, indent=2, default=str)
+        return report_path
+
+    def summary_table(self):
+        """Human readable table of the stages and events recorded so far."""
+        lines = [f"{'Stage':<24}{'Wall (s)':>10}{'CPU (s)':>10}{'Rows in':>12}{'Rows out':>12}{'Peak RSS (MB)':>15}  Notes"]
+        for stage in self.stages:
+            notes = ', '.join(f'{key}={value}' for key, value in stage.items()
+                              if key not in ('stage', 'wall_secs', 'cpu_secs', 'rows_in', 'rows_out', 'peak_rss_mb'))
+            lines.append(f"{stage['stage']:<24}{stage['wall_secs']:>10.1f}{stage['cpu_secs']:>10.1f}"
+                         f"{_format_count(stage.get('rows_in')):>12}{_format_count(stage.get('rows_out')):>12}"
+                         f"{_format_count(stage.get('peak_rss_mb')):>15}  {notes}")
+        for kind in self.events:
+            summary = self.event_summary(kind)
+            wall = summary['wall_secs']
+            totals = ', '.join(f'{key}={value:,.1f}' if key.endswith('_secs') else f'{key}={value:,.0f}'
+                               for key, value in summary.items() if key not in ('count', 'wall_secs', 'cpu_secs'))
+            lines.append(f"{kind}: {summary['count']:,} - wall p50 {wall.get('p50', 0):.2f}s, p95 {wall.get('p95', 0):.2f}s, "
+                         f"max {wall.get('max', 0):.2f}s, CPU {summary['cpu_secs'].get('total', 0):.1f}s" + (f" - {totals}" if totals else ''))
+        return '\n'.join(lines)
+
+    def regressions(self, previous_report, tolerance=REGRESSION_TOLERANCE, min_secs=REGRESSION_MIN_SECS):
+        """Stages (wall time) and events (p95 wall time) that got slower than in previous_report by more than
+        tolerance (a fraction) and min_secs. Returns a list of messages.
+        """
+        if previous_report is None:
+            return []
+        slower = lambda previous, current: current > previous * (1 + tolerance) and current - previous > min_secs
+        messages = []
+        previous_stages = {stage['stage']: stage for stage in previous_report.get('stages', [])}
+        for stage in self.stages:
+            previous = previous_stages.get(stage['stage'])
+            # A stage restored from the pipeline artifacts is only compared with another restored run of it
+            if previous is not None and previous.get('cached') == stage.get('cached') and slower(previous['wall_secs'], stage['wall_secs']):
+                messages.append(f"Stage {stage['stage']} took {stage['wall_secs']:.1f}s, up from {previous['wall_secs']:.1f}s")
+        for kind in self.events:
+            previous_p95 = previous_report.get('events', {}).get(kind, {}).get('summary', {}).get('wall_secs', {}).get('p95')
+            current_p95 = self.event_summary(kind)['wall_secs'].get('p95')
+            if previous_p95 is not None and current_p95 is not None and slower(previous_p95, current_p95):
+                messages.append(f"{kind} p95 latency is {current_p95:.2f}s, up from {previous_p95:.2f}s")
+        return messages
+
+
+def _format_count(value):
+    return '' if value is None else f'{value:,.0f}'
+
+
+def load_latest_report(directory=RUN_REPORT_DIRECTORY):
+    """The most recent run report in directory, or None if there isn't one."""
+    report_paths = sorted(glob.glob(os.path.join(directory, f'{RUN_REPORT_FILE_PREFIX}*.json')))
+    if not report_paths:
+        return None
+    with open(report_paths[-1]) as report_file:
+        return json.load(report_file)
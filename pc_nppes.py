@@ -0,0 +1,532 @@
+import io
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from pc_constants import *
+from pc_utilities import current_date_time, peak_rss_mb
+
+# Only the NPPES columns the pipeline actually uses are read (the dissemination file has ~330 columns).
+# NPI is read as int64 to match the APCD NPIs, state and taxonomy codes (small vocabularies repeated across
+# millions of rows) as categoricals, and free text / license numbers as strings so that all-digit license
+# numbers are not turned into floats. Entity type is left as float64 as it is blank for deactivated NPIs.
+NPPES_PIPELINE_SCHEMA = {
+    NPPES_NPI: 'int64',
+    NPPES_ENTITY_TYPE: 'float64',
+    NPPES_FIRST_NAME: 'object',
+    NPPES_MIDDLE_NAME: 'object',
+    NPPES_LAST_NAME: 'object',
+    NPPES_GENDER: 'category',
+    # Of note, postal codes are read as text so ZIP codes keep their leading zero
+    NPPES_PRACTICE_CITY: 'object',
+    NPPES_PRACTICE_POSTAL_CODE: 'object',
+    **{col: 'category' for col in NPPES_ADDRESS_STATE_COLUMNS},
+    **{col: 'object' for col in NPPES_LICENSE_NUMBER_COLUMNS},
+    **{col: 'category' for col in NPPES_LICENSE_STATE_COLUMNS},
+    **{col: 'category' for col in NPPES_IDENTIFIER_STATE_COLUMNS},
+    **{col: 'category' for col in NPPES_TAXONOMY_COLUMNS},
+}
+
+NPPES_READER_ENGINES = ['c', 'pyarrow']
+
+# Columns added by the classification below, in the order they appear in the output
+NPPES_CALC_COLUMNS = [NPPES_IN_RI_COL_NAME, NPPES_RI_EVIDENCE_COL_NAME, NPPES_MATCH_RIDOH_NAME_COL_NAME, NPPES_MATCH_RIDOH_LIC_COL_NAME]
+
+# Size of the byte ranges handed to each worker in the parallel mode
+NPPES_PARALLEL_SLICE_BYTES = 64 * 1024 * 1024
+# Every NPPES record starts with its (possibly quoted) 10 digit NPI - a newline followed by this pattern
+# marks the start of a record rather than a newline embedded in a quoted field
+NPPES_RECORD_START_PATTERN = re.compile(rb'\n(?="?\d{10}"?,)')
+
+# The number of records found by a complete read of an NPPES file is kept next to it (keyed on its size and
+# modification time) so that the next read can report progress in rows rather than bytes
+NPPES_ROW_COUNT_FILE_SUFFIX = '.row_count.json'
+
+
+def classify_ri_evidence(nppes_batch, state_columns, state_code=RHODE_ISLAND_STATE_CODE):
+    """Flag the NPPES rows that have any state column equal to state_code.
+    Args:
+        nppes_batch: DataFrame chunk of NPPES data
+        state_columns: Ordered list of state columns to look in for proof of residency
+        state_code: State code being looked for (defaults to RI)
+    Returns:
+        Tuple of (boolean mask Series, Series naming the first column that supplied the evidence or None)
+    """
+    state_columns = [col for col in state_columns if col in nppes_batch.columns]
+    if not state_columns or nppes_batch.empty:
+        return (pd.Series(False, index=nppes_batch.index, dtype=bool),
+                pd.Series(None, index=nppes_batch.index, dtype=object))
+
+    # One columnar comparison over the whole block rather than a python lambda per row
+    hits = nppes_batch[state_columns].to_numpy(dtype=object) == state_code
+    has_evidence = hits.any(axis=1)
+    # argmax returns the first True per row, i.e. the first column (in the given order) that matched
+    evidence_columns = np.where(has_evidence, np.array(state_columns, dtype=object)[hits.argmax(axis=1)], None)
+
+    return (pd.Series(has_evidence, index=nppes_batch.index, dtype=bool),
+            pd.Series(evidence_columns, index=nppes_batch.index, dtype=object))
+
+
+class NppesReadStats:
+    """Running totals for a chunked NPPES read, used for progress and throughput reporting.
+    Progress is estimated from the rows read against total_rows when the row count is known, otherwise from the
+    bytes of the file consumed against total_bytes - so no separate pass over the file is needed to count its lines.
+    Args:
+        total_bytes: Size of the file being read (optional)
+        total_rows: Number of records in it (optional, see read_cached_row_count)
+    """
+    def __init__(self, total_bytes=None, total_rows=None):
+        self.rows = 0
+        self.chunks = 0
+        self.bytes_read = 0
+        self.total_bytes = total_bytes
+        self.total_rows = total_rows
+        self.start_time = time.perf_counter()
+
+    def record(self, chunk_rows, chunk_bytes=None):
+        self.rows += chunk_rows
+        self.chunks += 1
+        if chunk_bytes is not None:
+            self.bytes_read += chunk_bytes
+
+    @property
+    def elapsed_secs(self):
+        return time.perf_counter() - self.start_time
+
+    @property
+    def rows_per_sec(self):
+        elapsed = self.elapsed_secs
+        return self.rows / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def fraction_done(self):
+        """Share of the file read so far, or None if neither total is known."""
+        if self.total_rows:
+            return min(self.rows / self.total_rows, 1.0)
+        if self.total_bytes:
+            return min(self.bytes_read / self.total_bytes, 1.0)
+        return None
+
+    @property
+    def eta_secs(self):
+        fraction_done = self.fraction_done
+        if not fraction_done:
+            return None
+        return self.elapsed_secs * (1 - fraction_done) / fraction_done
+
+    def summary(self):
+        peak_rss = peak_rss_mb()
+        peak_rss_text = f"{peak_rss:,.0f} MB" if peak_rss is not None else "n/a"
+        progress_text = ''
+        if self.fraction_done is not None:
+            progress_text = f", {self.fraction_done:.1%} done, ETA {self.eta_secs:,.0f}s"
+        return f"{self.rows:,} rows in {self.elapsed_secs:,.1f}s ({self.rows_per_sec:,.0f} rows/sec){progress_text}, peak RSS {peak_rss_text}"
+
+
+def _row_count_path(file_path):
+    return file_path + NPPES_ROW_COUNT_FILE_SUFFIX
+
+
+def _file_signature(file_path):
+    stat = os.stat(file_path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def read_cached_row_count(file_path):
+    """The number of records in file_path saved by write_cached_row_count, or None if there isn't one or the file
+    has changed since.
+    """
+    try:
+        with open(_row_count_path(file_path)) as row_count_file:
+            cached = json.load(row_count_file)
+    except (OSError, ValueError):
+        return None
+    if {key: cached.get(key) for key in ('size', 'mtime_ns')} != _file_signature(file_path):
+        return None
+    return cached.get('rows')
+
+
+def write_cached_row_count(file_path, rows):
+    """Save the number of records in file_path, found by a complete read of it. Failing to write it (e.g. to a
+    read-only share) only costs the next read its row based progress.
+    """
+    try:
+        with open(_row_count_path(file_path), 'w') as row_count_file:
+            json.dump({**_file_signature(file_path), 'rows': rows}, row_count_file)
+    except OSError as e:
+        print(f"Could not save the NPPES row count next to {file_path}: {e}")
+
+
+def _present_columns(source, schema):
+    # Older dissemination files may lack some of the declared columns - only ask for those that exist
+    header = pd.read_csv(source, nrows=0).columns
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    return [col for col in schema if col in header]
+
+
+def missing_strings_as_nan(frame):
+    """frame with the None pyarrow hands back for missing strings replaced with NaN, as the C engine reads them -
+    downstream checks such as str(name).lower() == NAN_STRING rely on it.
+    """
+    string_columns = frame.select_dtypes(include=object).columns
+    # Of note, where rather than fillna - fillna would try (and warn about trying) to downcast the object columns
+    frame[string_columns] = frame[string_columns].where(frame[string_columns].notna(), np.nan)
+    return frame
+
+
+def _read_nppes_chunks_pyarrow(file_path, chunk_size, schema):
+    # pandas' pyarrow engine doesn't support chunksize, so the pyarrow streaming reader is used directly
+    # and its (byte sized) record batches are re-cut into chunk_size row chunks
+    import pyarrow as pa
+    from pyarrow import csv as pa_csv
+
+    # Categoricals are dictionary encoded by the arrow reader itself so the codes never become python strings
+    arrow_types = {'int64': pa.int64(), 'float64': pa.float64(), 'category': pa.dictionary(pa.int32(), pa.string())}
+    reader = pa_csv.open_csv(
+        file_path,
+        read_options=pa_csv.ReadOptions(block_size=16 * 1024 * 1024),
+        convert_options=pa_csv.ConvertOptions(
+            include_columns=list(schema),
+            column_types={col: arrow_types.get(dtype, pa.string()) for col, dtype in schema.items()},
+            strings_can_be_null=True,
+        ),
+    )
+    def to_pandas(table, first_row):
+        frame = missing_strings_as_nan(table.to_pandas())
+        # Like the C engine, number rows continuously across chunks
+        frame.index = pd.RangeIndex(first_row, first_row + len(frame))
+        return frame
+
+    pending_batches, pending_rows, rows_yielded = [], 0, 0
+    for batch in reader:
+        pending_batches.append(batch)
+        pending_rows += batch.num_rows
+        while pending_rows >= chunk_size:
+            pending_table = pa.Table.from_batches(pending_batches, schema=reader.schema)
+            yield to_pandas(pending_table.slice(0, chunk_size), rows_yielded)
+            rows_yielded += chunk_size
+            remainder = pending_table.slice(chunk_size)
+            pending_batches, pending_rows = remainder.to_batches(), remainder.num_rows
+    if pending_rows > 0:
+        yield to_pandas(pa.Table.from_batches(pending_batches, schema=reader.schema), rows_yielded)
+
+
+def read_nppes_chunks(file_path, chunk_size, engine='c', schema=NPPES_PIPELINE_SCHEMA, stats=None):
+    """Read the NPPES dissemination file in chunks, loading only the columns in schema with their declared dtypes.
+    Args:
+        file_path: Path to the npidata_pfile CSV (or a binary file object holding NPPES CSV data)
+        chunk_size: Number of rows per chunk
+        engine: 'c' (pandas) or 'pyarrow' (multi-threaded parsing, requires pyarrow)
+        schema: Mapping of NPPES column name to dtype
+        stats: Optional NppesReadStats updated as chunks are produced (including the bytes of the file consumed)
+    """
+    if engine not in NPPES_READER_ENGINES:
+        raise ValueError(f"Unknown NPPES reader engine: {engine}. Expected one of {NPPES_READER_ENGINES}")
+    # Of note, the file is opened here (rather than by the reader) so its position can be used to measure progress -
+    # it runs ahead of the rows handed back by at most one read buffer
+    source = open(file_path, 'rb') if isinstance(file_path, (str, os.PathLike)) else file_path
+    try:
+        schema = {col: schema[col] for col in _present_columns(source, schema)}
+
+        if engine == 'pyarrow':
+            chunks = _read_nppes_chunks_pyarrow(source, chunk_size, schema)
+        else:
+            chunks = pd.read_csv(source, usecols=list(schema), dtype=schema, chunksize=chunk_size)
+
+        position = 0
+        for chunk in chunks:
+            # Both engines hand back the columns in the order declared in the schema with the same dtypes
+            chunk = chunk[list(schema)].astype(schema)
+            if stats is not None:
+                chunk_end = source.tell()
+                stats.record(len(chunk), chunk_bytes=chunk_end - position)
+                position = chunk_end
+            yield chunk
+    finally:
+        if source is not file_path:
+            source.close()
+
+
+def filter_nppes_chunk(nppes_batch, apcd_npis, ridoh_name_matcher, ridoh_licenses,
+                       ri_state_columns, license_number_columns, exclude_organizations=False, verbose=False):
+    """Keep the APCD NPIs of a raw NPPES chunk that show proof of RI residency.
+    Rows are kept if they have a RI state (flagged with NPPES_IN_RI_COL_NAME and the evidence column) or,
+    failing that, a RIDOH name (ridoh_name_matcher, a pc_ridoh.RidohNameMatcher) or RIDOH license match. The result is in file order - a row matching on both
+    name and license appears twice, name match first - so results of consecutive chunks can simply be
+    concatenated, however the file was cut into chunks.
+    """
+    nppes_batch = nppes_batch.add_prefix(NPPES_PREFIX)
+    # Filter on only those NPI numbers that were returned from the APCD query - all other NPI numbers will be disregarded!
+    nppes_batch = nppes_batch[nppes_batch[NPPES_NPI_COL_NAME].isin(apcd_npis)]
+    if verbose:
+        print("Filtered Chunk length:", len(nppes_batch), " ", current_date_time())
+    if exclude_organizations:
+        nppes_batch = nppes_batch[nppes_batch[NPPES_ENTITY_TYPE_CODE] != NPPES_ENTITY_TYPE_ORG_CODE]
+
+    # We nevertheless do additional filtering to actually make sure that the providers we got back from NPPES are actually
+    # Rhode Island Providers! (hence filtering on state, RIDOH name, and RIDOH license number - looking for proof of residency!)
+    # The residency mask is computed once per chunk and also records which column supplied the evidence
+    ri_mask, ri_evidence = classify_ri_evidence(nppes_batch, ri_state_columns)
+    in_ri = nppes_batch[ri_mask].copy()
+    in_ri[NPPES_IN_RI_COL_NAME] = True
+    in_ri[NPPES_RI_EVIDENCE_COL_NAME] = ri_evidence[ri_mask]
+
+    not_in_ri = nppes_batch[~ri_mask].copy()
+    not_in_ri[NPPES_IN_RI_COL_NAME] = False
+    if verbose:
+        print("RI analysis complete. There were the following number of providers not in RI:", len(not_in_ri), " ", current_date_time())
+
+    # First and last name have to belong to the same RIDOH licensee (matching any RIDOH first name and any RIDOH
+    # last name separately let e.g. "Jane Smith" through as soon as there was some Jane and some Smith)
+    name_mask = ridoh_name_matcher.match(not_in_ri[NPPES_FIRST_NAME_COL_NAME], not_in_ri[NPPES_LAST_NAME_COL_NAME])
+    filtered_name_rows = not_in_ri.loc[name_mask].copy()
+    filtered_name_rows[NPPES_MATCH_RIDOH_NAME_COL_NAME] = True
+    if verbose:
+        independent_matches = ridoh_name_matcher.match_independently(not_in_ri[NPPES_FIRST_NAME_COL_NAME], not_in_ri[NPPES_LAST_NAME_COL_NAME]).sum()
+        print("Name matching analysis complete.", len(filtered_name_rows), " providers matched on name",
+              f"({independent_matches} would have matched on first and last name independently). ", current_date_time())
+
+    license_columns = [col for col in license_number_columns if col in not_in_ri.columns]
+    license_mask = pd.DataFrame({col: not_in_ri[col].isin(ridoh_licenses) for col in license_columns}, index=not_in_ri.index).any(axis=1)
+    filtered_license_rows = not_in_ri.loc[license_mask].copy()
+    filtered_license_rows[NPPES_MATCH_RIDOH_LIC_COL_NAME] = True
+    if verbose:
+        print("License matching analysis complete. ", len(filtered_license_rows), " providers matched on license, ", current_date_time())
+
+    # A stable sort on the file row number puts the rows back in file order (name match before license match)
+    chunk_providers = pd.concat([in_ri, filtered_name_rows, filtered_license_rows]).sort_index(kind='stable')
+    return chunk_providers.dropna(how='all', axis=1)
+
+
+def order_nppes_columns(nppes_providers, schema=NPPES_PIPELINE_SCHEMA):
+    # Columns that are empty in a chunk are dropped from it, so the concatenated column order depends on where the
+    # chunks happened to fall - put the columns back in schema order so that every run writes the same file
+    canonical_columns = [NPPES_PREFIX + col for col in schema] + NPPES_CALC_COLUMNS
+    ordered_columns = [col for col in canonical_columns if col in nppes_providers.columns]
+    return nppes_providers[ordered_columns + [col for col in nppes_providers.columns if col not in ordered_columns]]
+
+
+class NppesProviderAccumulator:
+    """Collects the per-chunk results of filter_nppes_chunk and writes them to output_path.
+    By default chunks are kept in a list and concatenated once in finish() (instead of re-copying a growing frame
+    every chunk). With streaming=True each chunk is instead appended to the output file straight away against a
+    fixed set of columns, so memory stays flat however many states/providers are kept - the output then keeps
+    every schema column, even those that were empty throughout. Files ending in .parquet are written with
+    pyarrow, anything else as CSV.
+    """
+    def __init__(self, output_path, streaming=False, schema=NPPES_PIPELINE_SCHEMA):
+        self.output_path = output_path
+        self.streaming = streaming
+        self.columns = [NPPES_PREFIX + col for col in schema] + NPPES_CALC_COLUMNS
+        self.rows = 0
+        self._chunks = []
+        self._parquet_writer = None
+        self._arrow_schema = None
+        if streaming and not output_path.endswith('.parquet'):
+            pd.DataFrame(columns=self.columns).to_csv(output_path, index=False)
+        if streaming and output_path.endswith('.parquet'):
+            import pyarrow as pa
+            arrow_types = {'int64': pa.int64(), 'float64': pa.float64()}
+            self._arrow_schema = pa.schema(
+                [(NPPES_PREFIX + col, arrow_types.get(dtype, pa.string())) for col, dtype in schema.items()] +
+                [(NPPES_IN_RI_COL_NAME, pa.bool_()), (NPPES_RI_EVIDENCE_COL_NAME, pa.string()),
+                 (NPPES_MATCH_RIDOH_NAME_COL_NAME, pa.bool_()), (NPPES_MATCH_RIDOH_LIC_COL_NAME, pa.bool_())])
+
+    def __len__(self):
+        return self.rows
+
+    def append(self, chunk_providers):
+        if chunk_providers.empty:
+            return
+        self.rows += len(chunk_providers)
+        if not self.streaming:
+            self._chunks.append(chunk_providers)
+            return
+        chunk_providers = chunk_providers.reindex(columns=self.columns)
+        if self._arrow_schema is None:
+            chunk_providers.to_csv(self.output_path, mode='a', header=False, index=False)
+            return
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        categorical_columns = chunk_providers.select_dtypes(include='category').columns
+        chunk_providers = chunk_providers.astype({col: object for col in categorical_columns})
+        if self._parquet_writer is None:
+            self._parquet_writer = pq.ParquetWriter(self.output_path, self._arrow_schema)
+        self._parquet_writer.write_table(pa.Table.from_pandas(chunk_providers, schema=self._arrow_schema, preserve_index=False))
+
+    def finish(self):
+        """Write out whatever is still held in memory. Returns the full frame unless streaming."""
+        if self.streaming:
+            if self._parquet_writer is not None:
+                self._parquet_writer.close()
+            elif self._arrow_schema is not None:
+                # No rows at all - still leave a (empty) file behind for the next step to read
+                import pyarrow.parquet as pq
+                pq.write_table(self._arrow_schema.empty_table(), self.output_path)
+            return None
+        nppes_providers = order_nppes_columns(pd.concat(self._chunks, ignore_index=True)) if self._chunks else pd.DataFrame()
+        self._chunks = []
+        if self.output_path.endswith('.parquet'):
+            nppes_providers.to_parquet(self.output_path, index=False)
+        else:
+            nppes_providers.to_csv(self.output_path, index=False)
+        return nppes_providers
+
+
+def nppes_byte_ranges(file_path, slice_bytes=NPPES_PARALLEL_SLICE_BYTES):
+    """Cut the NPPES file into byte ranges of roughly slice_bytes that each start at the beginning of a record.
+    Returns:
+        Tuple of (header line bytes, list of (start, end) byte offsets)
+    """
+    file_size = os.path.getsize(file_path)
+    with open(file_path, 'rb') as nppes_file:
+        header = nppes_file.readline()
+        boundaries = [nppes_file.tell()]
+        position = boundaries[0] + slice_bytes
+        while position < file_size:
+            nppes_file.seek(position)
+            # The lookahead needs the 13 bytes after the newline so blocks overlap by that much
+            block = nppes_file.read(1024 * 1024)
+            match = NPPES_RECORD_START_PATTERN.search(block)
+            if match is None:
+                if len(block) < 1024 * 1024:
+                    break
+                position += len(block) - 13
+                continue
+            boundaries.append(position + match.start() + 1)
+            position = boundaries[-1] + slice_bytes
+    boundaries.append(file_size)
+    return header, [(start, end) for start, end in zip(boundaries[:-1], boundaries[1:]) if end > start]
+
+
+_worker_context = {}
+
+def _init_nppes_worker(context):
+    # Runs once per worker process so the (large) RIDOH name/license lists are only sent once per worker
+    _worker_context.update(context)
+
+
+def _filter_nppes_byte_range(byte_range):
+    context = _worker_context
+    start, end = byte_range
+    with open(context['file_path'], 'rb') as nppes_file:
+        nppes_file.seek(start)
+        slice_data = io.BytesIO(context['header'] + nppes_file.read(end - start))
+
+    rows_read = 0
+    slice_providers = []
+    for chunk in read_nppes_chunks(slice_data, context['chunk_size'], schema=context['schema']):
+        rows_read += len(chunk)
+        slice_providers.append(filter_nppes_chunk(
+            chunk, context['apcd_npis'], context['ridoh_name_matcher'], context['ridoh_licenses'],
+            context['ri_state_columns'], context['license_number_columns'], context['exclude_organizations']))
+    return rows_read, pd.concat(slice_providers) if slice_providers else pd.DataFrame()
+
+
+def filter_nppes_parallel(file_path, chunk_size, apcd_npis, ridoh_name_matcher, ridoh_licenses,
+                          ri_state_columns, license_number_columns, exclude_organizations=False, workers=None,
+                          slice_bytes=NPPES_PARALLEL_SLICE_BYTES, schema=NPPES_PIPELINE_SCHEMA, stats=None):
+    """Run filter_nppes_chunk over byte ranges of the NPPES file in a pool of worker processes.
+    Results are yielded per byte range in file order, so concatenating them gives the same rows in the same
+    order as the serial loop.
+    Args:
+        workers: Number of worker processes (defaults to the number of cores)
+        slice_bytes: Approximate size of the byte range each task reads
+        (the remaining arguments are those of read_nppes_chunks and filter_nppes_chunk)
+    """
+    header, byte_ranges = nppes_byte_ranges(file_path, slice_bytes)
+    with open(file_path, 'rb') as nppes_file:
+        schema = {col: schema[col] for col in _present_columns(nppes_file, schema)}
+    context = {
+        'file_path': file_path,
+        'header': header,
+        'chunk_size': chunk_size,
+        'schema': schema,
+        'apcd_npis': apcd_npis,
+        'ridoh_name_matcher': ridoh_name_matcher,
+        'ridoh_licenses': ridoh_licenses,
+        'ri_state_columns': ri_state_columns,
+        'license_number_columns': license_number_columns,
+        'exclude_organizations': exclude_organizations,
+    }
+    workers = workers or os.cpu_count()
+    print(f"Filtering {len(byte_ranges)} slices of the NPPES file with {workers} worker processes.")
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_nppes_worker, initargs=(context,)) as executor:
+        # map hands results back in submission (i.e. file) order regardless of which worker finishes first
+        for (start, end), (rows_read, slice_providers) in zip(byte_ranges, executor.map(_filter_nppes_byte_range, byte_ranges)):
+            if stats is not None:
+                stats.record(rows_read, chunk_bytes=end - start)
+            yield slice_providers
+
+
+def scan_nppes(nppes_file_name, output_path, chunk_size, apcd_npis, ridoh_name_matcher, ridoh_licenses, ri_state_columns,
+               license_number_columns, exclude_organizations=False, engine='c', parallel=False, workers=None,
+               parquet_directory=None, stream_to_disk=False, metrics=None):
+    """The whole NPPES filtering step - read the NPPES file (or its converted parquet dataset), keep the APCD NPIs
+    with proof of RI residency and write them to output_path.
+    Args:
+        nppes_file_name: NPPES dissemination file
+        output_path: Where the providers kept are written
+        parallel: Split the file across `workers` processes (see filter_nppes_parallel)
+        parquet_directory: Read the dataset converted with pc_nppes_parquet.py instead of the CSV
+        stream_to_disk: Append each chunk's providers to output_path as they come (see NppesProviderAccumulator)
+        metrics: Optional pc_metrics.RunMetrics - each chunk is recorded as an 'nppes_chunk' event
+        (the remaining arguments are those of read_nppes_chunks and filter_nppes_chunk)
+    Returns:
+        The number of providers written
+    """
+    nppes_chunks_classified = False
+    if parquet_directory is not None:
+        nppes_read_stats = NppesReadStats()
+    else:
+        # Progress is measured against the file size, or the row count saved by the last complete read of this file
+        nppes_read_stats = NppesReadStats(total_bytes=os.path.getsize(nppes_file_name), total_rows=read_cached_row_count(nppes_file_name))
+
+    if parquet_directory is not None:
+        from pc_nppes_parquet import read_nppes_parquet
+        print(f"Reading NPPES from the converted dataset in {parquet_directory}. The target number of NPI numbers to find is: ", len(apcd_npis))
+        nppes_chunks = read_nppes_parquet(parquet_directory, apcd_npis, stats=nppes_read_stats)
+    elif parallel:
+        print("The target number of NPI numbers to find is: ", len(apcd_npis))
+        # Each worker reads and classifies its own byte range of the file - results come back already classified and in file order
+        nppes_chunks = filter_nppes_parallel(nppes_file_name, chunk_size, apcd_npis, ridoh_name_matcher, ridoh_licenses,
+                                             ri_state_columns, license_number_columns, exclude_organizations, workers=workers, stats=nppes_read_stats)
+        nppes_chunks_classified = True
+    else:
+        if nppes_read_stats.total_rows is not None:
+            num_chunks = nppes_read_stats.total_rows // chunk_size + (nppes_read_stats.total_rows % chunk_size > 0)
+            print(f"The file will be read in {num_chunks} chunks. The target number of NPI numbers to find is: ", len(apcd_npis))
+        else:
+            print(f"The file ({nppes_read_stats.total_bytes / 1024 ** 2:,.0f} MB) will be read in chunks of {chunk_size:,} rows. "
+                  "The target number of NPI numbers to find is: ", len(apcd_npis))
+        # Only the NPPES columns used below are loaded (see NPPES_PIPELINE_SCHEMA)
+        nppes_chunks = read_nppes_chunks(nppes_file_name, chunk_size, engine, stats=nppes_read_stats)
+
+    # Chunk results are collected and concatenated once at the end (or, when streaming, appended to the output file as they come)
+    nppes_aggregated = NppesProviderAccumulator(output_path, streaming=stream_to_disk)
+    # Each chunk's read and processing time, rows in and out are recorded as an 'nppes_chunk' event
+    timed_chunks = metrics.timed('nppes_chunk', nppes_chunks) if metrics is not None else (({}, chunk) for chunk in nppes_chunks)
+    for chunk_index, (chunk_metrics, current_npi_batch) in enumerate(timed_chunks):
+        print("Current Time:", current_date_time(), " Chunk number: ", chunk_index + 1, " Read so far:", nppes_read_stats.summary())
+        chunk_metrics['chunk'] = chunk_index + 1
+        if not nppes_chunks_classified:
+            chunk_metrics['rows_in'] = len(current_npi_batch)
+            # Filtering on APCD NPIs, then looking for proof of RI residency (state, RIDOH name, or RIDOH license number)
+            current_npi_batch = filter_nppes_chunk(current_npi_batch, apcd_npis, ridoh_name_matcher, ridoh_licenses,
+                                                   ri_state_columns, license_number_columns, exclude_organizations, verbose=True)
+        chunk_metrics['rows_out'] = len(current_npi_batch)
+
+        nppes_aggregated.append(current_npi_batch)
+        print("****** Total providers are now: ", len(nppes_aggregated))
+
+    print("NPPES read complete:", nppes_read_stats.summary())
+    if parquet_directory is None and nppes_read_stats.total_rows != nppes_read_stats.rows:
+        write_cached_row_count(nppes_file_name, nppes_read_stats.rows)
+    nppes_aggregated.finish()
+    return len(nppes_aggregated)
@@ -0,0 +1,239 @@
+"""One-time conversion of the NPPES dissemination file to an NPI-bucketed parquet dataset.
+
+The dataset is hive partitioned on npi_bucket (NPI // NPPES_PARQUET_BUCKET_WIDTH) and every partition is
+sorted by NPI and written in row groups with min/max statistics. Looking up the few thousand APCD NPIs then
+only touches the partitions and row groups whose NPI range can contain them instead of re-parsing the CSV.
+
+The weekly NPPES update files can be merged in with `update` - only the partitions they touch are rewritten.
+
+    python pc_nppes_parquet.py convert input_files/npidata_pfile_20050523-20240107.csv nppes_parquet
+    python pc_nppes_parquet.py update input_files/npidata_pfile_20240108-20240114.csv nppes_parquet
+"""
+import argparse
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from pc_constants import *
+from pc_utilities import current_date_time
+from pc_nppes import NPPES_PIPELINE_SCHEMA, NppesReadStats, missing_strings_as_nan, read_cached_row_count, read_nppes_chunks, write_cached_row_count
+
+NPPES_PARQUET_BUCKET_COL_NAME = 'npi_bucket'
+# NPIs run from 1000000000 to 1999999999 so this gives ~100 partitions of ~90k providers each
+NPPES_PARQUET_BUCKET_WIDTH = 10 ** 7
+NPPES_PARQUET_ROW_GROUP_SIZE = 16384
+NPPES_PARQUET_MANIFEST_FILE_NAME = '_nppes_manifest.json'
+NPPES_PARQUET_STAGING_DIRECTORY = '_staging'
+
+_ARROW_TYPES = {'int64': pa.int64(), 'float64': pa.float64()}
+
+
+def _arrow_schema(schema):
+    # Categoricals are stored as plain strings (parquet dictionary encodes them anyway) so that every
+    # chunk has the same arrow type regardless of how many categories it happened to have
+    return pa.schema([(col, _ARROW_TYPES.get(dtype, pa.string())) for col, dtype in schema.items()])
+
+
+def _to_arrow(frame, arrow_schema):
+    frame = frame[arrow_schema.names]
+    categorical_columns = frame.select_dtypes(include='category').columns
+    frame = frame.astype({col: object for col in categorical_columns})
+    return pa.Table.from_pandas(frame, schema=arrow_schema, preserve_index=False)
+
+
+def _partition_path(dataset_dir, bucket):
+    return os.path.join(dataset_dir, f'{NPPES_PARQUET_BUCKET_COL_NAME}={bucket}', 'part-0.parquet')
+
+
+def _write_partition(table, dataset_dir, bucket):
+    # Written to a temporary file first so an interrupted run never leaves a half written partition behind
+    path = _partition_path(dataset_dir, bucket)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    table = table.sort_by(NPPES_NPI)
+    pq.write_table(table, path + '.tmp', row_group_size=NPPES_PARQUET_ROW_GROUP_SIZE, write_statistics=True)
+    os.replace(path + '.tmp', path)
+
+
+def _source_entry(file_path, rows):
+    return {
+        'file': os.path.basename(file_path),
+        'size': os.path.getsize(file_path),
+        'rows': rows,
+        'applied': current_date_time(),
+    }
+
+
+def read_manifest(dataset_dir):
+    manifest_path = os.path.join(dataset_dir, NPPES_PARQUET_MANIFEST_FILE_NAME)
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path) as manifest_file:
+        return json.load(manifest_file)
+
+
+def _write_manifest(dataset_dir, manifest):
+    manifest_path = os.path.join(dataset_dir, NPPES_PARQUET_MANIFEST_FILE_NAME)
+    with open(manifest_path + '.tmp', 'w') as manifest_file:
+        json.dump(manifest, manifest_file, indent=2)
+    os.replace(manifest_path + '.tmp', manifest_path)
+
+
+def _count_rows(dataset_dir):
+    return sum(pq.ParquetFile(os.path.join(root, name)).metadata.num_rows
+               for root, _, names in os.walk(dataset_dir) for name in names if name.endswith('.parquet'))
+
+
+def convert_nppes_to_parquet(csv_path, dataset_dir, chunk_size=200000, engine='c', schema=NPPES_PIPELINE_SCHEMA):
+    """Convert a full NPPES dissemination file into the NPI-bucketed parquet dataset (replacing any existing one).
+    Args:
+        csv_path: Path to the npidata_pfile CSV
+        dataset_dir: Folder the parquet dataset is written to
+        chunk_size: Number of CSV rows read at a time
+        engine: CSV parser passed on to read_nppes_chunks
+        schema: Mapping of NPPES column name to dtype - only these columns are converted
+    """
+    if os.path.exists(dataset_dir):
+        shutil.rmtree(dataset_dir)
+    staging_dir = os.path.join(dataset_dir, NPPES_PARQUET_STAGING_DIRECTORY)
+    os.makedirs(staging_dir)
+
+    # Pass 1: stream the CSV once, spilling every chunk into per bucket staging files
+    stats = NppesReadStats(total_bytes=os.path.getsize(csv_path), total_rows=read_cached_row_count(csv_path))
+    arrow_schema = None
+    staging_writers = {}
+    for chunk in read_nppes_chunks(csv_path, chunk_size, engine, schema=schema, stats=stats):
+        if arrow_schema is None:
+            arrow_schema = _arrow_schema({col: schema[col] for col in chunk.columns})
+        chunk_table = _to_arrow(chunk, arrow_schema)
+        buckets = chunk[NPPES_NPI].to_numpy() // NPPES_PARQUET_BUCKET_WIDTH
+        for bucket in np.unique(buckets):
+            if bucket not in staging_writers:
+                staging_writers[bucket] = pq.ParquetWriter(os.path.join(staging_dir, f'{bucket}.parquet'), arrow_schema)
+            staging_writers[bucket].write_table(chunk_table.filter(pa.array(buckets == bucket)))
+        print("Current Time:", current_date_time(), " Converted so far:", stats.summary())
+    for writer in staging_writers.values():
+        writer.close()
+
+    # Pass 2: one bucket at a time, sort by NPI and write the final partition with row group statistics
+    for bucket in staging_writers:
+        staging_path = os.path.join(staging_dir, f'{bucket}.parquet')
+        _write_partition(pq.read_table(staging_path), dataset_dir, bucket)
+        os.remove(staging_path)
+    os.rmdir(staging_dir)
+
+    _write_manifest(dataset_dir, {
+        'columns': list(arrow_schema.names) if arrow_schema is not None else [],
+        'sources': [_source_entry(csv_path, stats.rows)],
+        'row_count': stats.rows,
+    })
+    if stats.total_rows != stats.rows:
+        write_cached_row_count(csv_path, stats.rows)
+    print("NPPES conversion complete:", stats.summary())
+
+
+def update_nppes_parquet(update_csv_path, dataset_dir, chunk_size=200000, engine='c'):
+    """Merge an NPPES weekly update file into an existing parquet dataset.
+    Every NPI in the update replaces its current record (or is added if new) and only the partitions
+    containing those NPIs are rewritten. Files that were already applied are skipped.
+    """
+    manifest = read_manifest(dataset_dir)
+    if manifest is None:
+        raise FileNotFoundError(f"No converted NPPES dataset found in {dataset_dir} - run convert first")
+    update_entry = _source_entry(update_csv_path, None)
+    if any(source['file'] == update_entry['file'] and source['size'] == update_entry['size'] for source in manifest['sources']):
+        print(f"{update_entry['file']} has already been applied to {dataset_dir} - skipping")
+        return
+
+    schema = {col: NPPES_PIPELINE_SCHEMA[col] for col in manifest['columns']}
+    arrow_schema = _arrow_schema(schema)
+    update_rows = pd.concat(list(read_nppes_chunks(update_csv_path, chunk_size, engine, schema=schema)), ignore_index=True)
+    # If an NPI appears more than once in the update, the later record wins
+    update_rows = update_rows.drop_duplicates(subset=NPPES_NPI, keep='last')
+    update_table = _to_arrow(update_rows, arrow_schema)
+    update_buckets = update_rows[NPPES_NPI].to_numpy() // NPPES_PARQUET_BUCKET_WIDTH
+
+    for bucket in np.unique(update_buckets):
+        bucket_updates = update_table.filter(pa.array(update_buckets == bucket))
+        partition_path = _partition_path(dataset_dir, bucket)
+        if os.path.exists(partition_path):
+            existing = pq.read_table(partition_path, schema=arrow_schema)
+            unchanged = existing.filter(pc.invert(pc.is_in(existing[NPPES_NPI], value_set=bucket_updates[NPPES_NPI])))
+            bucket_updates = pa.concat_tables([unchanged, bucket_updates])
+        _write_partition(bucket_updates, dataset_dir, bucket)
+
+    update_entry['rows'] = len(update_rows)
+    manifest['sources'].append(update_entry)
+    manifest['row_count'] = _count_rows(dataset_dir)
+    _write_manifest(dataset_dir, manifest)
+    print(f"Applied {len(update_rows)} NPPES updates across {len(np.unique(update_buckets))} partitions. {current_date_time()}")
+
+
+def _row_groups_containing(parquet_file, npi_column_index, sorted_npis):
+    # Using the row group min/max statistics, keep only the row groups whose NPI range contains one of the NPIs
+    row_groups = []
+    for row_group_index in range(parquet_file.num_row_groups):
+        statistics = parquet_file.metadata.row_group(row_group_index).column(npi_column_index).statistics
+        if statistics is None or not statistics.has_min_max:
+            row_groups.append(row_group_index)
+            continue
+        position = np.searchsorted(sorted_npis, statistics.min)
+        if position < len(sorted_npis) and sorted_npis[position] <= statistics.max:
+            row_groups.append(row_group_index)
+    return row_groups
+
+
+def read_nppes_parquet(dataset_dir, npis, schema=NPPES_PIPELINE_SCHEMA, stats=None):
+    """Yield the NPPES records of the given NPIs from the converted dataset.
+    Only partitions and row groups that can contain one of the NPIs are read, and the matching rows of all
+    partitions are handed back as a single frame. Of note, rows come back in NPI order rather than in the
+    order of the original CSV.
+    """
+    npis = np.unique(np.asarray(npis, dtype='int64'))
+    npi_buckets = npis // NPPES_PARQUET_BUCKET_WIDTH
+    matched_tables = []
+    for bucket in np.unique(npi_buckets):
+        partition_path = _partition_path(dataset_dir, bucket)
+        if not os.path.exists(partition_path):
+            continue
+        bucket_npis = npis[npi_buckets == bucket]
+        parquet_file = pq.ParquetFile(partition_path)
+        file_schema = parquet_file.schema_arrow
+        columns = [col for col in schema if col in file_schema.names]
+        row_groups = _row_groups_containing(parquet_file, file_schema.get_field_index(NPPES_NPI), bucket_npis)
+        if row_groups:
+            table = parquet_file.read_row_groups(row_groups, columns=columns)
+            matched_tables.append(table.filter(pc.is_in(table[NPPES_NPI], value_set=pa.array(bucket_npis))))
+
+    if not matched_tables:
+        return
+    # Missing strings come back as NaN, as they do from read_nppes_chunks
+    matched = missing_strings_as_nan(pa.concat_tables(matched_tables).to_pandas())
+    matched = matched.astype({col: schema[col] for col in matched.columns})
+    if stats is not None:
+        stats.record(len(matched))
+    yield matched
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=['convert', 'update'])
+    parser.add_argument('csv_path', help='NPPES dissemination file (convert) or weekly update file (update)')
+    parser.add_argument('dataset_dir', help='Folder holding the parquet dataset')
+    parser.add_argument('--chunk-size', type=int, default=200000)
+    parser.add_argument('--engine', default='c', help="CSV parser: 'c' or 'pyarrow'")
+    args = parser.parse_args()
+
+    if args.command == 'convert':
+        convert_nppes_to_parquet(args.csv_path, args.dataset_dir, args.chunk_size, args.engine)
+    else:
+        update_nppes_parquet(args.csv_path, args.dataset_dir, args.chunk_size, args.engine)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,215 @@
+"""Stage runner that skips pipeline stages whose inputs haven't changed since they were last run.
+
+Each stage declares its input files, parameters, code (modules / functions) and output files. The runner hashes
+all of these (plus the keys of the stages it depends on) into a stage key. After a stage runs its output files and
+return value are saved under artifact_directory/<stage>/<key>/ - when a later run comes up with the same key the
+saved outputs are put back in place and the stage is skipped.
+
+Of note, hashing a multi GB input file takes a while too, so content hashes are kept alongside the artifacts and
+only recomputed when a file's size or modification time changes.
+
+    runner = PipelineRunner('pipeline_artifacts')
+    runner.run('nppes_filter', scan_nppes, inputs=[nppes_file_name], params={'chunk_size': chunk_size},
+               code=[pc_nppes], outputs=[output_ri_providers_file_path])
+"""
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import shutil
+import time
+import types
+
+import numpy as np
+import pandas as pd
+
+from pc_utilities import current_date_time
+
+PIPELINE_ARTIFACT_DIRECTORY = 'pipeline_artifacts'
+PIPELINE_FILE_HASHES_FILE_NAME = '_file_hashes.json'
+PIPELINE_STAGE_MANIFEST_FILE_NAME = '_stage.json'
+PIPELINE_STAGE_RESULT_FILE_NAME = '_result.pkl'
+# Artifacts kept per stage (most recently used first) - older ones are deleted
+PIPELINE_ARTIFACTS_PER_STAGE = 3
+HASH_BLOCK_SIZE = 8 * 1024 * 1024
+
+
+def _new_hasher():
+    return hashlib.blake2b(digest_size=16)
+
+
+def hash_file(path):
+    hasher = _new_hasher()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(HASH_BLOCK_SIZE), b''):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+def _hash_value(hasher, value):
+    # Feeds a parameter into hasher - the type goes in too so that e.g. 1 and '1' give different keys
+    hasher.update(type(value).__name__.encode())
+    if isinstance(value, pd.DataFrame):
+        hasher.update(repr((list(value.columns), [str(dtype) for dtype in value.dtypes])).encode())
+        hasher.update(pd.util.hash_pandas_object(value, index=True).values.tobytes())
+    elif isinstance(value, (pd.Series, pd.Index)):
+        hasher.update(repr((value.name, str(value.dtype))).encode())
+        hasher.update(pd.util.hash_pandas_object(value, index=isinstance(value, pd.Series)).values.tobytes())
+    elif isinstance(value, np.ndarray):
+        hasher.update(repr((str(value.dtype), value.shape)).encode())
+        hasher.update(np.ascontiguousarray(value).tobytes() if value.dtype != object else repr(value.tolist()).encode())
+    elif isinstance(value, dict):
+        for key in sorted(value, key=repr):
+            _hash_value(hasher, key)
+            _hash_value(hasher, value[key])
+    elif isinstance(value, (list, tuple)):
+        hasher.update(str(len(value)).encode())
+        for item in value:
+            _hash_value(hasher, item)
+    elif isinstance(value, (set, frozenset)):
+        _hash_value(hasher, sorted(value, key=repr))
+    else:
+        hasher.update(repr(value).encode())
+    hasher.update(b'\x00')
+
+
+def code_version(code):
+    # Source of a module / function / class, or its byte code when the source isn't available (e.g. defined with exec)
+    try:
+        return inspect.getsource(code)
+    except (OSError, TypeError):
+        pass
+    code_object = getattr(code, '__code__', code)
+    if not isinstance(code_object, types.CodeType):
+        raise ValueError(f"Can't determine the code version of {code!r}")
+    # Nested functions / comprehensions are code objects of their own, whose repr includes their memory address
+    consts = [code_version(const) if isinstance(const, types.CodeType) else repr(const) for const in code_object.co_consts]
+    return code_object.co_code.hex() + repr(consts)
+
+
+class PipelineRunner:
+    """Runs pipeline stages, skipping those whose saved artifact is still valid.
+    Args:
+        artifact_directory: Where stage outputs are kept between runs (None runs every stage and saves nothing)
+        artifacts_per_stage: Number of artifacts kept per stage, so switching back to a recent configuration is also a hit
+    """
+    def __init__(self, artifact_directory=PIPELINE_ARTIFACT_DIRECTORY, artifacts_per_stage=PIPELINE_ARTIFACTS_PER_STAGE):
+        self.artifact_directory = artifact_directory
+        self.artifacts_per_stage = artifacts_per_stage
+        self.stage_keys = {}
+        self.stage_log = []
+        self._file_hashes = {}
+        if artifact_directory is not None:
+            os.makedirs(artifact_directory, exist_ok=True)
+            hashes_path = os.path.join(artifact_directory, PIPELINE_FILE_HASHES_FILE_NAME)
+            if os.path.exists(hashes_path):
+                with open(hashes_path) as hashes_file:
+                    self._file_hashes = json.load(hashes_file)
+
+    def _file_hash(self, path):
+        stat = os.stat(path)
+        signature = [stat.st_size, stat.st_mtime_ns]
+        cached = self._file_hashes.get(os.path.abspath(path))
+        if cached is not None and cached['signature'] == signature:
+            return cached['hash']
+        file_hash = hash_file(path)
+        self._file_hashes[os.path.abspath(path)] = {'signature': signature, 'hash': file_hash}
+        hashes_path = os.path.join(self.artifact_directory, PIPELINE_FILE_HASHES_FILE_NAME)
+        with open(hashes_path + '.tmp', 'w') as hashes_file:
+            json.dump(self._file_hashes, hashes_file, indent=2)
+        os.replace(hashes_path + '.tmp', hashes_path)
+        return file_hash
+
+    def stage_key(self, name, function, inputs=(), params=None, code=(), depends_on=()):
+        """Hash of everything the stage's outputs depend on."""
+        hasher = _new_hasher()
+        hasher.update(name.encode())
+        for code_item in [function, *code]:
+            hasher.update(code_version(code_item).encode())
+        for path in inputs:
+            hasher.update(self._file_hash(path).encode())
+        _hash_value(hasher, params or {})
+        for upstream in depends_on:
+            if upstream not in self.stage_keys:
+                raise ValueError(f"Stage {name} depends on {upstream}, which hasn't been run yet")
+            hasher.update(self.stage_keys[upstream].encode())
+        return hasher.hexdigest()
+
+    def _stage_directory(self, name, key=''):
+        return os.path.join(self.artifact_directory, name, key)
+
+    def _restore(self, stage_directory, outputs):
+        with open(os.path.join(stage_directory, PIPELINE_STAGE_MANIFEST_FILE_NAME)) as manifest_file:
+            manifest = json.load(manifest_file)
+        for artifact_name, output_path in zip(manifest['artifacts'], outputs):
+            shutil.copy2(os.path.join(stage_directory, artifact_name), output_path)
+        with open(os.path.join(stage_directory, PIPELINE_STAGE_RESULT_FILE_NAME), 'rb') as result_file:
+            result = pickle.load(result_file)
+        # Touched so that the least recently used artifacts are the ones pruned
+        os.utime(os.path.join(stage_directory, PIPELINE_STAGE_MANIFEST_FILE_NAME))
+        return result
+
+    def _save(self, name, key, outputs, result):
+        # Written to a staging folder first so an interrupted save never leaves a partial artifact behind
+        stage_directory = self._stage_directory(name, key)
+        staging_directory = stage_directory + '.tmp'
+        shutil.rmtree(staging_directory, ignore_errors=True)
+        os.makedirs(staging_directory)
+        artifacts = []
+        for position, output_path in enumerate(outputs):
+            artifact_name = f'{position}_{os.path.basename(output_path)}'
+            shutil.copy2(output_path, os.path.join(staging_directory, artifact_name))
+            artifacts.append(artifact_name)
+        with open(os.path.join(staging_directory, PIPELINE_STAGE_RESULT_FILE_NAME), 'wb') as result_file:
+            pickle.dump(result, result_file)
+        with open(os.path.join(staging_directory, PIPELINE_STAGE_MANIFEST_FILE_NAME), 'w') as manifest_file:
+            json.dump({'stage': name, 'key': key, 'created': current_date_time(), 'artifacts': artifacts}, manifest_file, indent=2)
+        shutil.rmtree(stage_directory, ignore_errors=True)
+        os.replace(staging_directory, stage_directory)
+        self._prune(name)
+
+    def _prune(self, name):
+        stage_root = self._stage_directory(name)
+        artifacts = [os.path.join(stage_root, key) for key in os.listdir(stage_root)
+                     if os.path.exists(os.path.join(stage_root, key, PIPELINE_STAGE_MANIFEST_FILE_NAME))]
+        artifacts.sort(key=lambda path: os.path.getmtime(os.path.join(path, PIPELINE_STAGE_MANIFEST_FILE_NAME)), reverse=True)
+        for stale_artifact in artifacts[self.artifacts_per_stage:]:
+            shutil.rmtree(stale_artifact, ignore_errors=True)
+
+    def run(self, name, function, inputs=(), params=None, code=(), outputs=(), depends_on=(), force=False):
+        """Run a stage - or, if its inputs, params and code are unchanged since it last ran, restore its outputs instead.
+        Args:
+            name: Stage name (also the artifact sub folder)
+            function: Called without arguments to run the stage - its return value is saved along with the outputs
+            inputs: Paths of the files the stage reads
+            params: Dict of the settings / in-memory data the stage uses (DataFrames and arrays are hashed by value)
+            code: Modules / functions the stage calls (function itself is always included)
+            outputs: Paths of the files the stage writes
+            depends_on: Names of stages (already run by this runner) whose results the stage uses
+            force: Run the stage even if its artifact is valid
+        Returns:
+            The return value of function
+        """
+        start = time.perf_counter()
+        if self.artifact_directory is None:
+            result = function()
+            self.stage_log.append((name, 'ran', time.perf_counter() - start))
+            return result
+
+        key = self.stage_key(name, function, inputs, params, code, depends_on)
+        self.stage_keys[name] = key
+        stage_directory = self._stage_directory(name, key)
+        if not force and os.path.exists(os.path.join(stage_directory, PIPELINE_STAGE_MANIFEST_FILE_NAME)):
+            result = self._restore(stage_directory, outputs)
+            self.stage_log.append((name, 'skipped', time.perf_counter() - start))
+            print(f"Stage {name}: inputs unchanged, restored the outputs saved in {stage_directory}")
+            return result
+
+        result = function()
+        self._save(name, key, outputs, result)
+        self.stage_log.append((name, 'ran', time.perf_counter() - start))
+        return result
+
+    def summary(self):
+        return ', '.join(f"{name} {status} ({secs:.1f}s)" for name, status, secs in self.stage_log)
@@ -0,0 +1,206 @@
+import numpy as np
+import pandas as pd
+
+from pc_constants import *
+from pc_licenses import normalize_licenses
+from pc_utilities import import_csv_gracefully
+
+# Columns a RIDOH licensee is grouped on - their specialties (one extract row each) are joined into one
+RIDOH_GROUPING_COLUMNS = [
+    RIDOH_CREDENTIAL_COLUMN_NAME, RIDOH_NAME_COL_NAME, RIDOH_FIRST_NAME_COL_NAME,
+    RIDOH_MIDDLE_COL_NAME, RIDOH_LAST_NAME_COL_NAME, RIDOH_LICENSE_NO_COL_NAME,
+    RIDOH_LIC_TYPE_COL_NAME, RIDOH_STATUS_COL_NAME, RIDOH_ISSUE_DATE_COL_NAME, RIDOH_EXP_DATE_COL_NAME,
+    RIDOH_ADDRESS_ONE_COL_NAME, RIDOH_ADDRESS_TWO_COL_NAME, RIDOH_ADDRESS_THREE_COL_NAME,
+    RIDOH_CITY_COL_NAME, RIDOH_STATE_COL_NAME, RIDOH_ZIP_COL_NAME,
+    RIDOH_EMAIL_COL_NAME,RIDOH_PHONE_COL_NAME, RIDOH_FAX_COL_NAME, RIDOH_PROF_COL_NAME]
+
+
+def load_ridoh_clinicians(physician_file_name, physician_assistant_file_name, nursing_file_name, midwife_file_name,
+                          directory=INPUT_FILES_DIRECTORY):
+    """The four RIDOH licensee extracts as one frame - RIDOH_CREDENTIAL_COLUMN_NAME first, then the extract columns
+    prefixed with RIDOH_PREFIX.
+    """
+    ridoh_physicians = import_csv_gracefully(directory, physician_file_name)
+    ridoh_physicians[RIDOH_CREDENTIAL_COLUMN_NAME] = ROLE_MD_DO
+
+    ridoh_physicians_assistant = import_csv_gracefully(directory, physician_assistant_file_name)
+    ridoh_physicians_assistant[RIDOH_CREDENTIAL_COLUMN_NAME] = ROLE_PA
+
+    ridoh_midwifery = import_csv_gracefully(directory, midwife_file_name)
+    ridoh_midwifery[RIDOH_CREDENTIAL_COLUMN_NAME] = ROLE_CERT_NURSE_MIDWIFE
+
+    # Includes both nurses and NPs so won't set credential for now (may use license type later for this analysis)
+    ridoh_nursing = import_csv_gracefully(directory, nursing_file_name)
+
+    ridoh_clinicians = pd.concat([ridoh_physicians, ridoh_physicians_assistant, ridoh_nursing, ridoh_midwifery], ignore_index=True)
+    excluded_column = ridoh_clinicians[[RIDOH_CREDENTIAL_COLUMN_NAME]]
+    remaining_columns = ridoh_clinicians.drop(columns=[RIDOH_CREDENTIAL_COLUMN_NAME]).add_prefix(RIDOH_PREFIX)
+    return pd.concat([excluded_column, remaining_columns], axis=1)
+
+
+def _normalize_ridoh(values):
+    # Same normalization the per-row scans used - anything missing (or not a string) stays NaN and can never match
+    return values.str.strip().str.lower()
+
+
+def _normalize_provider(values):
+    # str() first, as the per-row comparisons did - a missing value therefore becomes 'nan'
+    return values.astype(str).str.strip().str.lower()
+
+
+def _normalize_name(values):
+    # RIDOH names are mixed case while NPPES names are upper case - compare on stripped, upper cased names
+    return values.str.strip().str.upper()
+
+
+class RidohNameMatcher:
+    """Precomputed set of normalized RIDOH (first, last) name pairs to probe NPPES chunks against.
+    A provider only matches if their first AND last name belong to the same RIDOH licensee. The index is built
+    once and is cheap to pickle, so it can be shipped to NPPES worker processes as is.
+    Args:
+        ridoh_names_of_interest: Iterable of (first name, last name) tuples - pairs with a missing or blank name are skipped
+    """
+    def __init__(self, ridoh_names_of_interest):
+        names = pd.DataFrame(list(ridoh_names_of_interest), columns=['first', 'last'], dtype=object).dropna()
+        names = names.apply(lambda col: _normalize_name(col.astype(str))).drop_duplicates()
+        names = names[(names['first'] != '') & (names['last'] != '')]
+        self.pairs = pd.MultiIndex.from_frame(names)
+        # Only kept to report how many rows the old first-name-and-last-name-independently check would have matched
+        self.first_names = pd.Index(names['first'].unique())
+        self.last_names = pd.Index(names['last'].unique())
+
+    def __len__(self):
+        return len(self.pairs)
+
+    def match(self, first_names, last_names):
+        """Boolean array - True where the (first, last) name pair belongs to a single RIDOH licensee."""
+        first_names, last_names = _normalize_name(first_names.astype(object)), _normalize_name(last_names.astype(object))
+        present = (first_names.notna() & last_names.notna()).to_numpy()
+        probe = pd.MultiIndex.from_arrays([first_names.fillna(''), last_names.fillna('')])
+        return present & (self.pairs.get_indexer(probe) != -1)
+
+    def match_independently(self, first_names, last_names):
+        """Boolean array - True where the first name is any RIDOH first name and the last name any RIDOH last name."""
+        first_names, last_names = _normalize_name(first_names.astype(object)), _normalize_name(last_names.astype(object))
+        return (self.first_names.get_indexer(first_names) != -1) & (self.last_names.get_indexer(last_names) != -1)
+
+
+class RidohIndex:
+    """Hash indexes over grouped_ridoh, built once, for matching providers to RIDOH licensees.
+    Holds the positions of the RIDOH rows (in grouped_ridoh order) keyed on normalized (first, last, credential)
+    and on (full_name_concatenated, credential), plus each row's middle initial and cleaned licenses.
+    """
+    def __init__(self, grouped_ridoh):
+        self.license_numbers = grouped_ridoh[RIDOH_LICENSE_NO_COL_NAME].to_numpy()
+        self.specialties = grouped_ridoh[SPECIALTY_COLUMN_NAME].to_numpy()
+        self.licenses_cleaned = grouped_ridoh[LICENSE_CLEANED_COL_NAME].to_numpy()
+        self.licenses_cleaned_minimal = grouped_ridoh[LICENSE_CLEANED_MINIMAL_COL_NAME].to_numpy()
+        self.middle_initials = _normalize_ridoh(grouped_ridoh[RIDOH_MIDDLE_COL_NAME]).str[0].to_numpy()
+
+        first_names = _normalize_ridoh(grouped_ridoh[RIDOH_FIRST_NAME_COL_NAME])
+        last_names = _normalize_ridoh(grouped_ridoh[RIDOH_LAST_NAME_COL_NAME])
+        credentials = _normalize_ridoh(grouped_ridoh[RIDOH_CREDENTIAL_COLUMN_NAME])
+        full_names = _normalize_ridoh(grouped_ridoh[RIDOH_FULL_NAME_COL_NAME]).str.replace(' ', '')
+
+        self.by_name = {}
+        self.by_full_name = {}
+        for position, (first, last, full_name, credential) in enumerate(zip(first_names, last_names, full_names, credentials)):
+            if pd.isna(credential):
+                continue
+            if pd.notna(first) and pd.notna(last):
+                self.by_name.setdefault((first, last, credential), []).append(position)
+            if pd.notna(full_name):
+                self.by_full_name.setdefault((full_name, credential), []).append(position)
+
+    def match(self, first, middle, last, credential, full_name):
+        """Positions of the RIDOH rows matching one (already normalized) provider, most specific match first.
+        A first/last/credential match is narrowed on middle initial when it isn't unique; if that leaves nothing
+        the full name (first + middle + last, no spaces) and credential are tried instead.
+        """
+        positions = self.by_name.get((first, last, credential), [])
+        if len(positions) > 1 and middle:
+            positions = [position for position in positions if self.middle_initials[position] == middle[0]]
+        if not positions:
+            positions = self.by_full_name.get((full_name, credential), [])
+        return positions
+
+
+def confirm_license_specialty(providers, ridoh_index):
+    """Confirm each provider's license number and RIDOH specialty against the RIDOH licensee index.
+    A provider is confirmed when the first RIDOH row matching on name and credential has a cleaned (or minimally
+    cleaned) license among the provider's cleaned NPPES licenses - otherwise both columns are UNCONFIRMED_STRING.
+    Returns:
+        DataFrame with the CONFIRMED_LICENSE_COL_NAME and CONFIRMED_SPECIALTY_COL_NAME columns, indexed like providers
+    """
+    first_names = _normalize_provider(providers[NPPES_FIRST_NAME_COL_NAME])
+    last_names = _normalize_provider(providers[NPPES_LAST_NAME_COL_NAME])
+    credentials = _normalize_provider(providers[RIDOH_CREDENTIAL_COLUMN_NAME])
+    middle_names = providers[NPPES_MIDDLE_NAME_COL_NAME]
+    middle_names = middle_names.where(middle_names.notna() & (middle_names.astype(str).str.strip() != ''))
+    middle_names = middle_names.astype(str).str.strip().str.lower().where(middle_names.notna(), '')
+    full_names = (
+        providers[NPPES_FIRST_NAME_COL_NAME].fillna('').astype(str).str.strip().str.lower() +
+        providers[NPPES_MIDDLE_NAME_COL_NAME].fillna('').astype(str).str.strip().str.lower() +
+        providers[NPPES_LAST_NAME_COL_NAME].fillna('').astype(str).str.strip().str.lower()
+    ).str.replace(' ', '')
+
+    confirmed_licenses = []
+    confirmed_specialties = []
+    for first, middle, last, credential, full_name, provider_licenses in zip(
+            first_names, middle_names, last_names, credentials, full_names, providers[LICENSE_CLEANED_COL_NAME]):
+        confirmed_license = confirmed_specialty = UNCONFIRMED_STRING
+        positions = ridoh_index.match(first, middle, last, credential, full_name)
+        if positions:
+            position = positions[0]
+            provider_licenses = {item.strip() for item in provider_licenses.split(',')}
+            if (ridoh_index.licenses_cleaned[position] in provider_licenses or
+                    ridoh_index.licenses_cleaned_minimal[position] in provider_licenses):
+                confirmed_license = ridoh_index.license_numbers[position]
+                confirmed_specialty = ridoh_index.specialties[position]
+        confirmed_licenses.append(confirmed_license)
+        confirmed_specialties.append(confirmed_specialty)
+
+    return pd.DataFrame({
+        CONFIRMED_LICENSE_COL_NAME: confirmed_licenses,
+        CONFIRMED_SPECIALTY_COL_NAME: confirmed_specialties,
+    }, index=providers.index)
+
+
+def group_ridoh_licensees(ridoh_clinicians):
+    """One row per RIDOH licensee (their specialties joined with commas) with the cleaned license and full name
+    columns RidohIndex matches on.
+    A licensee is a distinct combination of the RIDOH_GROUPING_COLUMNS - rows come out in the order (and with the
+    specialties in the order) of a groupby on those columns with dropna=False.
+    """
+    # Of note, each grouping column is factorized once into sorted integer codes (missing values last, as groupby
+    # sorts them) so that licensees are found by sorting and comparing integers rather than hashing 20 object columns
+    key_codes, key_values = [], []
+    for col in RIDOH_GROUPING_COLUMNS:
+        codes, uniques = pd.factorize(ridoh_clinicians[col], sort=True, use_na_sentinel=False)
+        key_codes.append(codes)
+        key_values.append(uniques)
+    # lexsort takes the last key as the primary one, and is stable so each licensee's rows keep their extract order
+    order = np.lexsort(key_codes[::-1])
+    sorted_codes = np.column_stack(key_codes)[order]
+    starts_licensee = np.ones(len(order), dtype=bool)
+    starts_licensee[1:] = (sorted_codes[1:] != sorted_codes[:-1]).any(axis=1)
+    licensee_starts = np.flatnonzero(starts_licensee)
+
+    grouped_ridoh = pd.DataFrame({col: values.take(sorted_codes[licensee_starts, position])
+                                  for position, (col, values) in enumerate(zip(RIDOH_GROUPING_COLUMNS, key_values))})
+    specialties = ridoh_clinicians[SPECIALTY_COLUMN_NAME].astype(str).replace(NAN_STRING, '').to_numpy(dtype=object)[order]
+    if len(specialties):
+        # Each specialty after a licensee's first gets its comma, then every licensee's specialties are concatenated in one go
+        specialties = np.where(starts_licensee, specialties, ',' + specialties)
+        grouped_ridoh[SPECIALTY_COLUMN_NAME] = np.add.reduceat(specialties, licensee_starts)
+    else:
+        grouped_ridoh[SPECIALTY_COLUMN_NAME] = pd.Series(dtype=object)
+
+    grouped_ridoh[[LICENSE_CLEANED_COL_NAME, LICENSE_CLEANED_MINIMAL_COL_NAME]] = normalize_licenses(grouped_ridoh[RIDOH_LICENSE_NO_COL_NAME])
+
+    grouped_ridoh[RIDOH_FULL_NAME_COL_NAME] = (
+        grouped_ridoh[RIDOH_FIRST_NAME_COL_NAME].fillna('') + ' ' +
+        grouped_ridoh[RIDOH_MIDDLE_COL_NAME].fillna('') + ' ' +
+        grouped_ridoh[RIDOH_LAST_NAME_COL_NAME].fillna('')
+    ).str.strip().str.strip().str.lower().str.replace(' ', '')
+    return grouped_ridoh
@@ -0,0 +1,436 @@
+"""Synthetic, schema-faithful pipeline inputs - for running and benchmarking the pipeline without APCD access,
+NPPES downloads or RIDOH extracts.
+
+Writes an input_files folder with the same file names and columns the notebook expects:
+    - npidata_pfile_*.csv: every NPPES column family the pipeline uses (names, entity type, gender, practice city and
+      ZIP, address states,
+      the 15 license number / license state / taxonomy slots and the 50 other identifier states), padded with blank
+      columns out to the width of the real dissemination file
+    - apcd_data_extract.csv: the columns of apcd_sql_files/APCD_Data_Extract.sql, claim counts consistent with its
+      thresholds and flags
+    - the four RIDOH *-licensee-extract-*.csv files
+    - nppes_all_taxonomies.csv and educational_institutional_lookup.csv (copied from input_files)
+
+The provider mix is taxonomy consistent: each individual NPI gets a role (physician, NP, PA, nurse, ...) and its
+taxonomy codes, license prefixes and RIDOH extract follow from that role. A share of the RI providers have their
+license number written differently in NPPES and RIDOH, as happens in the real data. The same seed and sizes always
+give the same files.
+
+    python pc_synthetic_data.py synthetic_inputs --nppes-rows 1000000
+"""
+import argparse
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from pc_constants import *
+from pc_nppes import NPPES_PIPELINE_SCHEMA
+from pc_utilities import current_date_time
+
+SYNTHETIC_NPPES_FILE_NAME = 'npidata_pfile_20050523-20240107.csv'
+SYNTHETIC_APCD_FILE_NAME = 'apcd_data_extract.csv'
+SYNTHETIC_RIDOH_EXTRACT_DATE = '2024-10-07'
+REFERENCE_FILE_NAMES = ['nppes_all_taxonomies.csv', 'educational_institutional_lookup.csv']
+# Columns in the real dissemination file - the columns the pipeline doesn't read are written blank
+NPPES_FILE_COLUMN_COUNT = 330
+SYNTHETIC_WRITE_CHUNK_ROWS = 200000
+
+APCD_MIN_CLAIM_COUNT = 10
+APCD_CLAIM_TYPES = ['CORE_PC', 'EXPANDED_PC', 'VACC', 'LTC', 'HOME', 'PC']
+APCD_PRESENT_COLUMNS = {'VACC': 'APCD_VACC_CLAIMS_PRESENT', 'PC': 'APCD_PC_CODES_PRESENT', 'LTC': 'APCD_LTC_CODES_PRESENT', 'HOME': 'APCD_HOME_CODES_PRESENT'}
+
+# Procedure codes of apcd_sql_files/APCD_Data_Extract.sql, plus some it doesn't count, for synthetic medical_claim rows
+APCD_CLAIM_PROCEDURE_CODES = {
+    'VACC': ['90471'],
+    'CORE_PC': ['G0402', 'G0438', 'G0439', '99381', '99382', '99383', '99384', '99385', '99386', '99387',
+                '99391', '99392', '99393', '99394', '99395', '99396', '99397'],
+    'LTC': ['99304', '99305', '99306', '99307', '99308', '99309', '99310'],
+    'HOME': ['99341', '99342', '99343', '99344', '99345', '99346', '99347', '99348', '99349', '99350'],
+    'OTHER': ['99213', '99214', '99203', '36415', '80053', '85025', '93000'],
+}
+APCD_CLAIM_PROCEDURE_WEIGHTS = {'VACC': 0.1, 'CORE_PC': 0.15, 'LTC': 0.02, 'HOME': 0.02, 'OTHER': 0.71}
+
+RIDOH_EXTRACT_COLUMNS = ['Name', 'First', 'Middle', 'Last', 'License No', 'License Type', 'Status', 'Issue Date', 'Expiration Date',
+                         'Address Line 1', 'Address Line 2', 'Address Line 3', 'City', 'State', 'Zip', 'Email', 'Phone', 'Fax',
+                         'Profession', 'Specialty']
+# Extract file name prefix -> Profession value in the extract
+RIDOH_EXTRACT_PROFESSIONS = {'Physician': 'Physician', 'Physician-Assistant': 'Physician Assistant', 'Nursing': 'Nursing', 'Midwifery': 'Midwifery'}
+
+# Role -> (share of individual NPIs, taxonomy classifications, license prefixes, RIDOH extract, RIDOH license type).
+# Physicians take any physician taxonomy (primary care ones weighted up - see PHYSICIAN_PRIMARY_CARE_SHARE) and
+# other roles take any taxonomy outside the groupings of the roles above them.
+PHYSICIAN_GROUPING = 'Allopathic & Osteopathic Physicians'
+SYNTHETIC_ROLES = {
+    ROLE_MD_DO: (0.34, None, [MD_PREFIX, MD_PREFIX, MD_PREFIX, DO_PREFIX], 'Physician', 'Physician'),
+    ROLE_NP: (0.12, ['Nurse Practitioner'], [APRN_PREFIX], 'Nursing', 'Advanced Practice Registered Nurse'),
+    ROLE_PA: (0.06, ['Physician Assistant'], [PA_PREFIX], 'Physician-Assistant', 'Physician Assistant'),
+    ROLE_NURSE: (0.16, ['Registered Nurse'], [RN_PREFIX], 'Nursing', 'Registered Nurse'),
+    ROLE_CLIN_NURSE_SPECIALIST: (0.02, ['Clinical Nurse Specialist'], [APRN_PREFIX], 'Nursing', 'Advanced Practice Registered Nurse'),
+    ROLE_CERT_NURSE_MIDWIFE: (0.01, ['Advanced Practice Midwife'], [CNM_PREFIX], 'Midwifery', 'Certified Nurse Midwife'),
+    ROLE_MISC_OTHER: (0.29, None, [LP_PREFIX], None, None),
+}
+PHYSICIAN_PRIMARY_CARE_SHARE = 0.5
+# Share of the licensed individuals holding a second license, of those a third license and so on
+EXTRA_LICENSE_SHARES = [0.3, 0.5, 0.5, 0.5]
+PRIMARY_CARE_CLASSIFICATIONS = [SPECIALTY_FAMILY_MEDICINE, SPECIALTY_INTERNAL_MEDICINE, SPECIALTY_PEDS, SPECIALTY_OBGYN,
+                                SPECIALTY_GEN_PRACTICE, SPECIALTY_EM, SPECIALTY_PREVENT_MEDICINE]
+ORGANIZATION_GROUPINGS = ['Hospitals', 'Ambulatory Health Care Facilities', 'Agencies', 'Nursing & Custodial Care Facilities']
+# Roles whose claims include primary care codes more often than not
+PRIMARY_CARE_ROLES = [ROLE_MD_DO, ROLE_NP, ROLE_PA, ROLE_CERT_NURSE_MIDWIFE]
+
+FIRST_NAMES = ['JAMES', 'MARY', 'JOHN', 'PATRICIA', 'ROBERT', 'JENNIFER', 'MICHAEL', 'LINDA', 'DAVID', 'ELIZABETH', 'WILLIAM',
+               'BARBARA', 'RICHARD', 'SUSAN', 'JOSEPH', 'JESSICA', 'THOMAS', 'SARAH', 'CHARLES', 'KAREN', 'DANIEL', 'LISA',
+               'MATTHEW', 'NANCY', 'ANTHONY', 'SANDRA', 'MARK', 'ASHLEY', 'PAUL', 'EMILY', 'STEVEN', 'MICHELLE', 'ANDREW',
+               'AMANDA', 'KEVIN', 'MELISSA', 'BRIAN', 'REBECCA', 'PRIYA', 'WEI', 'MOHAMMED', 'ANA', 'JOSE', 'MEI', 'OLUWASEUN']
+LAST_NAMES = ['SMITH', 'JOHNSON', 'WILLIAMS', 'BROWN', 'JONES', 'GARCIA', 'MILLER', 'DAVIS', 'RODRIGUEZ', 'MARTINEZ',
+              'HERNANDEZ', 'LOPEZ', 'GONZALEZ', 'WILSON', 'ANDERSON', 'THOMAS', 'TAYLOR', 'MOORE', 'JACKSON', 'MARTIN',
+              'LEE', 'PEREZ', 'THOMPSON', 'WHITE', 'HARRIS', 'SANCHEZ', 'CLARK', 'RAMIREZ', 'LEWIS', 'ROBINSON', 'WALKER',
+              'YOUNG', 'ALLEN', 'KING', 'WRIGHT', 'SCOTT', 'NGUYEN', 'PATEL', 'CHEN', 'KIM', 'OKAFOR', 'SILVA', 'COHEN',
+              'MURPHY', 'OBRIEN', 'FERREIRA', 'MEDEIROS', 'DESOUSA', 'ST. PIERRE', 'MCCARTHY', 'DE LA CRUZ']
+# Practice states outside RI, weighted towards the states around it
+OTHER_STATES = ['MA', 'CT', 'NY', 'NH', 'NJ', 'PA', 'CA', 'TX', 'FL', 'IL', 'OH', 'GA', 'NC', 'MI', 'WA', 'AZ', 'ME', 'VT']
+OTHER_STATE_WEIGHTS = np.array([12, 10, 10, 3, 5, 5, 9, 8, 7, 5, 4, 4, 4, 4, 3, 3, 2, 2], dtype=float) / 100
+RI_CITIES = [('PROVIDENCE', '02903'), ('CRANSTON', '02910'), ('WARWICK', '02886'), ('PAWTUCKET', '02860'),
+             ('EAST PROVIDENCE', '02914'), ('WOONSOCKET', '02895'), ('NEWPORT', '02840'), ('WAKEFIELD', '02879')]
+# Practice city and ZIP of the providers in each of OTHER_STATES
+OTHER_STATE_CITIES = {
+    'MA': ('BOSTON', '02115'), 'CT': ('HARTFORD', '06106'), 'NY': ('NEW YORK', '10016'), 'NH': ('MANCHESTER', '03101'),
+    'NJ': ('NEWARK', '07102'), 'PA': ('PHILADELPHIA', '19104'), 'CA': ('LOS ANGELES', '90033'), 'TX': ('HOUSTON', '77030'),
+    'FL': ('MIAMI', '33136'), 'IL': ('CHICAGO', '60611'), 'OH': ('COLUMBUS', '43210'), 'GA': ('ATLANTA', '30303'),
+    'NC': ('DURHAM', '27710'), 'MI': ('DETROIT', '48201'), 'WA': ('SEATTLE', '98104'), 'AZ': ('PHOENIX', '85006'),
+    'ME': ('PORTLAND', '04102'), 'VT': ('BURLINGTON', '05401'),
+}
+# Share of the RI licensees whose RIDOH address is in the city they practice in according to NPPES (others list
+# e.g. a home address)
+RIDOH_PRACTICE_CITY_SHARE = 0.8
+
+
+def _pick(rng, values, size, probabilities=None):
+    return np.asarray(values, dtype=object)[rng.choice(len(values), size=size, p=probabilities)]
+
+
+def _role_taxonomy_codes(taxonomies):
+    # Role -> (taxonomy codes, primary care codes or None), plus the organization codes
+    physician_codes = taxonomies[taxonomies['Grouping'] == PHYSICIAN_GROUPING]
+    role_groupings = set(taxonomies[taxonomies[NPPES_CLASSIFICATION].isin(
+        [classification for _, classifications, _, _, _ in SYNTHETIC_ROLES.values() if classifications for classification in classifications])]['Grouping'])
+    role_codes = {}
+    for role, (_, classifications, _, _, _) in SYNTHETIC_ROLES.items():
+        if role == ROLE_MD_DO:
+            primary_care = physician_codes[physician_codes[NPPES_CLASSIFICATION].isin(PRIMARY_CARE_CLASSIFICATIONS)]
+            role_codes[role] = (physician_codes[NPPES_CODE].to_numpy(), primary_care[NPPES_CODE].to_numpy())
+        elif classifications is None:
+            other = taxonomies[~taxonomies['Grouping'].isin(role_groupings | {PHYSICIAN_GROUPING} | set(ORGANIZATION_GROUPINGS))]
+            role_codes[role] = (other[NPPES_CODE].to_numpy(), None)
+        else:
+            role_codes[role] = (taxonomies[taxonomies[NPPES_CLASSIFICATION].isin(classifications)][NPPES_CODE].to_numpy(), None)
+    organization_codes = taxonomies[taxonomies['Grouping'].isin(ORGANIZATION_GROUPINGS)][NPPES_CODE].to_numpy()
+    return role_codes, organization_codes
+
+
+def _license_numbers(rng, prefixes):
+    # MD012345 style - a prefix and five or six zero padded digits
+    digits = rng.integers(1, 99999, size=len(prefixes))
+    width = np.where(rng.random(len(prefixes)) < 0.7, 6, 5)
+    return np.array([f'{prefix}{number:0{w}d}' for prefix, number, w in zip(prefixes, digits, width)], dtype=object)
+
+
+def _nppes_chunk(rng, npis, ri_share, role_codes, organization_codes):
+    """One block of NPPES records - returns (the records in NPPES_PIPELINE_SCHEMA column order, a frame describing the
+    RI individual providers and a frame of the individual providers outside RI).
+    """
+    n = len(npis)
+    columns = {col: np.full(n, None, dtype=object) for col in NPPES_PIPELINE_SCHEMA}
+    is_organization = rng.random(n) < 0.15
+    individual = ~is_organization
+    roles = np.full(n, None, dtype=object)
+    role_names = list(SYNTHETIC_ROLES)
+    role_shares = np.array([SYNTHETIC_ROLES[role][0] for role in role_names])
+    roles[individual] = _pick(rng, role_names, individual.sum(), role_shares / role_shares.sum())
+
+    is_ri = rng.random(n) < ri_share
+    practice_state = np.where(is_ri, RHODE_ISLAND_STATE_CODE, _pick(rng, OTHER_STATES, n, OTHER_STATE_WEIGHTS / OTHER_STATE_WEIGHTS.sum()))
+    # Mostly the same mailing address state - some RI providers use an out of state billing address and vice versa
+    mailing_state = np.where(rng.random(n) < 0.9, practice_state, _pick(rng, [RHODE_ISLAND_STATE_CODE] + OTHER_STATES[:3], n))
+
+    columns[NPPES_NPI] = npis
+    columns[NPPES_ENTITY_TYPE] = np.where(is_organization, 2.0, 1.0)
+    columns[NPPES_FIRST_NAME][individual] = _pick(rng, FIRST_NAMES, individual.sum())
+    columns[NPPES_LAST_NAME][individual] = _pick(rng, LAST_NAMES, individual.sum())
+    middle = individual & (rng.random(n) < 0.6)
+    columns[NPPES_MIDDLE_NAME][middle] = _pick(rng, list('ABCDEFGHJKLMNPRSTW'), middle.sum())
+    columns[NPPES_GENDER][individual] = _pick(rng, ['F', 'M'], individual.sum())
+    mailing_col, practice_col = NPPES_ADDRESS_STATE_COLUMNS
+    columns[mailing_col] = mailing_state
+    columns[practice_col] = practice_state
+    # Practice location - one of RI_CITIES in RI, written as ZIP+4 about half the time as in the real file
+    ri_city = rng.choice(len(RI_CITIES), size=n)
+    other_city = [OTHER_STATE_CITIES.get(state, ('', '')) for state in practice_state]
+    practice_city = np.where(is_ri, np.array([city for city, _ in RI_CITIES], dtype=object)[ri_city], [city for city, _ in other_city])
+    practice_zip = np.where(is_ri, np.array([zip5 for _, zip5 in RI_CITIES], dtype=object)[ri_city], [zip5 for _, zip5 in other_city])
+    plus_four = rng.random(n) < 0.5
+    practice_zip[plus_four] = [f'{zip5}{extension:04d}' for zip5, extension in zip(practice_zip[plus_four], rng.integers(1, 9999, plus_four.sum()))]
+    columns[NPPES_PRACTICE_CITY] = practice_city
+    columns[NPPES_PRACTICE_POSTAL_CODE] = practice_zip
+
+    # Taxonomies - a primary code from the role's taxonomies, sometimes a second (and third) one from the same role
+    taxonomy_cols = NPPES_TAXONOMY_COLUMNS
+    for role, (codes, primary_care_codes) in role_codes.items():
+        has_role = roles == role
+        count = has_role.sum()
+        if count == 0:
+            continue
+        for slot, slot_share in enumerate([1.0, 0.25, 0.05]):
+            in_slot = has_role & (rng.random(n) < slot_share)
+            slot_codes = _pick(rng, codes, in_slot.sum())
+            if primary_care_codes is not None:
+                slot_codes = np.where(rng.random(in_slot.sum()) < PHYSICIAN_PRIMARY_CARE_SHARE, _pick(rng, primary_care_codes, in_slot.sum()), slot_codes)
+            columns[taxonomy_cols[slot]][in_slot] = slot_codes
+    columns[taxonomy_cols[0]][is_organization] = _pick(rng, organization_codes, is_organization.sum())
+
+    # Licenses - slot 1 is the license of the practice state, some individuals hold other states' licenses too (a
+    # few of them several, so the later license slots the notebook reads aren't empty throughout)
+    prefixes = np.full(n, None, dtype=object)
+    for role, (_, _, role_prefixes, _, _) in SYNTHETIC_ROLES.items():
+        has_role = roles == role
+        prefixes[has_role] = _pick(rng, role_prefixes, has_role.sum())
+    licensed = individual & (rng.random(n) < 0.95)
+    license_numbers = np.full(n, None, dtype=object)
+    license_numbers[licensed] = _license_numbers(rng, prefixes[licensed])
+    columns[NPPES_LICENSE_NUMBER_COLUMNS[0]] = license_numbers
+    columns[NPPES_LICENSE_STATE_COLUMNS[0]][licensed] = practice_state[licensed]
+    in_slot = licensed
+    for slot, slot_share in enumerate(EXTRA_LICENSE_SHARES, start=1):
+        in_slot = in_slot & (rng.random(n) < slot_share)
+        columns[NPPES_LICENSE_NUMBER_COLUMNS[slot]][in_slot] = _license_numbers(rng, prefixes[in_slot])
+        columns[NPPES_LICENSE_STATE_COLUMNS[slot]][in_slot] = _pick(rng, OTHER_STATES[:4] + [RHODE_ISLAND_STATE_CODE], in_slot.sum())
+    # Other identifiers (e.g. Medicaid ids) are sparse
+    other_identifier = rng.random(n) < 0.08
+    columns[NPPES_IDENTIFIER_STATE_COLUMNS[0]][other_identifier] = practice_state[other_identifier]
+
+    records = pd.DataFrame(columns)
+    providers = pd.DataFrame({'npi': npis, 'role': roles, 'first': columns[NPPES_FIRST_NAME], 'middle': columns[NPPES_MIDDLE_NAME],
+                              'last': columns[NPPES_LAST_NAME], 'license': license_numbers, 'taxonomy': columns[taxonomy_cols[0]],
+                              'city': practice_city, 'is_ri': is_ri})
+    providers = providers[individual]
+    return records, providers[providers['is_ri']], providers[~providers['is_ri']]
+
+
+def write_synthetic_nppes(file_path, rows, taxonomies, ri_share=0.02, seed=0, pad_to_columns=NPPES_FILE_COLUMN_COUNT,
+                          write_chunk_rows=SYNTHETIC_WRITE_CHUNK_ROWS, out_of_state_sample=0.01):
+    """Write a synthetic NPPES dissemination file. Returns (RI individual providers, a sample of the individual
+    providers outside RI) - what the APCD and RIDOH files are generated from.
+    """
+    rng = np.random.default_rng(seed)
+    role_codes, organization_codes = _role_taxonomy_codes(taxonomies)
+    filler_count = max(0, pad_to_columns - len(NPPES_PIPELINE_SCHEMA))
+    filler = ',' * filler_count
+    ri_providers, other_providers = [], []
+    next_npi = 1000000000
+    with open(file_path, 'w', newline='') as nppes_file:
+        nppes_file.write(','.join([f'"{col}"' for col in NPPES_PIPELINE_SCHEMA] + [f'"Unused Column_{i}"' for i in range(filler_count)]) + '\n')
+        for start in range(0, rows, write_chunk_rows):
+            n = min(write_chunk_rows, rows - start)
+            # NPIs are spread out (not consecutive) as in the real file, keeping well within the 10 digit range
+            npis = next_npi + np.cumsum(rng.integers(1, 90, size=n))
+            next_npi = int(npis[-1])
+            records, ri_chunk, other_chunk = _nppes_chunk(rng, npis, ri_share, role_codes, organization_codes)
+            ri_providers.append(ri_chunk)
+            other_providers.append(other_chunk.sample(frac=out_of_state_sample, random_state=int(rng.integers(2 ** 31))))
+            text = records.to_csv(index=False, header=False, float_format='%.0f')
+            nppes_file.write(text.replace('\n', filler + '\n') if filler else text)
+    return pd.concat(ri_providers, ignore_index=True), pd.concat(other_providers, ignore_index=True)
+
+
+def synthetic_apcd_extract(rng, ri_providers, other_providers, organization_share=0.02, unknown_npi_share=0.03):
+    """APCD extract rows for most RI providers, the sampled out of state providers and a few NPIs that aren't in NPPES."""
+    billing = pd.concat([ri_providers[rng.random(len(ri_providers)) < 0.9], other_providers], ignore_index=True)
+    unknown_npis = 1990000000 + rng.choice(9999999, size=int(len(billing) * unknown_npi_share), replace=False)
+    npis = np.concatenate([billing['npi'].to_numpy(), unknown_npis])
+    primary_care = np.concatenate([billing['role'].isin(PRIMARY_CARE_ROLES).to_numpy(), np.zeros(len(unknown_npis), dtype=bool)])
+    n = len(npis)
+
+    extract = pd.DataFrame({APCD_NPI_COL_NAME: npis})
+    # Claim volumes are long tailed - and only providers above the minimum claim count make it into the extract
+    two_year_claims = (np.exp(rng.normal(6, 1.3, size=n)) + APCD_MIN_CLAIM_COUNT + 1).astype(np.int64)
+    one_year_claims = np.maximum(APCD_MIN_CLAIM_COUNT + 1, (two_year_claims * rng.uniform(0.3, 0.7, size=n)).astype(np.int64))
+    for period, claims in [('', one_year_claims), ('_TWO_YEAR', two_year_claims)]:
+        extract[f'APCD_TOTAL_CLAIMS_ALL{period}_COUNT'] = claims
+        members = np.maximum(1, (claims * rng.uniform(0.2, 0.6, size=n)).astype(np.int64))
+        extract[f'APCD_MEMBER_ID_ALL{period}_COUNT'] = members
+        extract[f'APCD_INTERNAL_MEMBER_ID_ALL{period}_COUNT'] = members
+    for period, claims in [('ONE_YEAR', one_year_claims), ('TWO_YEAR', two_year_claims)]:
+        members = np.where(primary_care, (claims * rng.uniform(0.1, 0.5, size=n)).astype(np.int64), 0)
+        extract[f'APCD_MEMBER_ID_CORE_PC_{period}_COUNT'] = members
+        extract[f'APCD_INTERNAL_MEMBER_ID_CORE_PC_{period}_COUNT'] = members
+
+    # Claim counts by type - as in the SQL, a count at or below APCD_MIN_CLAIM_COUNT is reported as 0
+    type_shares = {
+        'VACC': np.where(rng.random(n) < np.where(primary_care, 0.7, 0.2), rng.uniform(0.01, 0.2, size=n), 0),
+        'PC': np.where(rng.random(n) < np.where(primary_care, 0.8, 0.1), rng.uniform(0.05, 0.6, size=n), 0),
+        'LTC': np.where(rng.random(n) < 0.05, rng.uniform(0.01, 0.3, size=n), 0),
+        'HOME': np.where(rng.random(n) < 0.05, rng.uniform(0.01, 0.3, size=n), 0),
+    }
+    type_counts = {claim_type: (one_year_claims * share).astype(np.int64) for claim_type, share in type_shares.items()}
+    type_counts['CORE_PC'] = np.minimum(one_year_claims, type_counts['VACC'] + type_counts['PC'])
+    type_counts['EXPANDED_PC'] = one_year_claims
+    for claim_type in APCD_CLAIM_TYPES:
+        counts = type_counts[claim_type]
+        extract[f'APCD_{claim_type}_CLAIMS_COUNT'] = np.where(counts > APCD_MIN_CLAIM_COUNT, counts, 0)
+    for claim_type, present_col in APCD_PRESENT_COLUMNS.items():
+        extract[present_col] = np.where(type_counts[claim_type] > 0, 'True', 'False')
+    return extract.sort_values(APCD_NPI_COL_NAME, ignore_index=True)
+
+
+def synthetic_medical_claims(rng, npis, start_date, lines_per_provider=60):
+    """Claim lines of the APCD medical_claim table (the columns APCD_Data_Extract.sql reads) for the given NPIs.
+    Claim volumes are long tailed and service dates fall in the two years before start_date and the year after it,
+    so every window and threshold of the extract query is exercised.
+    Args:
+        npis: Rendering provider NPIs
+        start_date: The extract's @START_DATE ('YYYY-MM-DD')
+        lines_per_provider: Median claim lines per provider
+    Returns:
+        DataFrame with Rendering_Provider_NPI, Medical_Claim_Header_Id, Member_Id, Internal_Member_Id,
+        procedure_code and first_service_dt columns
+    """
+    lines = np.maximum(1, np.exp(rng.normal(np.log(lines_per_provider), 1.0, size=len(npis)))).astype(np.int64)
+    n = int(lines.sum())
+    # Claims have one or more lines - consecutive lines of a provider share a claim header (its member and service date)
+    providers = np.repeat(np.asarray(npis, dtype=np.int64), lines)
+    new_header = np.ones(n, dtype=bool)
+    new_header[1:] = (rng.random(n - 1) < 0.6) | (providers[1:] != providers[:-1])
+    header_positions = np.cumsum(new_header) - 1
+    header_count = int(new_header.sum())
+    # Each provider sees a panel of members from their own part of the member id range
+    header_members = (np.repeat(rng.integers(0, 50000, size=len(npis)), lines)[new_header] + rng.integers(0, 300, size=header_count))
+    first_day = pd.Timestamp(start_date) - pd.DateOffset(years=2)
+    header_days = rng.integers(0, (pd.Timestamp(start_date) + pd.DateOffset(years=1) - first_day).days, size=header_count)
+
+    code_groups = list(APCD_CLAIM_PROCEDURE_CODES)
+    weights = np.array([APCD_CLAIM_PROCEDURE_WEIGHTS[group] for group in code_groups])
+    groups = _pick(rng, code_groups, n, weights / weights.sum())
+    procedure_codes = np.empty(n, dtype=object)
+    for group in code_groups:
+        in_group = groups == group
+        procedure_codes[in_group] = _pick(rng, APCD_CLAIM_PROCEDURE_CODES[group], int(in_group.sum()))
+    member_ids = header_members[header_positions]
+    return pd.DataFrame({
+        'Rendering_Provider_NPI': providers,
+        'Medical_Claim_Header_Id': header_positions + 100000000,
+        'Member_Id': member_ids,
+        'Internal_Member_Id': member_ids + 900000,
+        'procedure_code': procedure_codes,
+        'first_service_dt': (first_day + pd.to_timedelta(header_days[header_positions], unit='D')).strftime('%Y-%m-%d'),
+    })
+
+
+def synthetic_ridoh_extracts(rng, ri_providers, taxonomies, unlisted_share=0.3):
+    """RIDOH licensee extract frames keyed on extract file name prefix - the RI providers of each licensed role plus
+    licensees who aren't in NPPES (unlisted_share of them).
+    """
+    classification_by_code = dict(zip(taxonomies[NPPES_CODE], taxonomies[NPPES_CLASSIFICATION]))
+    extracts = {}
+    for extract_name, profession in RIDOH_EXTRACT_PROFESSIONS.items():
+        extract_roles = [role for role, (_, _, _, role_extract, _) in SYNTHETIC_ROLES.items() if role_extract == extract_name]
+        licensees = ri_providers[ri_providers['role'].isin(extract_roles)].copy()
+        licensees = licensees[licensees['license'].notna()]
+        unlisted = licensees.sample(frac=unlisted_share, random_state=int(rng.integers(2 ** 31)))
+        unlisted = unlisted.assign(first=_pick(rng, FIRST_NAMES, len(unlisted)), last=_pick(rng, LAST_NAMES, len(unlisted)), city=None,
+                                   license=_license_numbers(rng, np.array([SYNTHETIC_ROLES[role][2][0] for role in unlisted['role']], dtype=object)))
+        licensees = pd.concat([licensees, unlisted], ignore_index=True)
+        n = len(licensees)
+
+        # NPPES and RIDOH don't always agree on how a license is written - the prefix or the leading zeros go missing
+        license_numbers = licensees['license'].to_numpy(dtype=object)
+        variant = rng.random(n)
+        drop_prefix = variant < 0.1
+        license_numbers[drop_prefix] = [license.lstrip('ABCDEFGHIJKLMNOPQRSTUVWXYZ') for license in license_numbers[drop_prefix]]
+        drop_zero = (variant >= 0.1) & (variant < 0.15)
+        license_numbers[drop_zero] = [license.replace('0', '', 1) for license in license_numbers[drop_zero]]
+
+        # Mostly the city NPPES has them practicing in - the rest (and the licensees who aren't in NPPES) anywhere in RI
+        ri_city_names = [city for city, _ in RI_CITIES]
+        cities = rng.choice(len(RI_CITIES), size=n)
+        practice_city = licensees['city'].notna().to_numpy() & (rng.random(n) < RIDOH_PRACTICE_CITY_SHARE)
+        cities[practice_city] = [ri_city_names.index(city) for city in licensees['city'].to_numpy()[practice_city]]
+        middle = licensees['middle'].fillna('').to_numpy(dtype=object)
+        issue_years = rng.integers(1975, 2024, size=n)
+        extract = pd.DataFrame({
+            'Name': [' '.join(part for part in (first, mid, last) if part) for first, mid, last in zip(licensees['first'], middle, licensees['last'])],
+            'First': licensees['first'].str.title().to_numpy(),
+            'Middle': licensees['middle'].to_numpy(),
+            'Last': licensees['last'].str.title().to_numpy(),
+            'License No': license_numbers,
+            'License Type': [SYNTHETIC_ROLES[role][4] for role in licensees['role']],
+            'Status': _pick(rng, ['Active', 'Active', 'Active', 'Active', 'Active', 'Active', 'Active', 'Active', 'Expired', 'Inactive'], n),
+            'Issue Date': [f'{month:02d}/{day:02d}/{year}' for month, day, year in zip(rng.integers(1, 13, n), rng.integers(1, 29, n), issue_years)],
+            'Expiration Date': [f'06/30/{year}' for year in rng.integers(2024, 2027, n)],
+            'Address Line 1': [f'{number} {street}' for number, street in zip(rng.integers(1, 999, n), _pick(rng, ['Main St', 'Broad St', 'Eddy St', 'Hope St', 'Post Rd'], n))],
+            'Address Line 2': None, 'Address Line 3': None,
+            'City': [RI_CITIES[city][0] for city in cities],
+            'State': RHODE_ISLAND_STATE_CODE,
+            'Zip': [RI_CITIES[city][1] for city in cities],
+            'Email': None, 'Phone': None, 'Fax': None,
+            'Profession': profession,
+            'Specialty': None,
+        }, columns=RIDOH_EXTRACT_COLUMNS)
+        if extract_name == 'Physician':
+            # Physicians are listed once per specialty
+            extract['Specialty'] = [classification_by_code.get(code) for code in licensees['taxonomy']]
+            second = extract[rng.random(n) < 0.15].copy()
+            second['Specialty'] = _pick(rng, PRIMARY_CARE_CLASSIFICATIONS, len(second))
+            extract = pd.concat([extract, second]).sort_index(kind='stable').reset_index(drop=True)
+        extracts[extract_name] = extract
+    return extracts
+
+
+def generate_synthetic_inputs(output_directory, nppes_rows=100000, ri_share=0.02, seed=0, pad_to_columns=NPPES_FILE_COLUMN_COUNT,
+                              reference_directory=INPUT_FILES_DIRECTORY, extract_date=SYNTHETIC_RIDOH_EXTRACT_DATE):
+    """Write a complete synthetic input_files folder to output_directory/input_files.
+    Args:
+        output_directory: Folder to run the pipeline from
+        nppes_rows: NPPES records to write (the APCD and RIDOH files scale with the number of RI providers among them)
+        ri_share: Share of the NPPES records practicing in RI
+        seed: Random seed
+        pad_to_columns: Width of the NPPES file (blank columns are added to reach it)
+        reference_directory: Where the taxonomy and educational institution reference files are copied from
+        extract_date: Date in the RIDOH extract file names
+    Returns:
+        Dict of file kind to path
+    """
+    input_directory = os.path.join(output_directory, INPUT_FILES_DIRECTORY)
+    os.makedirs(input_directory, exist_ok=True)
+    for file_name in REFERENCE_FILE_NAMES:
+        shutil.copy(os.path.join(reference_directory, file_name), os.path.join(input_directory, file_name))
+    taxonomies = pd.read_csv(os.path.join(input_directory, 'nppes_all_taxonomies.csv'))
+
+    paths = {'nppes': os.path.join(input_directory, SYNTHETIC_NPPES_FILE_NAME), 'apcd': os.path.join(input_directory, SYNTHETIC_APCD_FILE_NAME)}
+    ri_providers, other_providers = write_synthetic_nppes(paths['nppes'], nppes_rows, taxonomies, ri_share, seed, pad_to_columns)
+    rng = np.random.default_rng(seed + 1)
+    synthetic_apcd_extract(rng, ri_providers, other_providers).to_csv(paths['apcd'], index=False)
+    for extract_name, extract in synthetic_ridoh_extracts(rng, ri_providers, taxonomies).items():
+        paths[extract_name] = os.path.join(input_directory, f'{extract_name}-licensee-extract-{extract_date}.csv')
+        extract.to_csv(paths[extract_name], index=False)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('output_directory', help='Folder to write input_files/ into')
+    parser.add_argument('--nppes-rows', type=int, default=100000)
+    parser.add_argument('--ri-share', type=float, default=0.02, help='Share of NPPES records practicing in RI')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--nppes-columns', type=int, default=NPPES_FILE_COLUMN_COUNT, help='Width of the NPPES file')
+    args = parser.parse_args()
+    print("Started:", current_date_time())
+    paths = generate_synthetic_inputs(args.output_directory, args.nppes_rows, args.ri_share, args.seed, args.nppes_columns)
+    for kind, path in paths.items():
+        print(f"{kind}: {path} ({os.path.getsize(path) / 1024 / 1024:,.1f} MB)")
+    print("Finished:", current_date_time())
+
+
+if __name__ == '__main__':
+    main()
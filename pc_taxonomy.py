@@ -0,0 +1,193 @@
+import numpy as np
+import pandas as pd
+
+from pc_constants import *
+
+PHYSICIAN_GROUPING = 'Allopathic & Osteopathic Physicians'
+# Anyone with one of these specialties must be a physician by defintion
+PRIMARY_CARE_ADJACENT_SPECIALTIES = [SPECIALTY_INTEG_MEDICINE, SPECIALTY_PREVENT_MEDICINE, SPECIALTY_INTERNAL_MEDICINE, SPECIALTY_FAMILY_MEDICINE, SPECIALTY_GEN_PRACTICE, SPECIALTY_OBGYN, SPECIALTY_PEDS]
+# Though EM should not generally be primary care, due to some data quality issues, we include it here
+FULL_SPECIALTY_LIST = PRIMARY_CARE_ADJACENT_SPECIALTIES + [SPECIALTY_EM]
+
+# The column listing the taxonomy codes that earned a provider their role/specialty, per column being tagged
+TAXONOMY_VALUES_COL_NAMES = {
+    RIDOH_CREDENTIAL_COLUMN_NAME: ROLE_TAXONOMY_VALUES_COL_NAME,
+    SPECIALTY_COLUMN_NAME: SPECIALTY_TAXONOMY_VALUES_COL_NAME,
+}
+
+
+class TaxonomyTagger:
+    """Tags providers with roles/specialties from their NPPES taxonomy codes.
+    The taxonomy code columns are melted once into a long (row, column, code) table - every role or specialty
+    dictionary is then tagged with a single join against that table instead of row-wise passes per role.
+    Args:
+        providers: DataFrame of providers (tagging writes into this frame)
+        taxonomy_columns: Taxonomy code columns to check, in order
+    """
+    def __init__(self, providers, taxonomy_columns):
+        self.providers = providers
+        self.taxonomy_columns = [col for col in taxonomy_columns if col in providers.columns]
+        codes = providers[self.taxonomy_columns].to_numpy(dtype=object)
+        rows, columns = np.indices(codes.shape)
+        present = pd.notna(codes)
+        # Row major, so within a row the codes stay in taxonomy column order
+        self.taxonomy_codes = pd.DataFrame({
+            'row': rows[present],
+            'column': columns[present],
+            'code': codes[present],
+        })
+
+    def _matches(self, taxonomy_dictionary):
+        # One row per (provider row, taxonomy column, role/specialty) where the code belongs to that role/specialty
+        lookup = pd.DataFrame(
+            [(code, key_position) for key_position, codes in enumerate(taxonomy_dictionary.values()) for code in codes],
+            columns=['code', 'key'],
+        ).drop_duplicates()
+        matches = self.taxonomy_codes.merge(lookup, on='code')
+        return matches.sort_values(['row', 'key', 'column'], kind='stable')
+
+    def update_roles_specialties(self, taxonomy_dictionary, col_to_update):
+        """Set col_to_update, its Included_taxonomy_values_* column and an is_<role or specialty> flag per dictionary key.
+        A provider whose codes belong to more than one key gets the last of them (in dictionary order) as their
+        role/specialty - the is_ flags show all of them. Providers matching no key keep their current value.
+        Args:
+            taxonomy_dictionary: Mapping of role or specialty to the list of its taxonomy codes
+            col_to_update: RIDOH_CREDENTIAL_COLUMN_NAME or SPECIALTY_COLUMN_NAME
+        """
+        if not self.taxonomy_columns:
+            return
+        providers = self.providers
+        keys = list(taxonomy_dictionary)
+        tracking_col_name = TAXONOMY_VALUES_COL_NAMES.get(col_to_update, '')
+        matches = self._matches(taxonomy_dictionary)
+
+        is_key = np.zeros((len(providers), len(keys)), dtype=bool)
+        is_key[matches['row'].to_numpy(), matches['key'].to_numpy()] = True
+
+        # Last wins: keep only the codes of each row's highest (i.e. last) matching key
+        winning_key = matches.groupby('row')['key'].transform('max')
+        winning_matches = matches[matches['key'] == winning_key]
+        winning_codes = winning_matches.groupby('row', sort=True)['code'].agg(list)
+        winning_rows = winning_codes.index.to_numpy()
+        winning_keys = winning_matches.groupby('row', sort=True)['key'].first().to_numpy()
+
+        mask = np.zeros(len(providers), dtype=bool)
+        mask[winning_rows] = True
+        if col_to_update not in providers.columns:
+            providers[col_to_update] = pd.Series(np.nan, index=providers.index, dtype=object)
+        providers.loc[mask, col_to_update] = np.array(keys, dtype=object)[winning_keys]
+        if tracking_col_name not in providers.columns:
+            providers[tracking_col_name] = pd.Series(np.nan, index=providers.index, dtype=object)
+        providers.loc[mask, tracking_col_name] = pd.Series(winning_codes.to_numpy(), index=providers.index[winning_rows])
+        for key_position, role_or_specialty in enumerate(keys):
+            providers[f'is_{role_or_specialty}'] = is_key[:, key_position]
+
+
+DERIVED_SPECIALTY_UNKNOWN = 'Unknown'
+DERIVED_SPECIALTY_MULTIPLE = 'Multiple specialties'
+# Providers tagged with exactly these two specialties get a combined derived specialty - any other combination
+# of two or more specialties is DERIVED_SPECIALTY_MULTIPLE. Add a line here to introduce a new combined specialty.
+DERIVED_SPECIALTY_PAIRS = {
+    frozenset({SPECIALTY_INTERNAL_MEDICINE, SPECIALTY_PEDS}): 'Med-Peds',
+    frozenset({SPECIALTY_INTERNAL_MEDICINE, SPECIALTY_FAMILY_MEDICINE}): 'IM-FM',
+    frozenset({SPECIALTY_EM, SPECIALTY_INTERNAL_MEDICINE}): 'EM-IM',
+    frozenset({SPECIALTY_FAMILY_MEDICINE, SPECIALTY_OBGYN}): 'FM-OBGYN',
+    frozenset({SPECIALTY_FAMILY_MEDICINE, SPECIALTY_PEDS}): 'FM-Peds',
+    frozenset({SPECIALTY_FAMILY_MEDICINE, SPECIALTY_EM}): 'FM-EM',
+}
+
+
+def derived_specialty_table(specialties, specialty_pairs=DERIVED_SPECIALTY_PAIRS):
+    """Derived specialty label for every combination of specialties, indexed by bitmask (bit i set = specialties[i]).
+    A single specialty is its own label, the pairs in specialty_pairs get their combined label, and any other
+    combination is DERIVED_SPECIALTY_MULTIPLE (no specialty at all is DERIVED_SPECIALTY_UNKNOWN).
+    """
+    table = np.full(2 ** len(specialties), DERIVED_SPECIALTY_MULTIPLE, dtype=object)
+    table[0] = DERIVED_SPECIALTY_UNKNOWN
+    for bit, specialty in enumerate(specialties):
+        table[1 << bit] = specialty
+    for pair, label in specialty_pairs.items():
+        if pair <= set(specialties) and len(pair) == 2:
+            table[sum(1 << specialties.index(specialty) for specialty in pair)] = label
+    return table
+
+
+def get_derived_specialty(providers, specialties, specialty_pairs=DERIVED_SPECIALTY_PAIRS):
+    """Derived specialty of every provider from their is_<specialty> flags (see derived_specialty_table).
+    The flags are packed into one bitmask per provider, so this is a single lookup into the precomputed table.
+    Returns:
+        Series of derived specialty labels, indexed like providers
+    """
+    flags = providers[[f'is_{specialty}' for specialty in specialties]].to_numpy() == True
+    specialty_masks = flags.astype(np.int64) @ (1 << np.arange(len(specialties), dtype=np.int64))
+    return pd.Series(derived_specialty_table(specialties, specialty_pairs)[specialty_masks], index=providers.index)
+
+
+def get_codes(dataframe, classification_conditions=None):
+    """Get taxonomy codes based on classification conditions.
+    Args:
+        dataframe: DataFrame containing taxonomy codes
+        classification_conditions: Single classification string or list of tuples with (classification, operator)
+            where operator is '==' or '|' for OR condition
+    """
+    if isinstance(classification_conditions, str):
+        return dataframe[dataframe[NPPES_CLASSIFICATION] == classification_conditions][NPPES_CODE].tolist()
+    elif classification_conditions:
+        mask = None
+        for classification in classification_conditions:
+            condition = (dataframe[NPPES_CLASSIFICATION] == classification)
+            if mask is None:
+                mask = condition
+            else:
+                mask |= condition  # Bitwise OR for OR condition
+        return dataframe[mask][NPPES_CODE].tolist()
+    return dataframe[NPPES_CODE].tolist()
+
+
+def taxonomy_code_dictionaries(nppes_all_taxonomies):
+    """Role and specialty to taxonomy code mappings built from nppes_all_taxonomies.csv.
+    Returns:
+        Tuple of (taxonomy_code_roles, taxonomy_code_specialties)
+    """
+    physician_taxonomies = nppes_all_taxonomies[nppes_all_taxonomies['Grouping'] == PHYSICIAN_GROUPING]
+    # We are excluding those taxonomies that we do not expect are primary care taxonomies
+    pc_taxonomies = nppes_all_taxonomies[nppes_all_taxonomies['Exclude?'] != 'Yes']
+
+    taxonomy_code_specialties = {}
+    taxonomy_code_specialties[SPECIALTY_EM] = physician_taxonomies[(physician_taxonomies[NPPES_CLASSIFICATION] == SPECIALTY_EM)][NPPES_CODE].tolist()
+    for specialty in PRIMARY_CARE_ADJACENT_SPECIALTIES:
+        taxonomy_code_specialties[specialty] = pc_taxonomies[(pc_taxonomies[NPPES_CLASSIFICATION] == specialty)][NPPES_CODE].tolist()
+
+    # Of note, the tagging takes the last role as the accurate one - this is why we set up the boolean is_role column
+    # to track those clinicians who meet the criteria for more than one role (this logic is also replicated for specialty)
+    taxonomy_code_roles = {
+        ROLE_MISC_OTHER : get_codes(nppes_all_taxonomies,['Legal Medicine', 'Specialist']),
+        ROLE_PODIATRY : get_codes(nppes_all_taxonomies, ROLE_PODIATRY),
+        ROLE_OPTOMETRY : get_codes(nppes_all_taxonomies, ROLE_OPTOMETRY),
+        ROLE_CASE_MGMT : get_codes(nppes_all_taxonomies, ROLE_CASE_MGMT),
+        ROLE_PSYCHOLOGIST : get_codes(nppes_all_taxonomies, ROLE_PSYCHOLOGIST),
+        ROLE_ORGANIZATION : get_codes(pc_taxonomies, ['Clinic/Center','General Acute Care Hospital', 'Nursing Facility/Intermediate Care Facility', 'Hospice Care, Community Based']),
+        ROLE_CLIN_NURSE_SPECIALIST : get_codes(pc_taxonomies, ROLE_CLIN_NURSE_SPECIALIST),
+        ROLE_CERT_NURSE_MIDWIFE : get_codes(pc_taxonomies, ['Advanced Practice Midwife', 'Midwife']),
+        ROLE_NURSE: get_codes(pc_taxonomies, 'Registered Nurse'),
+        ROLE_STUDENT : get_codes(pc_taxonomies, 'Student in an Organized Health Care Education/Training Program'),
+        ROLE_NP: get_codes(pc_taxonomies, ROLE_NP),
+        ROLE_PA: get_codes(pc_taxonomies, ROLE_PA),
+        ROLE_MD_DO: get_codes(physician_taxonomies),
+    }
+    return taxonomy_code_roles, taxonomy_code_specialties
+
+
+def tag_providers(providers, nppes_all_taxonomies, taxonomy_columns):
+    """Tag providers (in place) with their role, specialty, 'Count Specialties' and 'Derived Specialty'."""
+    taxonomy_code_roles, taxonomy_code_specialties = taxonomy_code_dictionaries(nppes_all_taxonomies)
+    # The taxonomy columns are melted into a long table once, then every role/specialty dictionary is tagged with a single join
+    taxonomy_tagger = TaxonomyTagger(providers, taxonomy_columns)
+    taxonomy_tagger.update_roles_specialties(taxonomy_code_roles, RIDOH_CREDENTIAL_COLUMN_NAME)
+    taxonomy_tagger.update_roles_specialties(taxonomy_code_specialties, SPECIALTY_COLUMN_NAME)
+
+    # Create the 'Count Specialties' column by summing up True values in the modified columns
+    providers['Count Specialties'] = providers[[f'is_{col}' for col in FULL_SPECIALTY_LIST]].sum(axis=1)
+    # Derived specialty: the single specialty, a combined label for the pairs in DERIVED_SPECIALTY_PAIRS (e.g. Med-Peds),
+    # otherwise 'Multiple specialties' (or 'Unknown' if there are none) - looked up from each provider's specialty bitmask
+    providers['Derived Specialty'] = get_derived_specialty(providers, FULL_SPECIALTY_LIST)
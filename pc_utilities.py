@@ -19,3 +19,17 @@ def import_csv_gracefully(directory, file_name, chunksize=None, low_memory=True)
         return file_data
     except Exception as e:
         print(f"There was an issue importing the file located at: {file_path}")
+
+
+import sys
+try:
+    import resource
+except ImportError: # not available on Windows
+    resource = None
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS but in kilobytes on Linux
+    return peak_rss / (1024 * 1024) if sys.platform == 'darwin' else peak_rss / 1024
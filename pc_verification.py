@@ -0,0 +1,209 @@
+"""Looks clinicians up on the RIDOH online license verification site (healthri.mylicense.com).
+
+A bounded pool of worker threads pulls clinicians off a work queue, each worker keeping a single long-lived
+session (a headless browser with pc_verification_selenium.SeleniumRidohSession, or plain HTTP with
+pc_verification_http.HttpRidohSession) that it reuses from one lookup to the next. Results are handed back keyed
+by the index of the clinician so they can be written back into the provider list in one go.
+"""
+import contextlib
+import queue
+import re
+import threading
+
+from pc_constants import *
+from pc_utilities import current_date_time
+
+RIDOH_VERIFICATION_SEARCH_URL = 'https://healthri.mylicense.com/verification/Search.aspx?facility=N&SubmitComplaint=Y'
+MAX_WAIT_TIME_IN_SECS = 3
+MAX_RETRIES_PER_CLINICIAN = 2
+RIDOH_VERIFICATION_WORKERS = 4
+
+# Currently only attempting license look-ups for specific credentials
+VERIFIABLE_ROLES = [ROLE_MD_DO, ROLE_PA, ROLE_CLIN_NURSE_SPECIALIST, ROLE_NURSE, ROLE_NP, ROLE_CERT_NURSE_MIDWIFE]
+# Profession drop down value on the verification site per role (name search) / license prefix (license search)
+ROLE_PROFESSIONS = {
+    ROLE_MD_DO: ROLE_MD_DO,
+    ROLE_PA: ROLE_PA,
+    ROLE_NP: 'Nursing',
+    ROLE_NURSE: 'Nursing',
+    ROLE_CLIN_NURSE_SPECIALIST: 'Nursing',
+    ROLE_CERT_NURSE_MIDWIFE: 'Midwifery',
+}
+LICENSE_PREFIX_PROFESSIONS = {
+    PA_PREFIX: ROLE_PA,
+    MD_PREFIX: ROLE_MD_DO,
+    DO_PREFIX: ROLE_MD_DO,
+    APRN_PREFIX: 'Nursing',
+    RN_PREFIX: 'Nursing',
+    ETL_PREFIX: 'Nursing',
+    NPP_PREFIX: 'Nursing',
+    CAPRN_PREFIX: 'Nursing',
+    CNM_PREFIX: 'Midwifery',
+}
+# Consider better handling for: F03170623, LP03291, MW00016
+LICENSE_PREFIX_PATTERN = rf'^({DO_PREFIX}|{MD_PREFIX}|{CNM_PREFIX}|{PA_PREFIX}|{APRN_PREFIX}|{RN_PREFIX}|{ETL_PREFIX}|{NPP_PREFIX}|{CAPRN_PREFIX})'
+INVALID_LICENSE_PATTERN = rf'^({RHODE_ISLAND_STATE_CODE})'
+
+
+class RetryWithNameSearch(Exception):
+    """The license search can't be trusted for this clinician - the next attempt searches on first and last name."""
+
+
+def get_nppes_license_if_available(row):
+    license_to_search = None
+    if (row[CONFIRMED_LICENSE_COL_NAME] != UNCONFIRMED_STRING):
+        license_to_search = row[CONFIRMED_LICENSE_COL_NAME]
+    else:
+        for i in range(1, 6):
+            license_number_col = f'{NPPES_PREFIX}Provider License Number_{i}'
+            state_code_col = f'{NPPES_PREFIX}Provider License Number State Code_{i}'
+            if row[state_code_col] == RHODE_ISLAND_STATE_CODE:
+                license_to_search = row[license_number_col]
+                # Thought process / hope is first license is more likely to be accurate
+                # Could revisit searching against all possible licenses but currently will just fall back
+                # to name search - it also turns out licenses CAN have dashes and be valid but CAN'T have spaces!
+                return license_to_search.replace(" ","")
+
+
+def clean_name(name):
+    return name.replace("-"," ").replace(" ", "")
+
+
+def plan_lookup(row, role, skip_license_search):
+    """Work out how to search for a clinician on this attempt.
+    Returns:
+        (methodology, profession, license_to_search) - profession is the drop down value to select (or None) and
+        license_to_search is None for a name search
+    """
+    license_to_search = None
+    # the skip_license_search flag was developed in the case that the result of the search based on the license number
+    # yields a physician whose name doesn't match our records - in this case, we want to re-try to search based on name alone
+    if not skip_license_search:
+        license_to_search = get_nppes_license_if_available(row)
+
+    if license_to_search is None:
+        return METHOD_NAME, ROLE_PROFESSIONS[role], None
+
+    # Of note, RI is not considered a valid prefix by the RIDOH website - however, there are no
+    # guarantees on if this belongs to an MD, DO, NP so for now, falling back on name searches
+    if re.match(INVALID_LICENSE_PATTERN, license_to_search):
+        raise RetryWithNameSearch(f"License begins with {RHODE_ISLAND_STATE_CODE} identifer - will search on name instead!")
+
+    match = re.match(LICENSE_PREFIX_PATTERN, license_to_search)
+    profession = LICENSE_PREFIX_PROFESSIONS.get(match.group(0)) if match else None
+    return METHOD_LIC, profession, license_to_search
+
+
+def needs_lookup(index, row, verbose=True):
+    """Whether the clinician is looked up at all (organizations, nameless providers and other roles are not)."""
+    first_name = row[NPPES_FIRST_NAME_COL_NAME]
+    last_name = row[NPPES_LAST_NAME_COL_NAME]
+    if row[NPPES_ENTITY_TYPE_CODE] == NPPES_ENTITY_TYPE_ORG_CODE:
+        if verbose:
+            print(f"Index: {index} - No license look-up for organizations")
+        return False
+    # If there is no first or last name, then there is a good chance this is an organization and there is no need to search
+    if not first_name or not last_name or str(first_name).lower() == NAN_STRING or str(last_name).lower() == NAN_STRING:
+        if verbose:
+            print(f"Index: {index} - Skipping no name clinician.")
+        return False
+    return row[RIDOH_CREDENTIAL_COLUMN_NAME] in VERIFIABLE_ROLES
+
+
+def verify_clinician(index, row, session, max_retries=MAX_RETRIES_PER_CLINICIAN):
+    """Look a single clinician up, retrying (falling back to a name search where the license search failed) up to
+    max_retries times.
+    Returns:
+        Dict of HLTHRI_* column to value - empty if the clinician was skipped or nothing was found
+    """
+    result = {}
+    if not needs_lookup(index, row):
+        return result
+
+    role = row[RIDOH_CREDENTIAL_COLUMN_NAME]
+    first_name = row[NPPES_FIRST_NAME_COL_NAME]
+    last_name = row[NPPES_LAST_NAME_COL_NAME]
+    skip_license_search = False
+    for attempt in range(max_retries):
+        try:
+            methodology, profession, license_to_search = plan_lookup(row, role, skip_license_search)
+            session.search(index, methodology, profession, license_to_search, first_name, last_name, result)
+            break
+        except Exception as e:
+            if isinstance(e, RetryWithNameSearch):
+                skip_license_search = True
+            else:
+                session.recover()
+            print(f"Attempt {attempt + 1}/{max_retries} - Error processing row {index}: {e}")
+            if attempt == max_retries - 1:
+                print("Max retries reached. Skipping to the next row.")
+    return result
+
+
+def verify_clinicians(providers, session_factory=None, workers=RIDOH_VERIFICATION_WORKERS,
+                      max_retries=MAX_RETRIES_PER_CLINICIAN, cache=None, metrics=None):
+    """Look every provider up on the RIDOH verification site with a pool of workers.
+    Each worker thread gets its own session from session_factory and keeps it for all of its lookups.
+    Args:
+        providers: DataFrame of providers (rows are queued in index order)
+        session_factory: Callable returning a new session (defaults to pc_verification_selenium.SeleniumRidohSession)
+        workers: Number of concurrent lookups (browsers)
+        max_retries: Attempts per clinician
+        cache: Optional pc_verification_cache.VerificationCache - clinicians with a fresh cached result are not looked
+            up again and every completed lookup is saved to it straight away
+        metrics: Optional pc_metrics.RunMetrics - every clinician looked up (in the cache or on the site) is recorded as a
+            'ridoh_lookup' event (time taken, whether it was a cache hit and whether they were found) - those skipped by
+            needs_lookup are not
+    Returns:
+        Dict of provider index to the dict of HLTHRI_* values found for them
+    """
+    if session_factory is None:
+        # Imported here so that selenium is only needed when the browser backend is actually used
+        from pc_verification_selenium import SeleniumRidohSession as session_factory
+    work_queue = queue.Queue()
+    for index, row in providers.iterrows():
+        work_queue.put((index, row))
+
+    results = {}
+    def work():
+        session = session_factory()
+        try:
+            while True:
+                try:
+                    index, row = work_queue.get_nowait()
+                except queue.Empty:
+                    return
+                if not needs_lookup(index, row, verbose=False):
+                    # Of note, skipped clinicians aren't recorded as look-ups so they don't drag the look-up times down
+                    result = verify_clinician(index, row, session, max_retries)
+                else:
+                    with metrics.measure('ridoh_lookup', index=index) if metrics is not None else contextlib.nullcontext({}) as lookup:
+                        lookup['cache_hit'] = False
+                        if cache is not None:
+                            cache_key = cache.key(row)
+                            result = cache.get(cache_key)
+                            lookup['cache_hit'] = result is not None
+                            if result is None:
+                                result = verify_clinician(index, row, session, max_retries)
+                                cache.put(cache_key, result)
+                        else:
+                            result = verify_clinician(index, row, session, max_retries)
+                        lookup['found'] = bool(result)
+                if result:
+                    results[index] = result
+        finally:
+            session.close()
+
+    threads = [threading.Thread(target=work, daemon=True) for _ in range(max(1, workers))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def write_verification_results(providers, results):
+    """Write the results of verify_clinicians back into the provider list by index."""
+    for index, result in results.items():
+        for col, value in result.items():
+            providers.at[index, col] = value
@@ -0,0 +1,117 @@
+"""Persistent cache of RIDOH license verification results (see pc_verification.py).
+
+Every completed lookup is committed to a local SQLite file as soon as it is done, so a crash or kernel restart
+part way through the verification loses at most the clinicians being looked up at that moment, and reruns only
+go to the site for clinicians that are not cached yet or whose cached result has gone stale.
+
+Results are keyed on (license number or normalized first/last name, credential) and go stale after ttl_days, or
+as soon as a license that was current when it was looked up passes its RIDOH expiration date (the renewed license
+will have new dates).
+"""
+import json
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from pc_constants import *
+from pc_verification import clean_name, get_nppes_license_if_available
+
+VERIFICATION_CACHE_FILE_NAME = 'ridoh_verification_cache.sqlite'
+VERIFICATION_CACHE_TTL_DAYS = 90
+RIDOH_DATE_FORMAT = '%m/%d/%Y'
+
+
+def _expired_since(expiration_date, fetched_at):
+    # Only a license that was still current when it was looked up and has expired since is likely to have been
+    # renewed - one that had already expired stays cached until the TTL like any other result
+    try:
+        expiration = datetime.strptime(expiration_date, RIDOH_DATE_FORMAT).timestamp()
+    except (TypeError, ValueError):
+        return False
+    return fetched_at <= expiration < time.time()
+
+
+class VerificationCache:
+    """SQLite backed cache of verification results, safe to share between the verification worker threads.
+    Args:
+        path: SQLite file (created if it doesn't exist)
+        ttl_days: Cached results older than this are looked up again (None to keep them until their license expires)
+    """
+    def __init__(self, path=VERIFICATION_CACHE_FILE_NAME, ttl_days=VERIFICATION_CACHE_TTL_DAYS):
+        self.path = path
+        self.ttl_days = ttl_days
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('''
+            CREATE TABLE IF NOT EXISTS verification_results (
+                lookup_key TEXT NOT NULL,
+                credential TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                result TEXT NOT NULL,
+                PRIMARY KEY (lookup_key, credential)
+            )''')
+        self._connection.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute('SELECT COUNT(*) FROM verification_results').fetchone()[0]
+
+    @staticmethod
+    def key(row):
+        """(license number or normalized 'first|last' name, credential) of a provider row."""
+        try:
+            license_no = get_nppes_license_if_available(row)
+        except (KeyError, AttributeError): # no license columns / a missing RI license number - key on the name instead
+            license_no = None
+        if license_no is None and row[CONFIRMED_LICENSE_COL_NAME] != UNCONFIRMED_STRING:
+            license_no = row[CONFIRMED_LICENSE_COL_NAME]
+        if license_no is None:
+            lookup_key = f'{clean_name(str(row[NPPES_FIRST_NAME_COL_NAME])).lower()}|{clean_name(str(row[NPPES_LAST_NAME_COL_NAME])).lower()}'
+        else:
+            lookup_key = str(license_no).strip().upper()
+        return lookup_key, str(row[RIDOH_CREDENTIAL_COLUMN_NAME])
+
+    def _is_stale(self, fetched_at, result):
+        if self.ttl_days is not None and time.time() - fetched_at > self.ttl_days * 24 * 60 * 60:
+            return True
+        return _expired_since(result.get(HLTHRI_EXP_DATE_COL_NAME), fetched_at)
+
+    def get(self, key):
+        """Cached result for key, or None if it isn't cached or has gone stale."""
+        with self._lock:
+            cached = self._connection.execute(
+                'SELECT fetched_at, result FROM verification_results WHERE lookup_key = ? AND credential = ?', key).fetchone()
+            if cached is None:
+                self.misses += 1
+                return None
+            fetched_at, result = cached[0], json.loads(cached[1])
+            if self._is_stale(fetched_at, result):
+                self.stale += 1
+                return None
+            self.hits += 1
+            return result
+
+    def put(self, key, result):
+        """Save (and commit) a result. Only completed lookups are kept - a lookup that failed all of its attempts
+        may have been a network or site problem and is retried next time.
+        """
+        if not result.get(HLTHRI_METHD_COL_NAME):
+            return
+        with self._lock:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO verification_results (lookup_key, credential, fetched_at, result) VALUES (?, ?, ?, ?)',
+                (*key, time.time(), json.dumps(result)))
+            self._connection.commit()
+
+    def summary(self):
+        lookups = self.hits + self.misses + self.stale
+        hit_rate = self.hits / lookups if lookups else 0
+        return f"{self.hits:,} cache hits, {self.misses:,} misses, {self.stale:,} stale ({hit_rate:.0%} hit rate)"
+
+    def close(self):
+        self._connection.close()
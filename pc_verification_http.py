@@ -0,0 +1,251 @@
+"""Browserless backend for the RIDOH license verification (see pc_verification.py).
+
+The healthri.mylicense.com search is an ASP.NET form - rather than driving it with Chrome, HttpRidohSession
+posts the form directly (carrying back the hidden __VIEWSTATE / __EVENTVALIDATION fields the search page hands
+out) and parses the result grid and licensee detail pages with the standard library HTML parser. It fills in
+the same HLTHRI_* fields as pc_verification_selenium.SeleniumRidohSession and can be passed to verify_clinicians
+in its place.
+"""
+import http.cookiejar
+import urllib.parse
+import urllib.request
+from html.parser import HTMLParser
+
+from pc_constants import *
+from pc_utilities import current_date_time
+from pc_verification import (RIDOH_VERIFICATION_SEARCH_URL, MAX_WAIT_TIME_IN_SECS, RetryWithNameSearch,
+                             clean_name)
+
+RESULT_LINK_ID_PREFIX = 'datagrid_results__ctl'
+VOID_ELEMENTS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'param', 'source', 'wbr'}
+SEARCH_BUTTON_NAME = 'sch_button'
+# Detail page element ids per field - (primary id, fallback id) as the page layout differs between professions
+DETAIL_ELEMENT_IDS = {
+    HLTHRI_ISSUE_DATE_COL_NAME: ('_ctl15__ctl1_issue_date', '_ctl17__ctl1_issue_date'),
+    HLTHRI_EXP_DATE_COL_NAME: ('_ctl15__ctl1_expiration_date', '_ctl17__ctl1_expiration_date'),
+    HLTHRI_SCHOOL_NAME_COL_NAME: ('_ctl25__ctl1_schl_name', '_ctl27__ctl1_schl_name'),
+    HLTHRI_GRAD_DATE_COL_NAME: ('_ctl25__ctl1_date_to', '_ctl27__ctl1_date_to'),
+    HLTHRI_SPEC_INFO_COL_NAME: ('_ctl33__ctl1_authority_code', None),
+}
+# Result grid columns after the one holding the name link (i.e. following-sibling::td[n] in the Selenium backend)
+RESULT_CELL_OFFSETS = {
+    HLTHRI_LIC_NO_COL_NAME: 1,
+    HLTHRI_PROF_COL_NAME: 3,
+    HLTHRI_LIC_TYPE_COL_NAME: 4,
+    HLTHRI_LIC_STATUS_COL_NAME: 5,
+    HLTHRI_CITY_COL_NAME: 6,
+    HLTHRI_STATE_COL_NAME: 7,
+}
+
+
+def _normalize_text(text):
+    # Same whitespace handling as a browser's rendered text
+    return ' '.join(text.split())
+
+
+class _RidohPageParser(HTMLParser):
+    """Collects what the verification code needs from a page: the form (action, the fields a browser would post
+    with their default values, submit buttons, drop down options), the text of every element with an id, and the
+    rows of the result grid as lists of cells.
+    """
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.form_action = None
+        self.form_fields = {}
+        self.submit_buttons = {}
+        self.select_options = {}
+        self.element_text = {}
+        self.result_rows = []
+        self._open_ids = []
+        self._select_name = None
+        self._option_value = None
+        self._option_text = None
+        self._option_selected = False
+        self._in_results = False
+        self._row = None
+        self._cell = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == 'form' and self.form_action is None:
+            self.form_action = attrs.get('action', '')
+        elif tag == 'input' and attrs.get('name'):
+            input_type = (attrs.get('type') or 'text').lower()
+            if input_type == 'submit':
+                self.submit_buttons[attrs['name']] = attrs.get('value', '')
+            elif input_type in ('hidden', 'text', 'password', 'email', 'tel'):
+                self.form_fields[attrs['name']] = attrs.get('value', '')
+        elif tag == 'select':
+            self._select_name = attrs.get('name')
+            self.select_options.setdefault(self._select_name, {})
+        elif tag == 'option' and self._select_name is not None:
+            self._finish_option()
+            self._option_value = attrs.get('value')
+            self._option_text = ''
+            self._option_selected = 'selected' in attrs
+        elif tag == 'table' and attrs.get('id') == 'datagrid_results':
+            self._in_results = True
+        elif tag == 'tr' and self._in_results:
+            self._finish_row()
+            self._row = []
+        elif tag == 'td' and self._row is not None:
+            self._cell = {'text': '', 'link': None}
+            self._row.append(self._cell)
+        elif tag == 'a' and self._cell is not None and attrs.get('id', '').startswith(RESULT_LINK_ID_PREFIX):
+            self._cell['link'] = attrs.get('href')
+
+        if tag not in VOID_ELEMENTS:
+            self._open_ids.append((tag, attrs.get('id')))
+            if attrs.get('id'):
+                self.element_text[attrs['id']] = ''
+
+    def _finish_option(self):
+        # </option> is optional in HTML, so an option also ends at the next option or at </select>
+        if self._option_text is None:
+            return
+        text = _normalize_text(self._option_text)
+        value = self._option_value if self._option_value is not None else text
+        self.select_options[self._select_name][text] = value
+        # A drop down posts its selected option, or its first one if none is marked selected
+        if self._option_selected or self._select_name not in self.form_fields:
+            self.form_fields[self._select_name] = value
+        self._option_text = None
+
+    def _finish_row(self):
+        if self._row is not None:
+            self.result_rows.append(self._row)
+        self._row = None
+        self._cell = None
+
+    def handle_endtag(self, tag):
+        if tag == 'option':
+            self._finish_option()
+        elif tag == 'select':
+            self._finish_option()
+            self._select_name = None
+        elif tag == 'td':
+            self._cell = None
+        elif tag == 'tr':
+            self._finish_row()
+        elif tag == 'table' and self._in_results:
+            self._finish_row()
+            self._in_results = False
+
+        # Pop back to the matching start tag (tolerating the unclosed tags real pages are full of)
+        for position in range(len(self._open_ids) - 1, -1, -1):
+            if self._open_ids[position][0] == tag:
+                del self._open_ids[position:]
+                break
+
+    def handle_data(self, data):
+        if self._option_text is not None:
+            self._option_text += data
+        if self._cell is not None:
+            self._cell['text'] += data
+        for _, element_id in self._open_ids:
+            if element_id:
+                self.element_text[element_id] += data
+
+
+def parse_ridoh_page(page_html):
+    parser = _RidohPageParser()
+    parser.feed(page_html)
+    parser.close()
+    parser.element_text = {element_id: _normalize_text(text) for element_id, text in parser.element_text.items()}
+    for row in parser.result_rows:
+        for cell in row:
+            cell['text'] = _normalize_text(cell['text'])
+    return parser
+
+
+class HttpRidohSession:
+    """Verification session that uses plain HTTP form posts instead of a browser.
+    The search page (and with it the hidden ASP.NET form state) is fetched once and reused for every search
+    the session makes - it is fetched again after a failed lookup. Cookies are kept for the life of the session.
+    Args:
+        search_url: Search page of the verification site - point this at a local stub server for testing
+        wait_secs: Timeout for each request
+    """
+    def __init__(self, search_url=RIDOH_VERIFICATION_SEARCH_URL, wait_secs=MAX_WAIT_TIME_IN_SECS):
+        self.search_url = search_url
+        self.wait_secs = wait_secs
+        self._opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+        self._search_form = None
+
+    def _fetch(self, url, form=None):
+        data = urllib.parse.urlencode(form).encode() if form is not None else None
+        with self._opener.open(url, data=data, timeout=self.wait_secs) as response:
+            charset = response.headers.get_content_charset() or 'utf-8'
+            return response.geturl(), parse_ridoh_page(response.read().decode(charset, errors='replace'))
+
+    def _get_search_form(self):
+        if self._search_form is None:
+            url, page = self._fetch(self.search_url)
+            self._search_form = (urllib.parse.urljoin(url, page.form_action or ''), page)
+        return self._search_form
+
+    def recover(self):
+        # Start over from a freshly fetched search page (new form state) on the next lookup
+        self._search_form = None
+
+    def close(self):
+        self._search_form = None
+
+    def search(self, index, methodology, profession, license_to_search, first_name, last_name, result):
+        """Run one search, filling result (a dict of HLTHRI_* column to value) as values are found.
+        Raises RetryWithNameSearch if the license search found someone else or nothing at all.
+        """
+        action_url, search_page = self._get_search_form()
+        # Post the whole form as a browser would - including __VIEWSTATE / __EVENTVALIDATION and the search button
+        form = dict(search_page.form_fields)
+        form[SEARCH_BUTTON_NAME] = search_page.submit_buttons.get(SEARCH_BUTTON_NAME, 'Search')
+        if profession is not None:
+            professions = search_page.select_options.get('t_web_lookup__profession_name', {})
+            if profession not in professions:
+                raise ValueError(f"Profession {profession} is not one of the search options")
+            form['t_web_lookup__profession_name'] = professions[profession]
+        if license_to_search is not None:
+            print(f"Index: {index} - searching {license_to_search}, against the license type of: {profession},{current_date_time()}")
+            form['t_web_lookup__license_no'] = license_to_search
+        else:
+            form['t_web_lookup__first_name'] = first_name
+            form['t_web_lookup__last_name'] = last_name
+            print(f"Index: {index} - searching {first_name} and {last_name}, against the license type of: {profession}, {current_date_time()}")
+
+        results_url, results_page = self._fetch(action_url, form)
+        if 'datagrid_results' not in results_page.element_text:
+            raise TimeoutError("No search results were returned")
+
+        details_page = results_page
+        for row in results_page.result_rows:
+            link_positions = [position for position, cell in enumerate(row) if cell['link'] is not None]
+            if not link_positions:
+                continue
+            link_position = link_positions[0]
+            cell_text = lambda offset: row[link_position + offset]['text'] if link_position + offset < len(row) else ''
+            link_license_number = cell_text(RESULT_CELL_OFFSETS[HLTHRI_LIC_NO_COL_NAME])
+            # The search automatically inserts a wildcard at the beginning of the license number, so confirm we got the
+            # exact license we searched on
+            if license_to_search is not None and license_to_search != link_license_number:
+                continue
+
+            ridoh_name = row[link_position]['text']
+            print(f'Name: {ridoh_name} and License Number: {link_license_number} found based on methodology: {methodology}')
+            # Licensees whose license number is listed incorrectly in NPPES turn up someone else - revert to a name search
+            if (clean_name(first_name) not in clean_name(ridoh_name) or clean_name(last_name) not in clean_name(ridoh_name)):
+                raise RetryWithNameSearch("Name mismatch based on license search!")
+
+            result[HLTHRI_NAME_COL_NAME] = ridoh_name
+            for col, offset in RESULT_CELL_OFFSETS.items():
+                result[col] = cell_text(offset)
+            _, details_page = self._fetch(urllib.parse.urljoin(results_url, row[link_position]['link']))
+            break
+
+        details = {}
+        for col, (primary_id, secondary_id) in DETAIL_ELEMENT_IDS.items():
+            details[col] = details_page.element_text.get(primary_id, details_page.element_text.get(secondary_id))
+        if all(value is None for value in details.values()) and methodology == METHOD_LIC:
+            raise RetryWithNameSearch("Nothing was found based on a license search - retrying based on name")
+
+        result.update(details)
+        result[HLTHRI_METHD_COL_NAME] = methodology
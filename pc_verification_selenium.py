@@ -0,0 +1,155 @@
+"""Headless Chrome backend for the RIDOH license verification (see pc_verification.py).
+
+Kept apart from pc_verification.py so that selenium is only imported when this backend is used - the HTTP
+backend (pc_verification_http.py) and the rest of the pipeline run without it.
+"""
+from selenium import webdriver
+from selenium.webdriver.common.by import By
+from selenium.webdriver.common.keys import Keys
+from selenium.webdriver.support.ui import Select
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.common.exceptions import StaleElementReferenceException
+from selenium.webdriver.chrome.options import Options
+from selenium.common.exceptions import TimeoutException, WebDriverException
+
+from pc_constants import *
+from pc_utilities import current_date_time
+from pc_verification import RIDOH_VERIFICATION_SEARCH_URL, MAX_WAIT_TIME_IN_SECS, RetryWithNameSearch, clean_name
+
+
+def get_chrome_driver():
+    chrome_options = Options()
+    chrome_options.add_argument("--incognito")
+    chrome_options.add_argument("--headless")  # Enable headless mode
+    chrome_options.add_argument("--no-sandbox")  # Bypass OS security model (Linux only)
+    chrome_options.add_argument("--disable-dev-shm-usage")  # Overcome limited resource problems
+    chrome_options.add_argument("--log-level=3")  # Suppress logs
+    driver = webdriver.Chrome(options=chrome_options)
+    return driver
+
+
+def get_element_text(wait, element_name, primary_id, secondary_id=None, verbose=False):
+    try:
+        return wait.until(EC.presence_of_element_located((By.ID, primary_id))).text
+    except TimeoutException:
+        try:
+            if secondary_id is not None:
+                return wait.until(EC.presence_of_element_located((By.ID, secondary_id))).text
+            else:
+                return None
+        except TimeoutException:
+            if verbose:
+                print(f"{element_name} element not found.")
+            return None
+
+
+class SeleniumRidohSession:
+    """One browser, reused for every lookup a verification worker makes (it is only started on first use).
+    Args:
+        search_url: Search page of the verification site - point this at a local stub server for testing
+        wait_secs: How long to wait for each page element
+        driver_factory: Callable returning a new WebDriver
+    """
+    def __init__(self, search_url=RIDOH_VERIFICATION_SEARCH_URL, wait_secs=MAX_WAIT_TIME_IN_SECS, driver_factory=get_chrome_driver):
+        self.search_url = search_url
+        self.wait_secs = wait_secs
+        self.driver_factory = driver_factory
+        self._driver = None
+
+    @property
+    def driver(self):
+        if self._driver is None:
+            self._driver = self.driver_factory()
+        return self._driver
+
+    def recover(self):
+        # A failed lookup usually just leaves the browser on some page (the next lookup navigates away anyway),
+        # but if the browser itself has died it is replaced
+        if self._driver is None:
+            return
+        try:
+            self._driver.current_url
+        except WebDriverException:
+            self.close()
+
+    def close(self):
+        if self._driver is not None:
+            try:
+                self._driver.quit()
+            except WebDriverException:
+                pass
+            self._driver = None
+
+    def search(self, index, methodology, profession, license_to_search, first_name, last_name, result):
+        """Run one search, filling result (a dict of HLTHRI_* column to value) as values are found.
+        Raises RetryWithNameSearch if the license search found someone else or nothing at all.
+        """
+        driver = self.driver
+        driver.get(self.search_url)
+
+        if profession is not None:
+            select = Select(driver.find_element(By.ID, 't_web_lookup__profession_name'))
+            select.select_by_visible_text(profession)
+        if license_to_search is not None:
+            print(f"Index: {index} - searching {license_to_search}, against the license type of: {profession},{current_date_time()}")
+            search_input = driver.find_element(By.NAME, "t_web_lookup__license_no")
+            search_input.send_keys(license_to_search)
+        else:
+            search_input = driver.find_element(By.NAME, "t_web_lookup__first_name")
+            search_input.send_keys(first_name)
+            search_input = driver.find_element(By.NAME, "t_web_lookup__last_name")
+            search_input.send_keys(last_name)
+            print(f"Index: {index} - searching {first_name} and {last_name}, against the license type of: {profession}, {current_date_time()}")
+
+        search_input.send_keys(Keys.RETURN)
+        wait = WebDriverWait(driver, self.wait_secs)
+
+        wait.until(EC.presence_of_element_located((By.ID, 'datagrid_results')))
+        link_elements = driver.find_elements(By.CSS_SELECTOR, 'a[id^="datagrid_results__ctl"]')
+
+        for link in link_elements:
+            try:
+                link_license_number = link.find_element(By.XPATH, '../following-sibling::td[1]/span').text
+                # This logic is necessary as the search automatically inserts a wildcard at beginning and thus
+                # includes other associated licenses which capture slightly different info (e.g. lack specialty for physicians)
+                # here, we confirm that we got the exact license we searched on if license was in the query
+                if license_to_search is not None and license_to_search != link_license_number:
+                    continue
+
+                ridoh_name = link.text
+                print(f'Name: {ridoh_name} and License Number: {link_license_number} found based on methodology: {methodology}')
+
+                # This logic is necessary because there are individuals who an incorrect license number listed and whose
+                # name on license look-up doesn't match - for these people, we want to revert to a manual name search
+                if (clean_name(first_name) not in clean_name(ridoh_name) or clean_name(last_name) not in clean_name(ridoh_name)):
+                    raise RetryWithNameSearch("Name mismatch based on license search!")
+
+                result[HLTHRI_NAME_COL_NAME] = ridoh_name
+                result[HLTHRI_LIC_NO_COL_NAME] = link_license_number
+                result[HLTHRI_PROF_COL_NAME] = link.find_element(By.XPATH, '../following-sibling::td[3]/span').text
+                result[HLTHRI_LIC_TYPE_COL_NAME] = link.find_element(By.XPATH, '../following-sibling::td[4]/span').text
+                result[HLTHRI_LIC_STATUS_COL_NAME] = link.find_element(By.XPATH, '../following-sibling::td[5]/span').text
+                result[HLTHRI_CITY_COL_NAME] = link.find_element(By.XPATH, '../following-sibling::td[6]/span').text
+                result[HLTHRI_STATE_COL_NAME] = link.find_element(By.XPATH, '../following-sibling::td[7]/span').text
+
+                driver.execute_script("arguments[0].removeAttribute('target');", link)
+                link.click()
+                break
+            except StaleElementReferenceException:
+                print("Stale element reference, re-fetching the links.")
+
+        details = {
+            HLTHRI_ISSUE_DATE_COL_NAME: get_element_text(wait, "Issue date", "_ctl15__ctl1_issue_date", "_ctl17__ctl1_issue_date"),
+            HLTHRI_EXP_DATE_COL_NAME: get_element_text(wait, "Expiration date", "_ctl15__ctl1_expiration_date", "_ctl17__ctl1_expiration_date"),
+            # Of note, school name is particularly complicated for non-physicians - it seems to capture more school info
+            HLTHRI_SCHOOL_NAME_COL_NAME: get_element_text(wait, "School name", "_ctl25__ctl1_schl_name", "_ctl27__ctl1_schl_name"),
+            HLTHRI_GRAD_DATE_COL_NAME: get_element_text(wait, "Graduation date", "_ctl25__ctl1_date_to", "_ctl27__ctl1_date_to"),
+            # Of note, physicians can in fact have multiple specialties list - current logic doesn't handle this
+            HLTHRI_SPEC_INFO_COL_NAME: get_element_text(wait, "Specialty Information", "_ctl33__ctl1_authority_code"),
+        }
+        if all(value is None for value in details.values()) and methodology == METHOD_LIC:
+            raise RetryWithNameSearch("Nothing was found based on a license search - retrying based on name")
+
+        result.update(details)
+        result[HLTHRI_METHD_COL_NAME] = methodology